@@ -1,59 +1,62 @@
+import time
+_STARTED = time.perf_counter()  # inicio del arranque, para CRUD_STARTUP_PROFILE
+
+import os
 import tkinter as tk
-from tkinter import messagebox, ttk
-import mariadb
-import bcrypt
-from tkcalendar import DateEntry
+from tkinter import filedialog, messagebox, ttk
 from datetime import datetime
-import re
+import functools
+import logging
 
+from configuracion import (
+    CLIENT_ID,
+    METRICS_CONFIG,
+    SEARCH_CONFIG,
+    close_repository,
+    get_repository,
+    get_session_manager,
+    session_file,
+    set_audit_actor,
+)
+from ejecutor_tk import TkExecutor, run_in_ui
+from limitador_login import LoginLockedError
+from metricas import StartupProfile, metrics
+from migraciones import MigrationError
+from repositorio import (
+    ConflictError,
+    DatabaseConnectionError,
+    DuplicateUserError,
+    RepositoryError,
+)
+from validaciones import FECHA_RE, es_correo, es_telefono, format_errors, validate_record
 
-# --- Configuración de la Base de Datos ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '', # ¡Cambia esto a con la contraseña de acceso a MariaDB!
-    'database': 'crud_db'
-}
 
-# --- Funciones de la Base de Datos ---
-def get_db_connection():
-    try:
-        conn = mariadb.connect(**DB_CONFIG)
-        return conn
-    except mariadb.Error as e:
-        messagebox.showerror("Error de Conexión a DB", f"Error al conectar a MariaDB: {e}")
-        return None
+# --- Configuración ---
+# La de la base de datos, bcrypt, sesiones, auditoría y purga está en configuracion.py,
+# compartida con la API y las herramientas de línea de comandos.
 
-def create_table():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
+# Cada cuántos milisegundos la tabla revisa cambios hechos por otros clientes
+GRID_POLL_MS = 5000
+
+logger = logging.getLogger('crud_usuarios')
+
+# --- Funciones de la Base de Datos ---
+def write_metrics():
+    """Registra el resumen de métricas y, si está configurado, lo guarda para Prometheus"""
+    metrics.log_snapshot()
+    if METRICS_CONFIG['archivo']:
         try:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    tipo_identificacion ENUM('CC', 'NIT', 'PAS', 'CE') NOT NULL,
-                    numero_identificacion VARCHAR(255) NOT NULL,
-                    nombre VARCHAR(255) NOT NULL,
-                    apellido VARCHAR(255) NOT NULL,
-                    direccion VARCHAR(255),
-                    fecha_nacimiento DATE,
-                    correo VARCHAR(255) NOT NULL,
-                    password_hash VARCHAR(255) NOT NULL,
-                    telefono VARCHAR(40)
-                );
-            """)
-            conn.commit()
-            print("Tabla 'users' creada o ya existe.")
-        except mariadb.Error as e:
-            print(f"Error al crear la tabla: {e}")
-        finally:
-            cursor.close()
-            conn.close()
-
-def hash_password(password):
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    return hashed.decode('utf-8')
+            with open(METRICS_CONFIG['archivo'], 'w', encoding='utf-8') as f:
+                f.write(metrics.to_prometheus())
+        except OSError as e:
+            logger.error(f"No se pudieron guardar las métricas: {e}")
+
+def show_repository_error(e, mensaje):
+    """Muestra en un diálogo un error del repositorio"""
+    if isinstance(e, DatabaseConnectionError):
+        run_in_ui(messagebox.showerror, "Error de Conexión a DB", f"Error al conectar a la base de datos: {e}")
+    else:
+        run_in_ui(messagebox.showerror, "Error", f"{mensaje}: {e}")
 
 def validar_obligatorio(valor, campo):
     if not valor:
@@ -62,238 +65,431 @@ def validar_obligatorio(valor, campo):
     return True
 
 def validar_telefono(numero):
-    patron = r'^(\+\d{1,3}\s?)?\d{7,15}(\s?(ext\.?|extensión)\s?\d+)?$'
-    return re.match(patron, numero) is not None
-
-def verify_password(password, hashed_password):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return es_telefono(numero)
 
 def validar_correo(correo):
-    patron = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(patron, correo) is not None
+    return es_correo(correo)
 
 def insert_user(tipo_identificacion, numero_identificacion, nombre, apellido, correo, password, direccion=None, fecha_nacimiento=None, telefono=None):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            hashed_password = hash_password(password) 
-            
-            # Sentencia SQL           
-            cursor.execute("""
-                INSERT INTO users (
-                    tipo_identificacion,
-                    numero_identificacion,
-                    nombre,
-                    apellido,
-                    direccion,
-                    fecha_nacimiento,
-                    correo,
-                    password_hash,
-                    telefono
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                tipo_identificacion, 
-                numero_identificacion, 
-                nombre, 
-                apellido, 
-                direccion, 
-                fecha_nacimiento,   
-                correo,             
-                hashed_password,    
-                telefono            
-            )) 
-                
-            conn.commit()
-            messagebox.showinfo("Éxito", "Usuario insertado correctamente.")
-            return True
-        except mariadb.Error as e:
-            messagebox.showerror("Error", f"Error al insertar usuario: {e}")
-            return False
-        finally:
-            cursor.close()
-            conn.close()
+    try:
+        user_id = get_repository().insert_user(
+            tipo_identificacion, 
+            numero_identificacion, 
+            nombre, 
+            apellido, 
+            correo,             
+            password,    
+            direccion, 
+            fecha_nacimiento,   
+            telefono            
+        )
+        run_in_ui(messagebox.showinfo, "Éxito", "Usuario insertado correctamente.")
+        return user_id  # ID asignado por la base de datos
+    except DuplicateUserError as e:
+        run_in_ui(messagebox.showerror, "Error", str(e))
+        return False
+    except RepositoryError as e:
+        show_repository_error(e, "Error al insertar usuario")
+        return False
             
 def get_users():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                SELECT id, tipo_identificacion, numero_identificacion, 
-                       nombre, apellido, direccion, fecha_nacimiento, telefono 
-                FROM users
-            """)
-            users = cursor.fetchall()
-            return users
-        except mariadb.Error as e:
-            messagebox.showerror("Error", f"Error al obtener usuarios: {e}")
-            return []
-        finally:
-            cursor.close()
-            conn.close()  
+    try:
+        return get_repository().get_users()
+    except RepositoryError as e:
+        show_repository_error(e, "Error al obtener usuarios")
+        return []
 
-def validated_users():
-    resultado_validacion = False
+def get_users_page(after_id=None, before_id=None, limit=100, filtros=None):
+    """Obtiene una página de usuarios ordenada por id usando paginación por llave.
+    filtros limita la página a los usuarios que coinciden con la búsqueda."""
+    try:
+        return get_repository().get_users_page(after_id, before_id, limit, filtros)
+    except RepositoryError as e:
+        show_repository_error(e, "Error al obtener usuarios")
+        return []
 
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                SELECT 
-                    COUNT(*)
-                FROM 
-                    users;
-            """)
-            
-            
-            count = cursor.fetchone()[0]
-            if count > 0:
-                print("Usuarios existen en la base de datos.")
-                resultado_validacion = True
-            else: 
-                print("No hay usuarios en la base de datos.")
-                resultado_validacion = False
-                
-        except mariadb.Error as e:
-            messagebox.showerror("Error", f"Error validar usuarios en la base de datos: {e}")
-            return resultado_validacion
-        finally:
-            cursor.close()
-            conn.close()
-        
-        return resultado_validacion           
+def get_users_changes(since, first_id, last_id, filtros=None):
+    """Cambios desde la marca since y conteo de la ventana (ver UserRepository.get_users_changes)"""
+    try:
+        return get_repository().get_users_changes(since, first_id, last_id, filtros)
+    except RepositoryError as e:
+        print(f"Error al consultar cambios de usuarios: {e}")
+        return None
 
-            
+def bootstrap():
+    """Comprobaciones del arranque con una sola conexión: esquema al día y si hay
+    usuarios registrados. Devuelve True si hay usuarios."""
+    try:
+        aplicadas, hay_usuarios = get_repository().bootstrap()
+    except MigrationError as e:
+        print(e)
+        run_in_ui(messagebox.showwarning, "Migración pendiente", str(e))
+        return validated_users()
+    except RepositoryError as e:
+        show_repository_error(e, "Error al verificar la base de datos")
+        return False
+    if aplicadas:
+        print(f"Migraciones aplicadas: {aplicadas}")
+    return hay_usuarios
 
-def update_user(user_id, tipo_identificacion, numero_identificacion, nombre, apellido, correo, direccion=None, telefono=None, fecha_nacimiento=None, password=None):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            if password:
-                hashed_password = hash_password(password)
-                cursor.execute("""
-                    UPDATE users SET 
-                        tipo_identificacion = ?,
-                        numero_identificacion = ?,
-                        nombre = ?,
-                        apellido = ?,
-                        direccion = ?,
-                        telefono = ?,
-                        fecha_nacimiento = ?,
-                        correo = ?,
-                        password_hash = ?
-                    WHERE id = ?
-                """, (tipo_identificacion, numero_identificacion, nombre, apellido, 
-                      direccion, telefono, fecha_nacimiento, correo, hashed_password, user_id))
-            else:                
-                cursor.execute("""
-                    UPDATE users SET 
-                        tipo_identificacion = ?,
-                        numero_identificacion = ?,
-                        nombre = ?,
-                        apellido = ?,
-                        direccion = ?, 
-                        telefono = ?,
-                        fecha_nacimiento = ?,
-                        correo = ?
-                    WHERE id = ?
-                    """, (tipo_identificacion, numero_identificacion, nombre, apellido, 
-                          direccion, telefono, fecha_nacimiento, correo, user_id))
-            
-            conn.commit()
-            messagebox.showinfo("Éxito", "Usuario actualizado correctamente.")
+def validated_users():
+    try:
+        if get_repository().has_users():
+            print("Usuarios existen en la base de datos.")
             return True
-        except mariadb.Error as e:
-            messagebox.showerror("Error", f"Error al actualizar usuario: {e}")
-            return False
-        finally:
-            cursor.close()
-            conn.close()
+        print("No hay usuarios en la base de datos.")
+        return False
+    except RepositoryError as e:
+        show_repository_error(e, "Error validar usuarios en la base de datos")
+        return False
+
+def update_user(user_id, tipo_identificacion, numero_identificacion, nombre, apellido, correo, direccion=None, telefono=None, fecha_nacimiento=None, password=None, version=None):
+    """Actualiza el usuario si sigue en la versión indicada. Devuelve la lista de
+    columnas modificadas (vacía si no hubo cambios) o None si falló."""
+    try:
+        cambios = get_repository().update_user(user_id, tipo_identificacion, numero_identificacion, nombre,
+                                               apellido, correo, direccion, telefono, fecha_nacimiento, password,
+                                               expected_version=version)
+        if cambios:
+            run_in_ui(messagebox.showinfo, "Éxito", "Usuario actualizado correctamente.")
+        else:
+            run_in_ui(messagebox.showinfo, "Sin cambios", "No se modificó ningún dato del usuario.")
+        return cambios
+    except DuplicateUserError:
+        run_in_ui(messagebox.showerror, "Error", "Ya existe otro usuario con ese correo o con ese tipo y número de identificación.")
+        return None
+    except ConflictError as e:
+        run_in_ui(messagebox.showwarning, "Registro modificado", str(e))
+        return None
+    except RepositoryError as e:
+        show_repository_error(e, "Error al actualizar usuario")
+        return None
     
 def change_password(user_id, new_password) -> bool:
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
+    try:
+        get_repository().change_password(user_id, new_password)
+        # Con la contraseña cambiada, las sesiones abiertas de ese usuario dejan de valer
         try:
-            hashed_password = hash_password(new_password)
-            cursor.execute(
-                "UPDATE users SET password_hash = ? WHERE id = ?",
-                (hashed_password, user_id)
-            )
-            conn.commit()
-            messagebox.showinfo('Éxito', 'Contraseña actualizada correctamente.')
-            return True
-        except mariadb.Error as e:
-            messagebox.showerror('Error', f'Error al cambiar contraseña: {e}')
-            return False
-        finally:
-            cursor.close()
-            conn.close()
+            get_session_manager().revoke_user(user_id)
+        except (OSError, *get_repository().driver_errors) as e:
+            logger.warning(f"No se pudieron revocar las sesiones del usuario {user_id}: {e}")
+        run_in_ui(messagebox.showinfo, 'Éxito', 'Contraseña actualizada correctamente.')
+        return True
+    except RepositoryError as e:
+        show_repository_error(e, 'Error al cambiar contraseña')
+        return False
             
-def authenticate_user(correo, password):
-    """Autentica un usuario por correo y contraseña"""
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        try:
-            cursor.execute("""
-                SELECT id, tipo_identificacion, numero_identificacion, nombre, apellido, 
-                       direccion, telefono, fecha_nacimiento, correo, password_hash 
-                FROM users WHERE correo = ?
-            """, (correo,))
-            user = cursor.fetchone()
-            if user and verify_password(password, user['password_hash']):
-                return user
-            else:
-                return None
-        except mariadb.Error as e:
-            messagebox.showerror("Error", f"Error al autenticar usuario: {e}")
-            return None
-        finally:
-            cursor.close()
-            conn.close()
+def authenticate_user(correo, password, client=CLIENT_ID):
+    """Autentica un usuario por correo y contraseña. LoginLockedError se propaga
+    para que la ventana de inicio de sesión informe cuánto debe esperar."""
+    try:
+        return get_repository().authenticate_user(correo, password, client)
+    except RepositoryError as e:
+        show_repository_error(e, "Error al autenticar usuario")
+        return None
             
-def get_user_by_id(user_id):
-    """Obtiene todos los datos de un usuario específico por su ID"""
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
+def login_user(correo, password, client=CLIENT_ID):
+    """Autentica y, si las credenciales son correctas, abre una sesión y guarda su
+    token localmente. Si la sesión no se puede guardar el inicio de sesión sigue."""
+    user = authenticate_user(correo, password, client)
+    if user:
         try:
-            cursor.execute("""
-                SELECT id, tipo_identificacion, numero_identificacion, nombre, apellido, 
-                       direccion, telefono, fecha_nacimiento, correo, password_hash 
-                FROM users WHERE id = ?
-            """, (user_id,))
-            user = cursor.fetchone()
-            return user
-        except mariadb.Error as e:
-            messagebox.showerror("Error", f"Error al obtener usuario por ID: {e}")
-            return None
-        finally:
-            cursor.close()
-            conn.close()
-
-def delete_user(user_id):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
+            session_file().save(get_session_manager().issue(user['id'], client))
+        except (OSError, RepositoryError, *get_repository().driver_errors) as e:
+            logger.warning(f"No se pudo guardar la sesión: {e}")
+    return user
+
+def restore_session():
+    """Usuario de la sesión guardada si su token sigue vigente (firma HMAC, sin
+    bcrypt); None si no hay sesión o venció, fue revocada o el usuario ya no existe"""
+    archivo = session_file()
+    token = archivo.load()
+    if not token:
+        return None
+    try:
+        session = get_session_manager().validate(token)
+        user = get_repository().get_user_by_id(session.user_id) if session else None
+    except (OSError, RepositoryError, *get_repository().driver_errors) as e:
+        logger.warning(f"No se pudo validar la sesión guardada: {e}")
+        return None
+    if user is None:
+        archivo.clear()
+        return None
+    return {'id': user[0], 'nombre': user[3], 'apellido': user[4], 'correo': user[8]}
+
+def logout():
+    """Revoca la sesión guardada y borra su token"""
+    archivo = session_file()
+    token = archivo.load()
+    archivo.clear()
+    if token:
         try:
-            cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            conn.commit()
-            messagebox.showinfo("Éxito", "Usuario eliminado correctamente.")
-            return True
-        except mariadb.Error as e:
-            messagebox.showerror("Error", f"Error al eliminar usuario: {e}")
-            return False
-        finally:
-            cursor.close()
-            conn.close()
+            get_session_manager().revoke(token)
+        except (OSError, RepositoryError, *get_repository().driver_errors) as e:
+            logger.warning(f"No se pudo revocar la sesión: {e}")
+
+def get_user_by_id(user_id):
+    """Obtiene todos los datos de un usuario específico por su ID (con caché)"""
+    try:
+        return get_repository().get_user_by_id(user_id)
+    except RepositoryError as e:
+        show_repository_error(e, "Error al obtener usuario por ID")
+        return None
+
+def get_user_by_correo(correo):
+    """Obtiene todos los datos de un usuario por su correo (con caché)"""
+    try:
+        return get_repository().get_user_by_correo(correo)
+    except RepositoryError as e:
+        show_repository_error(e, "Error al obtener usuario por correo")
+        return None
+
+def delete_user(user_id, version=None):
+    try:
+        get_repository().delete_user(user_id, expected_version=version)
+        run_in_ui(messagebox.showinfo, "Éxito", "Usuario eliminado correctamente.")
+        return True
+    except ConflictError as e:
+        run_in_ui(messagebox.showwarning, "Registro modificado", str(e))
+        return False
+    except RepositoryError as e:
+        show_repository_error(e, "Error al eliminar usuario")
+        return False
+
+
+def delete_users(versions):
+    """Elimina varios usuarios ({id: versión leída}); devuelve los id eliminados"""
+    try:
+        deleted = get_repository().delete_users(list(versions), versions)
+    except RepositoryError as e:
+        show_repository_error(e, "Error al eliminar usuarios")
+        return []
+    omitidos = len(versions) - len(deleted)
+    if omitidos:
+        run_in_ui(messagebox.showwarning, "Registros modificados",
+                  f"Se eliminaron {len(deleted)} usuarios. {omitidos} no se eliminaron porque otro "
+                  f"usuario los modificó o ya no existían.")
+    else:
+        run_in_ui(messagebox.showinfo, "Éxito", f"Se eliminaron {len(deleted)} usuarios.")
+    return deleted
 
 
 # --- Interfaz Gráfica con Tkinter ---
+class VirtualUserGrid:
+    """Mantiene en el Treeview solo una ventana de filas que se recorre por páginas.
+    Las consultas se hacen en el ejecutor de fondo; solo una carga está en curso a la vez."""
+
+    def __init__(self, tree, scrollbar, fetch_page, executor, page_size=100, max_rows=300, prefetch=0.15):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.fetch_page = fetch_page
+        self.executor = executor
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.prefetch = prefetch
+
+        self.has_more_before = False
+        self.has_more_after = False
+        self.filtros = None  # búsqueda activa, para contar las filas de la ventana
+        self.since = None  # marca de tiempo del servidor del último sondeo
+        self.max_id = None
+        self._task = None
+
+        self.tree.configure(yscrollcommand=self.on_yscroll)
+        self.scrollbar.configure(command=self.tree.yview)
+
+    @property
+    def loading(self):
+        return self._task is not None
+
+    def _submit(self, func, on_done, *args, **kwargs):
+        def done(result):
+            self._task = None
+            on_done(result)
+
+        def error(e):
+            self._task = None
+            print(f"Error al cargar la tabla de usuarios: {e}")
+
+        self._task = self.executor.submit(func, *args, on_done=done, on_error=error, **kwargs)
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        """Vacía la ventana y carga la primera página"""
+        self.cancel()
+        self.tree.delete(*self.tree.get_children())
+
+        def done(rows):
+            for row in rows:
+                self.tree.insert("", "end", iid=str(row[0]), values=row)
+            self.has_more_before = False
+            self.has_more_after = len(rows) == self.page_size
+            self.tree.yview_moveto(0)
+
+        self._submit(self.fetch_page, done, limit=self.page_size)
+
+    def _window_bounds(self):
+        children = self.tree.get_children()
+        if not children:
+            return 0, 0
+        return int(children[0]), int(children[-1])
+
+    def append_row(self, row):
+        """Agrega una fila nueva si la ventana está en el final de la tabla"""
+        if not self.has_more_after and not self.tree.exists(str(row[0])):
+            self.tree.insert("", "end", iid=str(row[0]), values=row)
+
+    def update_row(self, row):
+        """Reescribe una fila si está en la ventana"""
+        if self.tree.exists(str(row[0])):
+            self.tree.item(str(row[0]), values=row)
+
+    def remove_row(self, user_id):
+        """Quita una fila si está en la ventana"""
+        if self.tree.exists(str(user_id)):
+            self.tree.delete(str(user_id))
+
+    @staticmethod
+    def row_version(values):
+        """Versión de una fila de la tabla (última columna de LIST_FIELDS)"""
+        return int(values[-1]) if values else 0
+
+    def version_of(self, user_id):
+        if self.tree.exists(str(user_id)):
+            return self.row_version(self.tree.item(str(user_id))['values'])
+        return None
+
+    def reconcile(self):
+        """Pide solo los cambios desde el último sondeo y los aplica por versión"""
+        if self.loading:
+            return
+        first_id, last_id = self._window_bounds()
+
+        def done(result):
+            if self.loading or result is None:
+                return
+            marca, max_id, count, rows = result
+            first_poll = self.since is None
+            previous_max = self.max_id
+            self.since, self.max_id = marca, max_id
+            if first_poll:
+                return
+
+            children = self.tree.get_children()
+            if not children:
+                if max_id and max_id != previous_max:
+                    self.reset()
+                return
+
+            stale = False
+            for row in rows:
+                known = self.version_of(row[0])
+                if known is not None:
+                    if self.row_version(row) > known:
+                        if self.filtros:
+                            # Con búsqueda la fila puede haber dejado de coincidir
+                            stale = True
+                        else:
+                            self.update_row(row)
+                elif row[0] > last_id and not self.has_more_after and not self.filtros:
+                    self.append_row(row)
+
+            # Filas eliminadas por otros (o nuevas que coinciden con la búsqueda)
+            if stale or count != len([i for i in self.tree.get_children() if int(i) <= last_id]):
+                self.refresh_window()
+            elif self.filtros and max_id != previous_max and not self.has_more_after:
+                self.load_next()
+
+        self.executor.submit(get_users_changes, self.since, first_id, last_id, self.filtros, on_done=done)
+
+    def refresh_window(self):
+        """Vuelve a leer las filas de la ventana actual (no la tabla completa)"""
+        children = self.tree.get_children()
+        if not children or self.loading:
+            return
+
+        def done(rows):
+            anchor = self._top_item()
+            self.tree.delete(*self.tree.get_children())
+            for row in rows:
+                self.tree.insert("", "end", iid=str(row[0]), values=row)
+            self._restore_top(anchor)
+
+        self._submit(self.fetch_page, done, after_id=int(children[0]) - 1,
+                     limit=max(len(children), self.page_size))
+
+    def on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        first, last = float(first), float(last)
+        # Sin desbordamiento (o sin dibujar aún) no hay desplazamiento que atender
+        if self.loading or last - first >= 1:
+            return
+        if last >= 1 - self.prefetch and self.has_more_after:
+            self.load_next()
+        elif first <= self.prefetch and self.has_more_before:
+            self.load_previous()
+
+    def _top_item(self):
+        children = self.tree.get_children()
+        if not children:
+            return None
+        index = int(self.tree.yview()[0] * len(children))
+        return children[min(index, len(children) - 1)]
+
+    def _restore_top(self, item):
+        children = self.tree.get_children()
+        if item and children and self.tree.exists(item):
+            self.tree.yview_moveto(self.tree.index(item) / len(children))
+
+    def load_next(self):
+        """Agrega la página siguiente al final y descarta filas sobrantes del inicio"""
+        children = self.tree.get_children()
+        if not children or self.loading:
+            return
+
+        def done(rows):
+            anchor = self._top_item()
+            for row in rows:
+                if not self.tree.exists(str(row[0])):
+                    self.tree.insert("", "end", iid=str(row[0]), values=row)
+            self.has_more_after = len(rows) == self.page_size
+
+            children = self.tree.get_children()
+            excess = len(children) - self.max_rows
+            if excess > 0:
+                self.tree.delete(*children[:excess])
+                self.has_more_before = True
+            self._restore_top(anchor)
+
+        self._submit(self.fetch_page, done, after_id=int(children[-1]), limit=self.page_size)
+
+    def load_previous(self):
+        """Agrega la página anterior al inicio y descarta filas sobrantes del final"""
+        children = self.tree.get_children()
+        if not children or self.loading:
+            return
+
+        def done(rows):
+            anchor = self._top_item()
+            self.has_more_before = len(rows) == self.page_size
+            rows = [row for row in rows if not self.tree.exists(str(row[0]))]
+            for index, row in enumerate(rows):
+                self.tree.insert("", index, iid=str(row[0]), values=row)
+
+            children = self.tree.get_children()
+            excess = len(children) - self.max_rows
+            if excess > 0:
+                self.tree.delete(*children[-excess:])
+                self.has_more_after = True
+            self._restore_top(anchor)
+
+        self._submit(self.fetch_page, done, before_id=int(children[0]), limit=self.page_size)
+
+
 class LoginWindow:
     def __init__(self, master):
         self.master = master
@@ -303,6 +499,7 @@ class LoginWindow:
         
         self.center_window()
         self.user_data = None
+        self.executor = TkExecutor(self.master, max_workers=1, on_busy=self.set_busy)
         self.create_widgets()
     
     def center_window(self):
@@ -349,7 +546,7 @@ class LoginWindow:
         button_frame = tk.Frame(main_frame)
         button_frame.pack(pady=20)
         
-        tk.Button(
+        self.login_button = tk.Button(
             button_frame,
             text="Iniciar Sesión",
             command=self.login,
@@ -357,7 +554,8 @@ class LoginWindow:
             bg="#4CAF50",
             fg="white",
             font=("Arial", 10, "bold")
-        ).pack(side=tk.LEFT, padx=5)
+        )
+        self.login_button.pack(side=tk.LEFT, padx=5)
         
         tk.Button(
             button_frame,
@@ -368,6 +566,15 @@ class LoginWindow:
             fg="white",
             font=("Arial", 10)
         ).pack(side=tk.LEFT, padx=5)
+
+        # Indicador de trabajo en curso
+        self.status_label = tk.Label(main_frame, text="", font=("Arial", 9), fg="gray")
+        self.status_label.pack()
+
+    def set_busy(self, busy):
+        self.login_button.config(state='disabled' if busy else 'normal')
+        self.status_label.config(text="Verificando credenciales..." if busy else "")
+        self.master.config(cursor='watch' if busy else '')
     
     def login(self):
         correo = self.correo_entry.get().strip()
@@ -389,15 +596,25 @@ class LoginWindow:
             self.correo_entry.focus()
             return
         
-        # Autenticar
-        user = authenticate_user(correo, password)
-        
+        # Autenticar en segundo plano (bcrypt y la consulta no bloquean la ventana)
+        self.executor.submit(login_user, correo, password, on_done=self.on_authenticated,
+                             on_error=self.on_login_error)
+
+    def on_login_error(self, error):
+        if isinstance(error, LoginLockedError):
+            messagebox.showwarning("Inicio de sesión bloqueado", str(error))
+            self.password_entry.delete(0, tk.END)
+        else:
+            messagebox.showerror("Error", f"Error al autenticar usuario: {error}")
+
+    def on_authenticated(self, user):
         if user:
             self.user_data = user
             messagebox.showinfo(
                 "Bienvenido",
                 f"¡Bienvenido {user['nombre']} {user['apellido']}!"
             )
+            self.executor.shutdown()
             self.master.destroy()
         else:
             messagebox.showerror(
@@ -411,9 +628,17 @@ class UserApp:
         self.master = master
         master.title("CRUD de Usuarios")
         master.geometry("1300x800")
+        master.protocol("WM_DELETE_WINDOW", self.close)
 
+        # Las consultas y bcrypt corren en hilos; los resultados vuelven con after()
+        self.executor = TkExecutor(master, on_busy=self.set_busy)
+        self._select_task = None
+        self._search_after = None
+        self.form_user_id = self.form_version = None
+        self.search_filters = None
         self.create_widgets()
         self.load_users()
+        self.master.after(GRID_POLL_MS, self.poll_changes)
 
     def create_widgets(self):
         # Frame para entrada de datos
@@ -458,6 +683,7 @@ class UserApp:
         self.direccion_entry.grid(row=5, column=1, pady=5, sticky="ew")
 
         tk.Label(input_frame, text="Fecha de Nacimiento:").grid(row=6, column=0, pady=5, sticky="w")
+        from tkcalendar import DateEntry  # se carga con la ventana principal, no al iniciar sesión
         self.fecha_nacimiento_entry = DateEntry(input_frame, selectmode='day', date_pattern='yyyy-mm-dd')
         self.fecha_nacimiento_entry.grid(row=6, column=1, pady=5, sticky="ew")
 
@@ -482,12 +708,14 @@ class UserApp:
         tk.Button(button_frame, text="Eliminar Usuario", command=self.delete_selected_user).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Limpiar Campos", command=self.clear_fields).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Cambiar Contraseña", command=self.open_change_password_window).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Importar Usuarios", command=self.import_users_file).pack(side=tk.LEFT, padx=5)
         # --- Botón para salir ---
-        tk.Button(button_frame, text="Salir", command=self.master.destroy, bg="red", fg="white").pack(side=tk.RIGHT, padx=15)
+        tk.Button(button_frame, text="Salir", command=self.close, bg="red", fg="white").pack(side=tk.RIGHT, padx=15)
+        tk.Button(button_frame, text="Cerrar Sesión", command=self.logout).pack(side=tk.RIGHT, padx=5)
 
 
         # Treeview para mostrar usuarios
-        self.tree = ttk.Treeview(self.master, columns=("ID", "Tipo de identificación", "Número de identificación","Nombre", "Apellido", "Dirección", "Fecha de Nacimiento", "Telefono"), show="headings")
+        self.tree = ttk.Treeview(self.master, columns=("ID", "Tipo de identificación", "Número de identificación","Nombre", "Apellido", "Dirección", "Fecha de Nacimiento", "Telefono"), show="headings", selectmode="extended")
         self.tree.heading("ID", text="ID")
         self.tree.heading("Tipo de identificación", text="Tipo de identificación")
         self.tree.heading("Número de identificación", text="Número de identificación")
@@ -507,17 +735,113 @@ class UserApp:
         self.tree.column("Fecha de Nacimiento", width=150, anchor="center")
         self.tree.column("Telefono", width=150, anchor="center")
 
+        # Barra de búsqueda: cada filtro se aplica en el servidor al dejar de escribir
+        search_frame = tk.LabelFrame(self.master, text="Buscar", padx=10, pady=5)
+        search_frame.pack(padx=10, fill="x")
+
+        self.search_entries = {}
+        campos_busqueda = [
+            ('nombre', "Nombre/Apellido:"),
+            ('correo', "Correo:"),
+            ('numero_identificacion', "Número ID:"),
+            ('telefono', "Teléfono:"),
+            ('fecha_desde', "Nacido desde (AAAA-MM-DD):"),
+            ('fecha_hasta', "hasta:"),
+        ]
+        for indice, (campo, texto) in enumerate(campos_busqueda):
+            fila, columna = divmod(indice, 3)
+            tk.Label(search_frame, text=texto).grid(row=fila, column=columna * 2, padx=(0, 5), pady=2, sticky="w")
+            entry = tk.Entry(search_frame, width=20)
+            entry.grid(row=fila, column=columna * 2 + 1, padx=(0, 15), pady=2, sticky="ew")
+            entry.bind("<KeyRelease>", self.schedule_search)
+            self.search_entries[campo] = entry
+
+        tk.Label(search_frame, text="Tipo ID:").grid(row=0, column=6, padx=(0, 5), sticky="w")
+        self.search_tipo_var = tk.StringVar(self.master, value='')
+        tk.OptionMenu(search_frame, self.search_tipo_var, '', 'CC', 'NIT', 'PAS', 'CE').grid(row=0, column=7, sticky="ew")
+        self.search_tipo_var.trace_add('write', lambda *args: self.schedule_search())
+        tk.Button(search_frame, text="Limpiar búsqueda", command=self.clear_search).grid(row=1, column=6, columnspan=2, sticky="ew")
+
+        # Barra de estado con indicador de actividad
+        status_frame = tk.Frame(self.master)
+        status_frame.pack(side=tk.BOTTOM, fill="x", padx=10, pady=(0, 5))
+        self.status_label = tk.Label(status_frame, text="Listo", fg="gray")
+        self.status_label.pack(side=tk.LEFT)
+        self.cancel_button = tk.Button(status_frame, text="Cancelar", command=self.cancel_tasks, state='disabled')
+        self.cancel_button.pack(side=tk.RIGHT)
+
+        scrollbar = ttk.Scrollbar(self.master, orient="vertical")
+        scrollbar.pack(side=tk.RIGHT, fill="y", pady=10)
         self.tree.pack(padx=10, pady=10, fill="both", expand=True)
         self.tree.bind("<ButtonRelease-1>", self.on_tree_select)
+
+        # Solo se mantienen en memoria las filas visibles más un margen de precarga
+        self.grid = VirtualUserGrid(self.tree, scrollbar, get_users_page, self.executor)
         
         # Función para cambiar la contraseña
 
+    def set_busy(self, busy):
+        """Indicador de trabajo en segundo plano"""
+        self.status_label.config(text="Procesando..." if busy else "Listo")
+        self.cancel_button.config(state='normal' if busy else 'disabled')
+        self.master.config(cursor='watch' if busy else '')
+
+    def cancel_tasks(self):
+        """Descarta los resultados pendientes; la tabla se vuelve a sincronizar"""
+        self.grid.cancel()
+        self.executor.cancel_all()
+        self.load_users()
+
+    def close(self):
+        self.executor.shutdown()
+        close_repository()
+        write_metrics()
+        self.master.destroy()
+
+    def logout(self):
+        """Revoca la sesión guardada; el próximo inicio pedirá la contraseña"""
+        if messagebox.askyesno("Cerrar sesión", "¿Cerrar la sesión y salir de la aplicación?"):
+            self.executor.shutdown()
+            logout()
+            close_repository()
+            write_metrics()
+            self.master.destroy()
+
     def load_users(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        users = get_users()
-        for user in users:
-            self.tree.insert("", "end", values=user)
+        self.grid.reset()
+
+    def schedule_search(self, event=None):
+        """Espera a que el usuario deje de escribir antes de consultar"""
+        if self._search_after is not None:
+            self.master.after_cancel(self._search_after)
+        self._search_after = self.master.after(SEARCH_CONFIG['debounce_ms'], self.apply_search)
+
+    def apply_search(self):
+        self._search_after = None
+        filtros = {campo: entry.get().strip() for campo, entry in self.search_entries.items()}
+        filtros['tipo_identificacion'] = self.search_tipo_var.get()
+        for campo in ('fecha_desde', 'fecha_hasta'):
+            # Una fecha incompleta se ignora hasta que tenga el formato correcto
+            if filtros[campo] and not FECHA_RE.match(filtros[campo]):
+                filtros[campo] = ''
+        filtros = {campo: valor for campo, valor in filtros.items() if valor} or None
+        if filtros == self.search_filters:
+            return
+        self.search_filters = filtros
+        self.grid.fetch_page = functools.partial(get_users_page, filtros=filtros)
+        self.grid.filtros = filtros
+        self.load_users()
+
+    def clear_search(self):
+        for entry in self.search_entries.values():
+            entry.delete(0, tk.END)
+        self.search_tipo_var.set('')
+        self.apply_search()
+
+    def poll_changes(self):
+        """Revisa periódicamente cambios hechos por otros clientes"""
+        self.grid.reconcile()
+        self.master.after(GRID_POLL_MS, self.poll_changes)
             
     def obtener_valor(self):
         # Función para obtener el valor seleccionado usando .get()
@@ -526,6 +850,14 @@ class UserApp:
         
         return valor
 
+    def validar_formulario(self, record, omitir=()):
+        """Valida el registro completo; si hay errores los muestra todos en un diálogo"""
+        errores = validate_record(record, omitir=omitir)
+        if errores:
+            messagebox.showerror("Datos inválidos", "Corrija los siguientes datos:\n" + format_errors(errores))
+            return False
+        return True
+
     def add_user(self):
         tipo_identificacion = self.tipo_identificacion_var.get()
         numero_identificacion = self.numero_identificacion_entry.get().strip()
@@ -537,28 +869,23 @@ class UserApp:
         password = self.password_entry.get()
         telefono = self.telefono_entry.get().strip() or None
 
-        if (
-            not validar_obligatorio(numero_identificacion, 'número de identificación') or
-            not validar_obligatorio(nombre, 'nombre') or
-            not validar_obligatorio(apellido, 'apellido') or
-            not validar_obligatorio(correo, 'correo') or
-            not validar_obligatorio(password, 'password')
-        ): return
-        
-        if not validar_correo(correo):
-            messagebox.showerror('Error', "El formato del correo electronico es inválido")
+        # Se validan todos los campos a la vez y se informan todos los errores juntos
+        if not self.validar_formulario(dict(
+                tipo_identificacion=tipo_identificacion, numero_identificacion=numero_identificacion,
+                nombre=nombre, apellido=apellido, direccion=direccion, fecha_nacimiento=fecha_nacimiento_str,
+                correo=correo, password=password, telefono=telefono)):
             return
         
-        if telefono and not validar_telefono(telefono):
-            messagebox.showerror("Error", 
-                "El formato del teléfono no es válido.\n" +
-                "Ejemplos válidos:\n" +
-                "  +57 3001234567\n" +
-                "  3001234567 ext 123\n" +
-                "  +1 555-1234 extensión 789")
-            return
-        
-        if insert_user(
+        def done(user_id):
+            if user_id:
+                # Con una búsqueda activa el usuario nuevo puede no coincidir; lo resuelve la reconciliación
+                if not self.search_filters:
+                    self.grid.append_row((user_id, tipo_identificacion, numero_identificacion, nombre,
+                                          apellido, direccion, fecha_nacimiento_str, telefono, 1))
+                self.clear_fields()
+
+        self.executor.submit(
+                    insert_user,
                     tipo_identificacion,
                     numero_identificacion, 
                     nombre,
@@ -567,10 +894,9 @@ class UserApp:
                     password,    
                     direccion,   
                     fecha_nacimiento_str, 
-                    telefono    
-                ):
-            self.load_users()
-            self.clear_fields()
+                    telefono,
+                    on_done=done
+                )
 
     def update_selected_user(self):
         selected_item = self.tree.focus()
@@ -592,23 +918,29 @@ class UserApp:
         telefono = self.telefono_entry.get().strip() or None
         password = self.password_entry.get()
 
-        # Validaciones
-        if (not validar_obligatorio(numero_identificacion, 'número de identificación') or
-            not validar_obligatorio(nombre, 'nombre') or
-            not validar_obligatorio(apellido, 'apellido') or
-            not validar_obligatorio(correo, 'correo')):
+        # Validaciones (la contraseña es opcional al actualizar)
+        if not self.validar_formulario(dict(
+                tipo_identificacion=tipo_identificacion, numero_identificacion=numero_identificacion,
+                nombre=nombre, apellido=apellido, direccion=direccion, fecha_nacimiento=fecha_nacimiento_str,
+                correo=correo, telefono=telefono), omitir=('password',)):
             return
 
-        if not validar_correo(correo):
-            messagebox.showerror("Error", "El formato del correo electrónico no es válido.")
-            return
+        # Versión que vio el operador: la del registro cargado en el formulario
+        version = self.form_version if self.form_user_id == user_id else self.grid.version_of(user_id)
 
-        if telefono and not validar_telefono(telefono):
-            messagebox.showerror("Error", "El formato del teléfono no es válido.")
-            return
+        def done(cambios):
+            if cambios is None:
+                # Conflicto o error: se muestran los datos actuales
+                self.grid.refresh_window()
+                return
+            if cambios and version is not None:
+                self.grid.update_row((user_id, tipo_identificacion, numero_identificacion, nombre,
+                                      apellido, direccion, fecha_nacimiento_str, telefono, version + 1))
+            self.clear_fields()
 
         # Llamada ÚNICA a la base de datos
-        if update_user(
+        self.executor.submit(
+            update_user,
             user_id, 
             tipo_identificacion, 
             numero_identificacion, 
@@ -618,83 +950,121 @@ class UserApp:
             direccion, 
             telefono, 
             fecha_nacimiento_str, 
-            password
-        ):
-            self.load_users()
-            self.clear_fields()
+            password,
+            version,
+            on_done=done
+        )
 
     def delete_selected_user(self):
-        selected_item = self.tree.focus()
+        selected = self.tree.selection()
+        if len(selected) > 1:
+            self.delete_selected_users(selected)
+            return
+        selected_item = selected[0] if selected else self.tree.focus()
         if not selected_item:
             messagebox.showwarning("Selección Requerida", "Por favor, seleccione un usuario de la tabla para eliminar.")
             return
 
-        user_id = self.tree.item(selected_item)['values'][0]
+        values = self.tree.item(selected_item)['values']
+        user_id = values[0]
         if messagebox.askyesno("Confirmar Eliminación", f"¿Está seguro de que desea eliminar al usuario con ID {user_id}?"):
-            if delete_user(user_id):
-                self.load_users()
+            def done(deleted):
+                if deleted:
+                    self.grid.remove_row(user_id)
+                    self.clear_fields()
+                else:
+                    self.grid.refresh_window()
+
+            self.executor.submit(delete_user, user_id, self.grid.row_version(values), on_done=done)
+
+    def delete_selected_users(self, items):
+        """Elimina en una sola operación las filas seleccionadas (Ctrl/Shift + clic)"""
+        if not messagebox.askyesno("Confirmar Eliminación",
+                                   f"¿Está seguro de que desea eliminar los {len(items)} usuarios seleccionados?"):
+            return
+        versions = {}
+        for item in items:
+            values = self.tree.item(item)['values']
+            versions[int(values[0])] = self.grid.row_version(values)
+
+        def done(deleted):
+            for user_id in deleted:
+                self.grid.remove_row(user_id)
+            if self.form_user_id in deleted:
                 self.clear_fields()
+            if len(deleted) < len(versions):
+                self.grid.refresh_window()
+
+        self.executor.submit(delete_users, versions, on_done=done)
 
     def on_tree_select(self, event):
         """Maneja el evento de selección en el Treeview y carga los datos del usuario"""
         selected_item = self.tree.focus()
         if selected_item:
             user_id = self.tree.item(selected_item)['values'][0]
-            user = get_user_by_id(user_id)
-            
-            if user:
+            # Una selección nueva reemplaza la consulta anterior si aún no terminó
+            if self._select_task is not None:
+                self._select_task.cancel()
+            self._select_task = self.executor.submit(get_user_by_id, user_id, on_done=self.fill_form)
+
+    def fill_form(self, user):
+        """Carga en el formulario los datos del usuario seleccionado"""
+        self._select_task = None
+        if user:
+            self.form_user_id, self.form_version = user[0], user[10]
                 
-                self.id_entry.config(state='normal')
-                self.id_entry.delete(0, tk.END)
-                self.id_entry.insert(0, user[0])  # ID
-                self.id_entry.config(state='disabled')
+            self.id_entry.config(state='normal')
+            self.id_entry.delete(0, tk.END)
+            self.id_entry.insert(0, user[0])  # ID
+            self.id_entry.config(state='disabled')
                 
-                self.tipo_identificacion_var.set(user[1])  # tipo_identificacion
+            self.tipo_identificacion_var.set(user[1])  # tipo_identificacion
                 
-                self.numero_identificacion_entry.delete(0, tk.END)
-                self.numero_identificacion_entry.insert(0, user[2])  # numero_identificacion
+            self.numero_identificacion_entry.delete(0, tk.END)
+            self.numero_identificacion_entry.insert(0, user[2])  # numero_identificacion
                 
-                # Cargar nombre
-                self.nombre_entry.delete(0, tk.END)
-                self.nombre_entry.insert(0, user[3])  # nombre
+            # Cargar nombre
+            self.nombre_entry.delete(0, tk.END)
+            self.nombre_entry.insert(0, user[3])  # nombre
                 
-                # Cargar apellido
-                self.apellido_entry.delete(0, tk.END)
-                self.apellido_entry.insert(0, user[4])  # apellido
+            # Cargar apellido
+            self.apellido_entry.delete(0, tk.END)
+            self.apellido_entry.insert(0, user[4])  # apellido
                 
-                # Cargar dirección
-                self.direccion_entry.delete(0, tk.END)
-                if user[5]:  # direccion
-                    self.direccion_entry.insert(0, user[5])
+            # Cargar dirección
+            self.direccion_entry.delete(0, tk.END)
+            if user[5]:  # direccion
+                self.direccion_entry.insert(0, user[5])
                 
-                # Cargar teléfono
-                self.telefono_entry.delete(0, tk.END)
-                if user[6]:  # telefono
-                    self.telefono_entry.insert(0, user[6])
+            # Cargar teléfono
+            self.telefono_entry.delete(0, tk.END)
+            if user[6]:  # telefono
+                self.telefono_entry.insert(0, user[6])
                 
-                # Cargar fecha de nacimiento (usando DateEntry)
-                if user[7]:  # fecha_nacimiento
-                    try:
-                        # Convertir fecha a objeto datetime
-                        if isinstance(user[7], str):
-                            date_obj = datetime.strptime(user[7], '%Y-%m-%d').date()
-                        else:
-                            # Si ya es un objeto date de la BD
-                            date_obj = user[7]
+            # Cargar fecha de nacimiento (usando DateEntry)
+            if user[7]:  # fecha_nacimiento
+                try:
+                    # Convertir fecha a objeto datetime
+                    if isinstance(user[7], str):
+                        date_obj = datetime.strptime(user[7], '%Y-%m-%d').date()
+                    else:
+                        # Si ya es un objeto date de la BD
+                        date_obj = user[7]
                         
-                        self.fecha_nacimiento_entry.set_date(date_obj)
-                    except (ValueError, AttributeError) as e:
-                        print(f"Error al cargar fecha: {e}")
+                    self.fecha_nacimiento_entry.set_date(date_obj)
+                except (ValueError, AttributeError) as e:
+                    print(f"Error al cargar fecha: {e}")
                 
-                # Cargar correo
-                self.correo_entry.delete(0, tk.END)
-                self.correo_entry.insert(0, user[8])  # correo
+            # Cargar correo
+            self.correo_entry.delete(0, tk.END)
+            self.correo_entry.insert(0, user[8])  # correo
                 
-                # Limpiar campo de contraseña (por seguridad no se muestra)
-                self.password_entry.delete(0, tk.END)    
+            # Limpiar campo de contraseña (por seguridad no se muestra)
+            self.password_entry.delete(0, tk.END)    
             
     def clear_fields(self):
         """Limpia todos los campos del formulario"""
+        self.form_user_id = self.form_version = None
         self.id_entry.config(state='normal')
         self.id_entry.delete(0, tk.END)
         self.id_entry.config(state='disabled')
@@ -709,6 +1079,36 @@ class UserApp:
         self.correo_entry.delete(0, tk.END)
         self.password_entry.delete(0, tk.END)
     
+    def import_users_file(self):
+        """Importa usuarios desde un archivo CSV o JSONL en segundo plano"""
+        path = filedialog.askopenfilename(
+            title="Importar usuarios",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Todos", "*.*")]
+        )
+        if not path:
+            return
+
+        from importar_usuarios import import_users
+
+        report_path = path + ".errores.csv"
+
+        def progress(result):
+            run_in_ui(self.status_label.config,
+                      text=f"Importando... {result.inserted} insertados, {len(result.errors)} errores")
+
+        def done(result):
+            mensaje = result.summary()
+            if result.errors:
+                mensaje += f"\n\nDetalle de errores en:\n{report_path}"
+            messagebox.showinfo("Importación terminada", mensaje)
+            self.load_users()
+
+        def error(e):
+            messagebox.showerror("Error", f"Error al importar usuarios: {e}")
+
+        self.executor.submit(import_users, path, report_path=report_path, progress=progress,
+                             on_done=done, on_error=error)
+
     def open_change_password_window(self):
         selected_item = self.tree.focus()
         if not selected_item:
@@ -740,6 +1140,7 @@ class UserApp:
         
         # Fecha de nacimiento
         tk.Label(main_frame, text="Fecha de Nacimiento:").grid(row=2, column=0, pady=8, sticky="w")
+        from tkcalendar import DateEntry
         date_nacimiento_entry = DateEntry(main_frame, selectmode='day', date_pattern='yyyy-mm-dd')
         date_nacimiento_entry.grid(row=2, column=1, pady=8, sticky="ew")
         
@@ -783,19 +1184,25 @@ class UserApp:
                 not validar_obligatorio('nueva contraseña', new_password) or
                 not validar_obligatorio('confirmar contraseña', confirm_password)
             ): 
-                print("DEBUG: Falló la validación OBLIGATORIA.")
+                logger.debug("Falló la validación OBLIGATORIA.")
                 return
             
             if new_password != confirm_password:
                 messagebox.showerror("Error", "Las contraseñas no coinciden.")
-                print("DEBUG: Falló la coincidencia de contraseñas.")
+                logger.debug("Falló la coincidencia de contraseñas.")
                 return
             
-            usuario = get_user_by_id(user_id)
-            
+            self.executor.submit(get_user_by_id, user_id,
+                                 on_done=lambda usuario: verify_and_change(usuario, user_id, tipo_id, numero_id,
+                                                                           fecha_nacimiento, correo, new_password))
+
+        def verify_and_change(usuario, user_id, tipo_id, numero_id, fecha_nacimiento, correo, new_password):
+            if not change_window.winfo_exists():
+                return
+
             if not usuario:
                 messagebox.showerror("Error", "No se pudo obtener los datos del usuario.", parent=change_window)
-                print("DEBUG: No se pudo obtener los datos del usuario.")
+                logger.debug("No se pudo obtener los datos del usuario.")
                 return
             
             tipo_id_usuario = usuario[1]
@@ -808,7 +1215,7 @@ class UserApp:
                 messagebox.showerror("Error", 
                     "El tipo de identificación no coincide.\nNo se puede cambiar la contraseña.", 
                     parent=change_window)
-                print(f"DEBUG: Falló Tipo ID. DB: {tipo_id_usuario}, Entrada: {tipo_id}")
+                logger.debug(f"Falló Tipo ID. DB: {tipo_id_usuario}, Entrada: {tipo_id}")
                 return
 
             # Validar número de identificación
@@ -823,7 +1230,7 @@ class UserApp:
                 messagebox.showerror("Error", 
                     "La fecha de nacimiento no coincide.\nNo se puede cambiar la contraseña.", 
                     parent=change_window)
-                print(f"DEBUG: Falló Fecha Nacimiento. DB: {fecha_nacimiento_usuario}, Entrada: {fecha_nacimiento}")
+                logger.debug(f"Falló Fecha Nacimiento. DB: {fecha_nacimiento_usuario}, Entrada: {fecha_nacimiento}")
                 return
 
             # Validar correo electrónico
@@ -831,12 +1238,16 @@ class UserApp:
                 messagebox.showerror("Error", 
                     "El correo electrónico no coincide.\nNo se puede cambiar la contraseña.", 
                     parent=change_window)
-                print(f"DEBUG: Falló Correo. DB: {correo_usuario}, Entrada: {correo}")
+                logger.debug(f"Falló Correo. DB: {correo_usuario}, Entrada: {correo}")
                 return
             
-            if change_password(user_id, new_password):
-                print("DEBUG: Contraseña cambiada correctamente.")
-                change_window.destroy()
+            def done(changed):
+                if changed:
+                    logger.debug("Contraseña cambiada correctamente.")
+                    if change_window.winfo_exists():
+                        change_window.destroy()
+
+            self.executor.submit(change_password, user_id, new_password, on_done=done)
                 
         # Botón para cambiar la contraseña
         tk.Button(button_frame, text="Cambiar Contraseña", command=process_password_change).pack(side=tk.LEFT, padx=5)
@@ -846,19 +1257,35 @@ class UserApp:
 
 # --- Ejecutar la Aplicación ---
 if __name__ == "__main__":
-    create_table()
-    
-    if not validated_users():
+    logging.basicConfig(level=os.environ.get('CRUD_LOG_LEVEL', 'WARNING').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s %(message)s')
+
+    # CRUD_STARTUP_PROFILE=1 informa cuánto tardó cada fase hasta la primera ventana
+    startup = StartupProfile(os.environ.get('CRUD_STARTUP_PROFILE'), start=_STARTED)
+    startup.mark("importaciones")
+    hay_usuarios = bootstrap()
+    startup.mark("esquema y usuarios")
+
+    if not hay_usuarios:
         root = tk.Tk()
         app = UserApp(root)
+        root.after_idle(startup.report, "ventana principal")
         root.mainloop()
 
     else:
-        root = tk.Tk()
-        login_window = LoginWindow(root)
-        root.mainloop()
-        
-        if hasattr(login_window, 'user_data') and login_window.user_data:
+        # Con una sesión guardada y vigente no se vuelve a pedir la contraseña
+        user = restore_session()
+        startup.mark("sesión guardada")
+        if user is None:
+            root = tk.Tk()
+            login_window = LoginWindow(root)
+            root.after_idle(startup.report, "ventana de inicio de sesión")
+            root.mainloop()
+            user = login_window.user_data
+
+        if user:
+            set_audit_actor(user)
             app_root = tk.Tk()
             app = UserApp(app_root)
+            app_root.after_idle(startup.report, "ventana principal")
             app_root.mainloop()
\ No newline at end of file
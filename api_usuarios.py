@@ -0,0 +1,511 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+import configuracion
+from auditoria import current_actor, read_changes
+from limitador_login import LoginLockedError
+from metricas import metrics
+from repositorio import (
+    LIST_FIELDS,
+    USER_FIELDS,
+    ConflictError,
+    DatabaseConnectionError,
+    DuplicateUserError,
+    RepositoryError,
+)
+from validaciones import USER_SCHEMA, format_errors, validate_record
+
+logger = logging.getLogger('crud_usuarios.api')
+
+MAX_BODY = 64 * 1024
+MAX_PAGE = 500
+FILTER_PARAMS = ('nombre', 'correo', 'numero_identificacion', 'telefono', 'tipo_identificacion',
+                 'fecha_desde', 'fecha_hasta')
+EDITABLE_FIELDS = tuple(field.nombre for field in USER_SCHEMA if field.nombre != 'password')
+
+# Rutas que no piden token aunque el servicio exija sesión
+PUBLIC_HANDLERS = ('login', 'get_metrics', 'health')
+
+# Datos que prueban la identidad al cambiar la contraseña sin la actual (como en la
+# ventana "Cambiar contraseña" de la aplicación)
+IDENTITY_FIELDS = ('tipo_identificacion', 'numero_identificacion', 'fecha_nacimiento', 'correo')
+
+REASONS = {
+    200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request', 401: 'Unauthorized',
+    403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict', 411: 'Length Required',
+    413: 'Payload Too Large', 429: 'Too Many Requests', 500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, mensaje, detalle=None, headers=None):
+        self.status = status
+        self.mensaje = mensaje
+        self.detalle = detalle
+        self.headers = headers or {}
+        super().__init__(mensaje)
+
+
+def _json_default(value):
+    # Fechas de MariaDB (date) y cualquier otro tipo no JSON
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def _version(value):
+    """Versión esperada del cuerpo, de ?version= o de If-Match ('"3"'); None si no hay"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(str(value).strip('"'))
+    except ValueError:
+        raise HttpError(400, "La versión debe ser un número entero")
+
+
+def check_text(body, campos):
+    """Rechaza (400) los campos del cuerpo que no son texto ni null, antes de validarlos"""
+    etiquetas = {field.nombre: field.etiqueta for field in USER_SCHEMA}
+    errores = [(campo, f"El campo '{etiquetas.get(campo, campo)}' debe ser texto.")
+               for campo in campos if body.get(campo) is not None and not isinstance(body[campo], str)]
+    if errores:
+        raise HttpError(400, format_errors(errores), detalle=errores)
+
+
+def user_json(row):
+    """Registro completo sin password_hash"""
+    user = dict(zip(USER_FIELDS, row))
+    user.pop('password_hash', None)
+    return user
+
+
+class AsyncUserRepository:
+    """Fachada asíncrona del repositorio. Las consultas corren en un grupo de hilos
+    del mismo tamaño que el pool de conexiones, así ningún hilo se bloquea esperando
+    una conexión y las corrutinas esperan sin ocupar el bucle de eventos. Las
+    operaciones con bcrypt usan un grupo aparte para no dejar sin hilos a las lecturas."""
+
+    def __init__(self, repository, db_workers=None, hash_workers=None):
+        self.repository = repository
+        db_workers = db_workers or repository.pool.max_size
+        self._db = ThreadPoolExecutor(db_workers, thread_name_prefix='api-db')
+        self._hash = ThreadPoolExecutor(hash_workers or os.cpu_count() or 1, thread_name_prefix='api-bcrypt')
+
+    # El contexto (p. ej. el actor de la auditoría) se copia al hilo que ejecuta la llamada
+    async def query(self, func, *args, **kwargs):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._db, partial(context.run, func, *args, **kwargs))
+
+    async def hashing(self, func, *args, **kwargs):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._hash, partial(context.run, func, *args, **kwargs))
+
+    def close(self):
+        self._db.shutdown(wait=False)
+        self._hash.shutdown(wait=False)
+
+
+class UserAPI:
+    """Servicio HTTP/JSON sobre asyncio con conexiones persistentes (keep-alive) y un
+    límite de solicitudes en curso; las que esperan más de queue_timeout reciben 503.
+    POST /login devuelve un token que se envía como "Authorization: Bearer <token>";
+    las demás rutas lo exigen (401 sin él) salvo con require_session=False, solo para
+    pruebas. Un usuario solo puede modificar, eliminar o cambiar la contraseña de su
+    propia cuenta (403 si no)."""
+
+    def __init__(self, repository, max_concurrency=256, queue_timeout=5, keepalive_timeout=30,
+                 db_workers=None, hash_workers=None, sessions=None, require_session=True):
+        if require_session and sessions is None:
+            raise ValueError("Exigir sesión requiere un gestor de sesiones (sessions)")
+        self.repository = repository
+        self.sessions = sessions
+        self.require_session = require_session
+        self.db = AsyncUserRepository(repository, db_workers, hash_workers)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self._slots = None
+        self.routes = [
+            (re.compile(r'^/usuarios$'), {'GET': self.list_users, 'POST': self.create_user}),
+            (re.compile(r'^/usuarios/(\d+)$'), {'GET': self.get_user, 'PATCH': self.update_user,
+                                                'PUT': self.update_user, 'DELETE': self.delete_user}),
+            (re.compile(r'^/usuarios/(\d+)/password$'), {'POST': self.change_password}),
+            (re.compile(r'^/login$'), {'POST': self.login}),
+            (re.compile(r'^/sesion$'), {'GET': self.get_session, 'DELETE': self.logout}),
+            (re.compile(r'^/cambios$'), {'GET': self.list_changes}),
+            (re.compile(r'^/metrics$'), {'GET': self.get_metrics}),
+            (re.compile(r'^/salud$'), {'GET': self.health}),
+        ]
+
+    # --- Endpoints ---
+    async def list_users(self, request):
+        """GET /usuarios?cursor=<id>&limit=100&nombre=...: paginación por cursor (id)"""
+        query = request['query']
+        try:
+            cursor = int(query.get('cursor') or 0)
+            limit = min(int(query.get('limit') or 100), MAX_PAGE)
+        except ValueError:
+            raise HttpError(400, "cursor y limit deben ser números enteros")
+        if limit < 1:
+            raise HttpError(400, f"limit debe estar entre 1 y {MAX_PAGE}")
+        filtros = {campo: query[campo] for campo in FILTER_PARAMS if query.get(campo)} or None
+        rows = await self.db.query(self.repository.get_users_page, after_id=cursor, limit=limit,
+                                   filtros=filtros)
+        return 200, {
+            'items': [dict(zip(LIST_FIELDS, row)) for row in rows],
+            'next_cursor': rows[-1][0] if len(rows) == limit else None,
+        }
+
+    async def get_user(self, request, user_id):
+        user_id = int(user_id)
+        # Camino rápido: un acierto de la caché se responde sin pasar por un hilo
+        row = self.repository.cache.get(user_id)
+        if row is None:
+            row = await self.db.query(self.repository.get_user_by_id, user_id)
+        if row is None:
+            raise HttpError(404, "Usuario no encontrado")
+        return 200, user_json(row)
+
+    async def create_user(self, request):
+        body = request['json']
+        check_text(body, EDITABLE_FIELDS + ('password',))
+        record = {campo: body.get(campo) for campo in EDITABLE_FIELDS + ('password',)}
+        errores = validate_record(record)
+        if errores:
+            raise HttpError(400, format_errors(errores), detalle=errores)
+        user_id = await self.db.hashing(
+            self.repository.insert_user, record['tipo_identificacion'], record['numero_identificacion'],
+            record['nombre'], record['apellido'], record['correo'], record['password'],
+            record['direccion'], record['fecha_nacimiento'], record['telefono'])
+        return 201, {'id': user_id}
+
+    async def update_user(self, request, user_id):
+        """PATCH/PUT /usuarios/<id>: los campos omitidos conservan su valor. La versión
+        esperada va en el cuerpo ('version') o en la cabecera If-Match; sin ella se usa
+        la del registro leído, así un cambio ajeno entre la lectura y la escritura da 409
+        en lugar de pisarse con los valores completados."""
+        user_id = int(user_id)
+        self._check_owner(request, user_id)
+        body = request['json']
+        if 'password' in body:
+            raise HttpError(400, f"Para cambiar la contraseña use POST /usuarios/{user_id}/password")
+        check_text(body, EDITABLE_FIELDS)
+        version = _version(body.get('version') or request['headers'].get('if-match'))
+        # Sin caché: los campos omitidos se completan con el registro vigente
+        self.repository.cache.invalidate(user_id)
+        current = await self.db.query(self.repository.get_user_by_id, user_id)
+        if current is None:
+            raise HttpError(404, "Usuario no encontrado")
+        record = user_json(current)
+        record.update({campo: body[campo] for campo in EDITABLE_FIELDS if campo in body})
+        if record['fecha_nacimiento'] is not None:
+            record['fecha_nacimiento'] = _json_default(record['fecha_nacimiento'])
+        errores = validate_record(record, omitir=('password',))
+        if errores:
+            raise HttpError(400, format_errors(errores), detalle=errores)
+        if version is None:
+            version = record['version']
+        cambios = await self.db.query(
+            self.repository.update_user, user_id, record['tipo_identificacion'], record['numero_identificacion'],
+            record['nombre'], record['apellido'], record['correo'], record['direccion'], record['telefono'],
+            record['fecha_nacimiento'], expected_version=version)
+        return 200, {'cambios': cambios}
+
+    async def delete_user(self, request, user_id):
+        self._check_owner(request, int(user_id))
+        version = _version(request['query'].get('version') or request['headers'].get('if-match'))
+        await self.db.query(self.repository.delete_user, int(user_id), expected_version=version)
+        return 204, None
+
+    async def change_password(self, request, user_id):
+        """POST /usuarios/<id>/password: además de 'password' se envía la contraseña
+        actual ('password_actual') o los datos de IDENTITY_FIELDS del usuario"""
+        user_id = int(user_id)
+        self._check_owner(request, user_id)
+        body = request['json']
+        check_text(body, ('password', 'password_actual') + IDENTITY_FIELDS)
+        password = body.get('password')
+        if not password:
+            raise HttpError(400, "El campo 'password' es obligatorio.")
+        # Sin caché: el hash debe ser el vigente aunque otro proceso lo haya cambiado
+        self.repository.cache.invalidate(user_id)
+        row = await self.db.query(self.repository.get_user_by_id, user_id)
+        if row is None:
+            raise HttpError(404, "Usuario no encontrado")
+        user = dict(zip(USER_FIELDS, row))
+        if body.get('password_actual'):
+            if not await self.db.hashing(self.repository.hasher.verify, body['password_actual'],
+                                         user['password_hash']):
+                raise HttpError(403, "La contraseña actual no es correcta")
+        elif all(body.get(campo) for campo in IDENTITY_FIELDS):
+            if (body['tipo_identificacion'] != user['tipo_identificacion']
+                    or body['numero_identificacion'] != user['numero_identificacion']
+                    or body['fecha_nacimiento'] != _json_default(user['fecha_nacimiento'])
+                    or body['correo'].lower() != user['correo'].lower()):
+                raise HttpError(403, "Los datos de identificación no coinciden")
+        else:
+            raise HttpError(400, "Debe enviar 'password_actual' o los campos " + ', '.join(IDENTITY_FIELDS))
+        await self.db.hashing(self.repository.change_password, user_id, password)
+        if self.sessions is not None:
+            await self.db.query(self.sessions.revoke_user, user_id)
+        return 204, None
+
+    async def login(self, request):
+        body = request['json']
+        check_text(body, ('correo', 'password'))
+        correo, password = body.get('correo'), body.get('password')
+        if not correo or not password:
+            raise HttpError(400, "Debe enviar correo y password")
+        user = await self.db.hashing(self.repository.authenticate_user, correo, password, request['client'])
+        if user is None:
+            raise HttpError(401, "Correo o contraseña incorrectos")
+        user = dict(user)
+        user.pop('password_hash', None)
+        if self.sessions is not None:
+            user['token'] = await self.db.query(self.sessions.issue, user['id'], request['client'])
+        return 200, user
+
+    async def get_session(self, request):
+        session = request['session']
+        if session is None:
+            raise HttpError(401, "Sesión inválida o vencida", headers={'WWW-Authenticate': 'Bearer'})
+        return 200, {'user_id': session.user_id, 'expires_at': session.expires_at}
+
+    async def logout(self, request):
+        if request['session'] is None:
+            raise HttpError(401, "Sesión inválida o vencida", headers={'WWW-Authenticate': 'Bearer'})
+        await self.db.query(self.sessions.revoke, request['token'])
+        return 204, None
+
+    async def list_changes(self, request):
+        """GET /cambios?desde=<offset>&limit=1000&lag=2: registro de cambios a partir
+        de un offset; el cliente guarda next_offset y lo envía en la siguiente consulta"""
+        query = request['query']
+        try:
+            after = int(query.get('desde') or 0)
+            limit = min(int(query.get('limit') or 1000), 5000)
+            lag = int(query.get('lag') or 2)
+        except ValueError:
+            raise HttpError(400, "desde, limit y lag deben ser números enteros")
+        if limit < 1:
+            raise HttpError(400, "limit debe estar entre 1 y 5000")
+        events = await self.db.query(read_changes, self.repository, after, limit, lag)
+        return 200, {'items': events, 'next_offset': events[-1]['offset'] if events else after}
+
+    async def get_metrics(self, request):
+        return 200, metrics.to_prometheus()
+
+    async def health(self, request):
+        return 200, {'ok': True}
+
+    # --- HTTP ---
+    async def _session(self, headers):
+        """(token, Session) de la cabecera Authorization; la firma se comprueba sin
+        bcrypt y la revocación solo consulta la base cada cierto tiempo"""
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if self.sessions is None or scheme.lower() != 'bearer' or not token:
+            return None, None
+        token = token.strip()
+        if self.sessions.parse(token) is None:
+            return token, None
+        return token, await self.db.query(self.sessions.validate, token)
+
+    @staticmethod
+    def _check_owner(request, user_id):
+        """403 si la sesión es de otro usuario (sin sesión solo se llega con require_session=False)"""
+        session = request['session']
+        if session is not None and session.user_id != user_id:
+            raise HttpError(403, "Solo puede modificar su propio usuario")
+
+    def _route(self, method, path):
+        for pattern, handlers in self.routes:
+            match = pattern.match(path)
+            if match:
+                handler = handlers.get(method)
+                if handler is None:
+                    raise HttpError(405, "Método no permitido", headers={'Allow': ', '.join(handlers)})
+                return handler, match.groups()
+        raise HttpError(404, "Ruta no encontrada")
+
+    async def dispatch(self, method, target, headers, body, client):
+        """Atiende una solicitud y devuelve (estado, contenido, cabeceras extra)"""
+        start = time.perf_counter()
+        url = urlsplit(target)
+        route = url.path
+        status, payload, extra = 500, None, {}
+        acquired = False
+        try:
+            handler, args = self._route(method, url.path)
+            route = handler.__name__
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+                acquired = True
+            except asyncio.TimeoutError:
+                raise HttpError(503, "Servidor ocupado, intente de nuevo", headers={'Retry-After': '1'})
+
+            request = {
+                'headers': headers,
+                'query': {clave: valores[-1] for clave, valores in parse_qs(url.query).items()},
+                'client': client,
+                'json': {},
+            }
+            request['token'], request['session'] = await self._session(headers)
+            session = request['session']
+            current_actor.set(f"api:usuario {session.user_id}" if session else f"api:{client}")
+            if self.require_session and session is None and route not in PUBLIC_HANDLERS:
+                # Sin usuarios nadie puede iniciar sesión: se permite crear el primero
+                if route != 'create_user' or await self.db.query(self.repository.has_users):
+                    raise HttpError(401, "Se requiere una sesión válida", headers={'WWW-Authenticate': 'Bearer'})
+            if body:
+                try:
+                    request['json'] = json.loads(body)
+                except ValueError:
+                    raise HttpError(400, "El cuerpo no es JSON válido")
+                if not isinstance(request['json'], dict):
+                    raise HttpError(400, "El cuerpo debe ser un objeto JSON")
+            status, payload = await handler(request, *args)
+        except HttpError as e:
+            status, extra = e.status, e.headers
+            payload = {'error': e.mensaje}
+            if e.detalle:
+                payload['detalle'] = [{'campo': campo, 'mensaje': mensaje} for campo, mensaje in e.detalle]
+        except LoginLockedError as e:
+            status, payload = 429, {'error': str(e)}
+            extra = {'Retry-After': str(int(e.retry_after) + 1)}
+        except (DuplicateUserError, ConflictError) as e:
+            status, payload = 409, {'error': str(e)}
+        except DatabaseConnectionError as e:
+            status, payload = 503, {'error': f"Error al conectar a la base de datos: {e}"}
+        except RepositoryError as e:
+            status, payload = 500, {'error': str(e)}
+        except Exception:
+            logger.exception(f"Error atendiendo {method} {target}")
+            status, payload = 500, {'error': "Error interno"}
+        finally:
+            if acquired:
+                self._slots.release()
+            metrics.observe('http', f"{method} {route}", time.perf_counter() - start,
+                            error=str(status) if status >= 500 else None)
+        return status, payload, extra
+
+    @staticmethod
+    def _response(status, payload, extra, keep_alive):
+        if payload is None:
+            body, content_type = b'', None
+        elif isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines += [f"{nombre}: {valor}" for nombre, valor in extra.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+    async def handle_connection(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        client = peer[0] if peer else None
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keepalive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                        ConnectionError):
+                    break
+                try:
+                    request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+                    method, target, version = request_line.split(' ', 2)
+                    headers = {}
+                    for line in header_lines:
+                        nombre, _, valor = line.partition(':')
+                        headers[nombre.strip().lower()] = valor.strip()
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    writer.write(self._response(400, {'error': "Solicitud inválida"}, {}, False))
+                    break
+                if 'chunked' in headers.get('transfer-encoding', '').lower():
+                    writer.write(self._response(411, {'error': "Se requiere Content-Length"}, {}, False))
+                    break
+                if length > MAX_BODY:
+                    writer.write(self._response(413, {'error': "Cuerpo demasiado grande"}, {}, False))
+                    break
+                try:
+                    body = await reader.readexactly(length) if length else b''
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                status, payload, extra = await self.dispatch(method, target, headers, body, client)
+                writer.write(self._response(status, payload, extra, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        await self.db.query(self.repository.create_schema)
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        logger.info(f"API de usuarios escuchando en http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.repository.audit is not None:
+                self.repository.audit.close()
+            self.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON para la gestión de usuarios")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--backend', choices=('mariadb', 'sqlite'), default=configuracion.DB_BACKEND)
+    parser.add_argument('--sqlite-path', default=configuracion.SQLITE_CONFIG['path'])
+    parser.add_argument('--pool-size', type=int, default=configuracion.DB_POOL_CONFIG['max_size'],
+                        help="Conexiones máximas (y hilos de consulta)")
+    parser.add_argument('--max-concurrency', type=int, default=256, help="Solicitudes en curso a la vez")
+    parser.add_argument('--purgar', action='store_true',
+                        help="Purgar los usuarios eliminados en la ventana de PURGE_CONFIG (hilo en segundo plano)")
+    parser.add_argument('--sin-sesion', action='store_true',
+                        help="No exigir el token de sesión (Authorization: Bearer); solo para pruebas locales")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.environ.get('CRUD_LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    configuracion.DB_BACKEND = args.backend
+    configuracion.SQLITE_CONFIG['path'] = args.sqlite_path
+    configuracion.DB_POOL_CONFIG['max_size'] = args.pool_size
+    configuracion.DB_POOL_CONFIG['min_size'] = min(configuracion.DB_POOL_CONFIG['min_size'], args.pool_size)
+
+    if args.purgar:
+        from purgar_usuarios import job_from_config
+        job_from_config().start()
+    api = UserAPI(configuracion.get_repository(), max_concurrency=args.max_concurrency,
+                  sessions=configuracion.get_session_manager(), require_session=not args.sin_sesion)
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
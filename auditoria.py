@@ -0,0 +1,273 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from metricas import instrument
+
+logger = logging.getLogger('crud_usuarios.auditoria')
+
+# Columnas de users_audit (migración 7) en el orden de las consultas
+AUDIT_FIELDS = ('id', 'user_id', 'operacion', 'actor', 'columnas', 'antes', 'despues', 'registrado_en')
+
+INSERT_AUDIT_SQL = """
+    INSERT INTO users_audit (user_id, operacion, actor, columnas, antes, despues, registrado_en, insertado_en)
+    VALUES (?, ?, ?, ?, ?, ?, ?, UNIX_TIMESTAMP())
+"""
+
+# Columnas que nunca se copian al registro de cambios
+EXCLUDED_FIELDS = ('password', 'password_hash')
+
+# Quién hace el cambio en el contexto actual (p. ej. una solicitud de la API);
+# si no se indica se usa AuditLog.default_actor
+current_actor = ContextVar('auditoria_actor', default=None)
+
+# Marca que flush() pone en la cola para que el hilo escriba el lote en curso sin
+# esperar a completar flush_interval
+_FLUSH = object()
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def _clean(values):
+    if values is None:
+        return None
+    values = {campo: valor for campo, valor in values.items() if campo not in EXCLUDED_FIELDS}
+    return json.dumps(values, ensure_ascii=False, default=_json_default)
+
+
+class AuditLog:
+    """Registro de cambios de usuarios, solo de inserción, en la tabla users_audit.
+
+    record() solo encola el evento: un hilo lo escribe junto con otros en un lote
+    (hasta batch_size eventos o cada flush_interval segundos), fuera del camino de
+    la operación. Si la base no responde el lote se reintenta; si la cola se llena
+    los eventos nuevos se descartan y se informa en el registro y en stats()."""
+
+    def __init__(self, repository, batch_size=200, flush_interval=1.0, max_queue=100000,
+                 default_actor=None):
+        self.repository = repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.default_actor = default_actor
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = 0
+        self._written = 0
+        self._dropped = 0
+        self._closing = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='auditoria', daemon=True)
+        self._thread.start()
+
+    def record(self, operacion, user_id, antes=None, despues=None, columnas=None):
+        """Encola un cambio; antes y despues son dicts (sin contraseñas ni hashes)"""
+        if columnas is not None:
+            columnas = ','.join('password' if c == 'password_hash' else c for c in columnas)
+        event = (user_id, operacion, current_actor.get() or self.default_actor, columnas,
+                 _clean(antes), _clean(despues), time.time())
+        with self._cond:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._cond:
+                self._pending -= 1
+                self._dropped += 1
+                self._cond.notify_all()
+            logger.error(f"Cola de auditoría llena: se descartó el evento {operacion} del usuario {user_id}")
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                break
+            if event is _FLUSH:
+                continue
+            batch = [event]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0 and not self._closing:
+                    break
+                try:
+                    event = self._queue.get(timeout=max(timeout, 0))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stop = True
+                    break
+                if event is _FLUSH:
+                    break
+                batch.append(event)
+            self._write_with_retry(batch)
+            if stop:
+                break
+
+    def _write_with_retry(self, batch):
+        delay = 1
+        while True:
+            try:
+                self._write_batch(batch)
+                break
+            except Exception as e:
+                if self._closing:
+                    logger.error(f"No se pudieron guardar {len(batch)} eventos de auditoría: {e}")
+                    with self._cond:
+                        self._dropped += len(batch)
+                    break
+                logger.warning(f"No se pudo guardar la auditoría, reintento en {delay} s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+        with self._cond:
+            self._pending -= len(batch)
+            self._cond.notify_all()
+
+    @instrument('insert_audit', rows=len)
+    def _write_batch(self, batch):
+        with self.repository.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(INSERT_AUDIT_SQL, batch)
+                conn.commit()
+            finally:
+                cursor.close()
+        with self._cond:
+            self._written += len(batch)
+        return batch
+
+    def flush(self, timeout=10):
+        """Espera a que los eventos encolados estén escritos; False si no alcanzó"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if not self._pending:
+                return True
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass  # con la cola llena los lotes se completan sin esperar
+        with self._cond:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        """Escribe lo pendiente y detiene el hilo"""
+        self.flush(timeout)
+        self._closing = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {'pendientes': self._pending, 'escritos': self._written, 'descartados': self._dropped}
+
+
+@instrument('read_changes')
+def read_changes(repository, after=0, limit=1000, lag=2):
+    """Eventos con offset (id) mayor que after, en orden, como dicts.
+
+    Con varios procesos escribiendo, un id menor puede confirmarse un instante
+    después que uno mayor; por eso solo se entregan eventos insertados hace al menos
+    lag segundos y la lectura se corta en el primero más reciente, así un consumidor
+    que avanza su offset al último recibido no se salta ninguno. Con un solo
+    proceso escritor lag=0 es exacto."""
+    cutoff = int(time.time()) - lag
+    with repository.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT {', '.join(AUDIT_FIELDS)}, insertado_en FROM users_audit "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (int(after), int(limit))
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    events = []
+    for row in rows:
+        if lag and row[-1] > cutoff:
+            break
+        event = dict(zip(('offset',) + AUDIT_FIELDS[1:], row))
+        event['columnas'] = event['columnas'].split(',') if event['columnas'] else None
+        event['antes'] = json.loads(event['antes']) if event['antes'] else None
+        event['despues'] = json.loads(event['despues']) if event['despues'] else None
+        events.append(event)
+    return events
+
+
+def follow_changes(repository, after=0, limit=1000, lag=2, poll=1.0):
+    """Generador infinito de eventos desde el offset after (como tail -f)"""
+    while True:
+        events = read_changes(repository, after, limit, lag)
+        yield from events
+        if events:
+            after = events[-1]['offset']
+        if len(events) < limit:
+            time.sleep(poll)
+
+
+def _read_offset(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_offset(path, offset):
+    # Reemplazo atómico: un corte a mitad de escritura no deja un offset corrupto
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(str(offset))
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    import configuracion
+
+    parser = argparse.ArgumentParser(
+        description="Muestra los cambios de usuarios como líneas JSON a partir de un offset")
+    parser.add_argument('--desde', type=int, help="Offset a partir del cual leer (por defecto 0)")
+    parser.add_argument('--offset-file', help="Archivo donde se lee y guarda el último offset entregado")
+    parser.add_argument('--seguir', action='store_true', help="Quedarse esperando cambios nuevos")
+    parser.add_argument('--limite', type=int, default=1000, help="Eventos por consulta")
+    parser.add_argument('--lag', type=int, default=2,
+                        help="Segundos de espera antes de entregar un evento (0 con un solo escritor)")
+    parser.add_argument('--intervalo', type=float, default=1.0, help="Segundos entre consultas con --seguir")
+    args = parser.parse_args(argv)
+
+    repository = configuracion.get_repository()
+    after = args.desde if args.desde is not None else (_read_offset(args.offset_file) if args.offset_file else 0)
+    try:
+        while True:
+            events = read_changes(repository, after, args.limite, args.lag)
+            for event in events:
+                print(json.dumps(event, ensure_ascii=False, default=_json_default))
+            sys.stdout.flush()
+            if events:
+                after = events[-1]['offset']
+                if args.offset_file:
+                    _write_offset(args.offset_file, after)
+            if len(events) < args.limite:
+                if not args.seguir:
+                    break
+                time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
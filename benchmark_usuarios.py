@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from cache_usuarios import UserCache
+from metricas import metrics
+from repositorio import INSERT_USER_SQL, MariaDBUserRepository, SQLiteUserRepository
+from servicio_hash import LatencyStats, PasswordHasher
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+# Contraseña de todos los usuarios sintéticos
+BENCH_PASSWORD = "Benchmark123"
+
+# Orden de ejecución: change_password y delete_user trabajan sobre los usuarios que
+# crea insert_user, así la tabla vuelve a su tamaño y los sembrados no cambian
+OPERATIONS = (
+    'insert_user',
+    'get_users',
+    'get_users_page',
+    'get_user_by_id',
+    'authenticate_user',
+    'update_user',
+    'change_password',
+    'delete_user',
+)
+
+TIPOS = ('CC', 'NIT', 'PAS', 'CE')
+NOMBRES = ('Ana', 'Luis', 'Carlos', 'María', 'Sofía', 'Andrés', 'Camila', 'Juan', 'Valentina', 'Diego')
+APELLIDOS = ('Gómez', 'Rodríguez', 'López', 'Martínez', 'García', 'Pérez', 'Castro', 'Ramírez')
+
+
+def synthetic_user(n):
+    """Usuario sintético determinístico número n (sin contraseña)"""
+    return (
+        TIPOS[n % len(TIPOS)],
+        f"{10_000_000 + n}",
+        NOMBRES[n % len(NOMBRES)],
+        APELLIDOS[(n // len(NOMBRES)) % len(APELLIDOS)],
+        f"Calle {n % 200} # {n % 97}-{n % 53}",
+        (date(1950, 1, 1) + timedelta(days=n % 20_000)).isoformat(),
+        f"bench{n}@ejemplo.com",
+        f"3{n % 1_000_000_000:09d}",
+    )
+
+
+def count_users(repository):
+    with repository.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM users WHERE deleted_at IS NULL")
+            return tuple(cursor.fetchone())
+        finally:
+            cursor.close()
+
+
+def seed(repository, rows, chunk_size=10_000, progress=None):
+    """Completa la tabla hasta tener rows usuarios. Todos comparten un único hash
+    precalculado, así sembrar un millón de filas no depende del costo de bcrypt."""
+    existing, _ = count_users(repository)
+    if existing >= rows:
+        return 0
+    hashed_password = repository.hasher.hash(BENCH_PASSWORD)
+    with repository.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for start in range(existing, rows, chunk_size):
+                batch = []
+                for n in range(start, min(start + chunk_size, rows)):
+                    tipo, numero, nombre, apellido, direccion, fecha, correo, telefono = synthetic_user(n)
+                    batch.append((tipo, numero, nombre, apellido, direccion, fecha,
+                                  correo, hashed_password, telefono))
+                cursor.executemany(INSERT_USER_SQL, batch)
+                conn.commit()
+                if progress:
+                    progress(start + len(batch), rows)
+        finally:
+            cursor.close()
+    return rows - existing
+
+
+class Measurement:
+    """Latencias de una operación más su rendimiento (operaciones por segundo)"""
+
+    def __init__(self, iterations):
+        self.stats = LatencyStats(window=iterations)
+        self.elapsed = 0.0
+
+    def run(self, func, args_list):
+        start = time.perf_counter()
+        for args in args_list:
+            t0 = time.perf_counter()
+            func(*args)
+            self.stats.record(time.perf_counter() - t0)
+        self.elapsed = time.perf_counter() - start
+
+    def result(self):
+        snapshot = self.stats.snapshot()
+        snapshot['ops_per_s'] = snapshot['count'] / self.elapsed if self.elapsed else 0.0
+        return snapshot
+
+
+def run_operations(repository, rows, iterations, list_iterations, page_size=100, rng=None):
+    """Mide cada operación de OPERATIONS sobre una tabla de rows usuarios sembrados"""
+    rng = rng or random.Random(0)
+    _, max_id = count_users(repository)
+    run_id = int(time.time() * 1000)
+    seeded = [rng.randrange(rows) for _ in range(iterations)]
+    inserted = []
+
+    def insert(i):
+        tipo, numero, nombre, apellido, direccion, fecha, _, telefono = synthetic_user(rows + i)
+        inserted.append(repository.insert_user(
+            tipo, f"B{run_id}-{i}", nombre, apellido, f"bench-{run_id}-{i}@ejemplo.com",
+            BENCH_PASSWORD, direccion, fecha, telefono))
+
+    def update(user_id, n, i):
+        # La dirección cambia en cada ronda e iteración: si quedara igual a la guardada
+        # (ronda repetida o n repetido) update_user no escribiría nada
+        tipo, numero, nombre, apellido, direccion, fecha, correo, telefono = synthetic_user(n)
+        repository.update_user(user_id, tipo, numero, nombre, apellido, correo,
+                               f"{direccion} (bench {run_id}-{i})", telefono, fecha)
+
+    def authenticate(n):
+        if repository.authenticate_user(f"bench{n}@ejemplo.com", BENCH_PASSWORD) is None:
+            raise RuntimeError(f"No se pudo autenticar al usuario sintético bench{n}")
+
+    def page(after_id):
+        repository.get_users_page(after_id=after_id, limit=page_size)
+
+    operations = {
+        'insert_user': (insert, [(i,) for i in range(iterations)]),
+        'get_users': (repository.get_users, [()] * list_iterations),
+        'get_users_page': (page, [(rng.randrange(max(1, max_id - page_size)),)
+                                  for _ in range(iterations)]),
+        'get_user_by_id': (repository.get_user_by_id,
+                           [(rng.randrange(1, max_id + 1),) for _ in range(iterations)]),
+        'authenticate_user': (authenticate, [(n,) for n in seeded]),
+        'update_user': (update, lambda: [(repository.get_user_by_correo(f"bench{n}@ejemplo.com")[0], n, i)
+                                         for i, n in enumerate(seeded)]),
+        'change_password': (repository.change_password, lambda: [(uid, "Cambio123") for uid in inserted]),
+        'delete_user': (repository.delete_user, lambda: [(uid,) for uid in inserted]),
+    }
+
+    results = {}
+    for name in OPERATIONS:
+        func, args_list = operations[name]
+        if callable(args_list):
+            args_list = args_list()
+        # Sin caché entre operaciones: se mide el acceso a la base de datos
+        repository.cache.clear()
+        measurement = Measurement(len(args_list))
+        measurement.run(func, args_list)
+        results[name] = measurement.result()
+    # delete_user solo marca las filas (borrado lógico): se purgan para que la tabla
+    # quede como estaba y la siguiente ronda mida sobre los mismos datos
+    repository.purge_deleted()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, min_delta_ms=0.1, metrics=('p50_ms', 'p95_ms', 'p99_ms')):
+    """Devuelve las regresiones: mediciones que superan la línea base en más de
+    threshold (0.2 = 20 %) y en más de min_delta_ms, para no marcar el ruido de las
+    operaciones de microsegundos. Solo se comparan tamaños y operaciones presentes en ambas."""
+    regressions = []
+    for size, operations in results['resultados'].items():
+        base_operations = baseline.get('resultados', {}).get(size, {})
+        for name, measurement in operations.items():
+            base = base_operations.get(name)
+            if not base:
+                continue
+            for metric in metrics:
+                limit = max(base[metric] * (1 + threshold), base[metric] + min_delta_ms)
+                if measurement[metric] > limit:
+                    regressions.append((size, name, metric, base[metric], measurement[metric]))
+    return regressions
+
+
+def create_repository(args, rows, hasher):
+    if args.backend == 'mariadb':
+        import configuracion
+        db_config = dict(configuracion.DB_CONFIG,
+                         database=args.database or configuracion.DB_CONFIG['database'])
+        return MariaDBUserRepository(db_config, hasher=hasher, cache=UserCache())
+    path = args.db or os.path.join(tempfile.gettempdir(), f"benchmark_usuarios_{rows}.db")
+    return SQLiteUserRepository(path, hasher=hasher, cache=UserCache())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mide latencia (p50/p95/p99) y rendimiento de las operaciones CRUD y de inicio de sesión")
+    parser.add_argument('--rows', type=int, nargs='+', default=[SIZES[0]],
+                        help=f"Usuarios sembrados por corrida (p. ej. {' '.join(map(str, SIZES))})")
+    parser.add_argument('--backend', choices=('sqlite', 'mariadb'), default='sqlite')
+    parser.add_argument('--db', help="Archivo SQLite (por defecto uno temporal por tamaño)")
+    parser.add_argument('--database', help="Base de datos MariaDB a usar (¡no la de producción!)")
+    parser.add_argument('--iterations', type=int, default=200, help="Repeticiones por operación")
+    parser.add_argument('--list-iterations', type=int, default=5,
+                        help="Repeticiones de get_users, que lee la tabla completa")
+    parser.add_argument('--rounds', type=int, default=12, help="Costo de bcrypt")
+    parser.add_argument('--output', help="Archivo JSON con los resultados")
+    parser.add_argument('--baseline', help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help="Empeoramiento tolerado frente a --baseline (0.2 = 20 %%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.1,
+                        help="Diferencia mínima en ms para considerar una regresión")
+    args = parser.parse_args(argv)
+
+    hasher = PasswordHasher(args.rounds)
+    results = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'backend': args.backend,
+        'rounds': args.rounds,
+        'iterations': args.iterations,
+        'siembra_s': {},
+        'resultados': {},
+    }
+
+    def progress(done, total):
+        print(f"\r  sembrando {done}/{total}", end='', file=sys.stderr, flush=True)
+
+    for rows in args.rows:
+        repository = create_repository(args, rows, hasher)
+        try:
+            repository.create_schema()
+            print(f"{rows} usuarios ({args.backend})", file=sys.stderr)
+            start = time.perf_counter()
+            if seed(repository, rows, progress=progress):
+                print(file=sys.stderr)
+            results['siembra_s'][str(rows)] = time.perf_counter() - start
+            total, _ = count_users(repository)
+            if total > rows:
+                print(f"  Aviso: la tabla ya tenía {total} usuarios; use otro --db para medir con {rows}",
+                      file=sys.stderr)
+            metrics.reset()
+            results['resultados'][str(rows)] = run_operations(
+                repository, rows, args.iterations, args.list_iterations)
+            # Desglose por consulta, adquisición de conexión y bcrypt
+            results.setdefault('metricas', {})[str(rows)] = metrics.snapshot()
+            results.setdefault('sentencias', {})[str(rows)] = repository.statements.stats()
+        finally:
+            repository.close()
+
+        for name, m in results['resultados'][str(rows)].items():
+            print(f"  {name:<18} p50 {m['p50_ms']:9.2f} ms  p95 {m['p95_ms']:9.2f} ms  "
+                  f"p99 {m['p99_ms']:9.2f} ms  {m['ops_per_s']:9.1f} ops/s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for size, name, metric, before, after in regressions:
+            print(f"REGRESIÓN {name} ({size} usuarios) {metric}: {before:.2f} -> {after:.2f} ms",
+                  file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"Sin regresiones frente a {args.baseline} (umbral {args.threshold:.0%})", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """Caché LRU con expiración (TTL) de registros de usuario por id y por correo"""
+
+    def __init__(self, max_size=1000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._by_id = OrderedDict()  # id -> (registro, correo, expira)
+        self._id_by_correo = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(correo):
+        return correo.lower() if correo else None
+
+    def _remove(self, user_id):
+        entry = self._by_id.pop(user_id, None)
+        # El correo pudo pasar a otro usuario (un eliminado libera el suyo)
+        if entry is not None and self._id_by_correo.get(entry[1]) == user_id:
+            del self._id_by_correo[entry[1]]
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._by_id.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] < time.monotonic():
+                self._remove(user_id)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._by_id.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def get_by_correo(self, correo):
+        with self._lock:
+            user_id = self._id_by_correo.get(self._key(correo))
+        if user_id is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return self.get(user_id)
+
+    def put(self, user_id, record, correo=None):
+        with self._lock:
+            self._remove(user_id)
+            key = self._key(correo)
+            self._by_id[user_id] = (record, key, time.monotonic() + self.ttl)
+            if key:
+                self._id_by_correo[key] = user_id
+            while len(self._by_id) > self.max_size:
+                oldest = next(iter(self._by_id))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, user_id=None, correo=None):
+        """Elimina la entrada del usuario por id y/o correo"""
+        with self._lock:
+            if user_id is None and correo is not None:
+                user_id = self._id_by_correo.get(self._key(correo))
+            if user_id is not None:
+                self._remove(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_correo.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._by_id),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
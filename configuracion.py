@@ -0,0 +1,171 @@
+import getpass
+import os
+import socket
+
+from auditoria import AuditLog
+from cache_usuarios import UserCache
+from limitador_login import DatabaseLockoutStore, LoginRateLimiter
+from metricas import metrics
+from repositorio import MariaDBUserRepository, SQLiteUserRepository
+from servicio_hash import PasswordHasher
+from sesiones import DatabaseSessionStore, SessionManager, TokenFile, load_secret
+
+
+# --- Configuración de la Base de Datos ---
+# Motor: 'mariadb' o 'sqlite' (base embebida en un archivo, sin servidor)
+DB_BACKEND = os.environ.get('CRUD_DB_BACKEND', 'mariadb')
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '', # ¡Cambia esto a con la contraseña de acceso a MariaDB!
+    'database': 'crud_db'
+}
+
+SQLITE_CONFIG = {
+    'path': os.environ.get('CRUD_SQLITE_PATH', 'crud_usuarios.db')
+}
+
+# Tamaño del pool, segundos de inactividad antes de cerrar una conexión
+# y segundos máximos de espera por una conexión libre
+DB_POOL_CONFIG = {
+    'min_size': 1,
+    'max_size': 5,
+    'idle_timeout': 300,
+    'timeout': 10
+}
+
+# Factor de costo de bcrypt (cada punto duplica el tiempo de cifrado).
+# Para elegirlo según esta máquina: python servicio_hash.py --objetivo-ms 250
+HASH_CONFIG = {
+    'rounds': 12
+}
+
+password_hasher = PasswordHasher(**HASH_CONFIG)
+
+# Búsqueda de usuarios: con fulltext=True se crea un índice FULLTEXT sobre
+# nombre y apellido y la búsqueda por nombre usa MATCH ... AGAINST
+SEARCH_CONFIG = {
+    'fulltext': False,
+    'debounce_ms': 300
+}
+
+# Caché de registros de usuario (por id y por correo): máximo de entradas y
+# segundos de vigencia para cambios hechos por otros clientes
+USER_CACHE_CONFIG = {
+    'max_size': 1000,
+    'ttl': 60
+}
+
+user_cache = UserCache(**USER_CACHE_CONFIG)
+
+# Intentos fallidos de inicio de sesión permitidos por correo y por equipo dentro
+# de la ventana (segundos); al superarlos se bloquea base_lockout segundos, el doble
+# en cada bloqueo siguiente. Con persistir=True los bloqueos sobreviven a un reinicio.
+LOGIN_LIMIT_CONFIG = {
+    'max_attempts': 5,
+    'window': 300,
+    'base_lockout': 30,
+    'max_lockout': 3600,
+    'persistir': False
+}
+
+# Identifica a este equipo ante el limitador de inicio de sesión
+CLIENT_ID = f"{getpass.getuser()}@{socket.gethostname()}"
+
+# Métricas de consultas y de bcrypt: las operaciones de base de datos que tarden más
+# de slow_query_ms se registran como lentas. Si se indica un archivo, al cerrar la
+# aplicación se escriben ahí las métricas en formato de texto de Prometheus.
+METRICS_CONFIG = {
+    'slow_query_ms': 200,
+    'archivo': os.environ.get('CRUD_METRICS_FILE')
+}
+
+metrics.configure(slow_threshold_ms=METRICS_CONFIG['slow_query_ms'])
+
+# Registro de cambios (tabla users_audit): cada alta, modificación, cambio de
+# contraseña y eliminación con los valores previos y nuevos. Se escribe en lotes de
+# hasta 'lote' eventos o cada intervalo_s segundos. Consultarlo: python auditoria.py
+AUDIT_CONFIG = {
+    'activo': True,
+    'lote': 200,
+    'intervalo_s': 1.0
+}
+
+# Eliminar un usuario solo lo marca (borrado lógico); la purga lo borra del todo
+# pasados retencion_dias, dentro de la ventana horaria de poca actividad, en lotes
+# de 'lote' filas con pausa_s segundos entre uno y otro: python purgar_usuarios.py
+PURGE_CONFIG = {
+    'ventana': '01:00-05:00',
+    'retencion_dias': 7,
+    'lote': 500,
+    'pausa_s': 0.5
+}
+
+# Sesiones: tras iniciar sesión se guarda un token firmado que evita pedir la
+# contraseña en los siguientes inicios hasta que vence (ttl, segundos) o se revoca.
+# La revocación se consulta en la base cada revocacion_s segundos. La clave de
+# firma se toma de CRUD_SESSION_SECRET o se genera en el directorio indicado.
+SESSION_CONFIG = {
+    'ttl': 8 * 3600,
+    'revocacion_s': 60,
+    'directorio': os.environ.get('CRUD_SESSION_DIR', os.path.join(os.path.expanduser('~'), '.crud_usuarios')),
+    'secreto': os.environ.get('CRUD_SESSION_SECRET')
+}
+
+_repository = None
+_sessions = None
+
+# --- Repositorio y sesiones compartidos ---
+def get_repository():
+    """Devuelve el repositorio de usuarios del motor configurado, creándolo en el primer uso"""
+    global _repository
+    if _repository is None:
+        opciones = {
+            'pool_config': DB_POOL_CONFIG,
+            'hasher': password_hasher,
+            'cache': user_cache,
+            'fulltext': SEARCH_CONFIG['fulltext'],
+        }
+        limite = dict(LOGIN_LIMIT_CONFIG)
+        persistir = limite.pop('persistir')
+        opciones['login_limiter'] = LoginRateLimiter(**limite)
+        if DB_BACKEND == 'sqlite':
+            _repository = SQLiteUserRepository(SQLITE_CONFIG['path'], **opciones)
+        else:
+            _repository = MariaDBUserRepository(DB_CONFIG, **opciones)
+        if persistir:
+            _repository.login_limiter.use_store(DatabaseLockoutStore(_repository))
+        if AUDIT_CONFIG['activo']:
+            _repository.audit = AuditLog(_repository, batch_size=AUDIT_CONFIG['lote'],
+                                         flush_interval=AUDIT_CONFIG['intervalo_s'], default_actor=CLIENT_ID)
+    return _repository
+
+def set_audit_actor(user):
+    """Los cambios siguientes se atribuyen al usuario que inició sesión en este equipo"""
+    if _repository is not None and _repository.audit is not None:
+        _repository.audit.default_actor = f"{user['correo']} ({CLIENT_ID})"
+
+def close_repository():
+    """Al salir: escribe los eventos de auditoría pendientes, detiene los procesos de
+    bcrypt y cierra el pool de conexiones"""
+    global _repository
+    if _repository is not None:
+        if _repository.audit is not None:
+            _repository.audit.close()
+        _repository.close()
+        _repository = None
+    password_hasher.shutdown()
+
+def get_session_manager():
+    """Devuelve el gestor de sesiones, creándolo en el primer uso"""
+    global _sessions
+    if _sessions is None:
+        secreto = load_secret(os.path.join(SESSION_CONFIG['directorio'], 'clave_sesion'),
+                              SESSION_CONFIG['secreto'])
+        _sessions = SessionManager(DatabaseSessionStore(get_repository()), secreto,
+                                   ttl=SESSION_CONFIG['ttl'], recheck=SESSION_CONFIG['revocacion_s'])
+    return _sessions
+
+def session_file():
+    return TokenFile(os.path.join(SESSION_CONFIG['directorio'], 'sesion'))
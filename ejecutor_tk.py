@@ -0,0 +1,127 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Llamadas a Tk pedidas desde hilos de trabajo; las ejecuta el hilo principal
+_ui_calls = queue.Queue()
+
+
+def run_in_ui(func, *args, **kwargs):
+    """Ejecuta func en el hilo de Tk (de inmediato si ya se está en él)"""
+    if threading.current_thread() is threading.main_thread():
+        return func(*args, **kwargs)
+    _ui_calls.put((func, args, kwargs))
+    return None
+
+
+class Task:
+    """Trabajo enviado al ejecutor; cancel() evita que se ejecuten sus callbacks"""
+
+    def __init__(self, on_done, on_error):
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+class TkExecutor:
+    """Ejecuta funciones bloqueantes en un pool de hilos y entrega los
+    resultados al hilo de Tk mediante sondeo con after()"""
+
+    def __init__(self, master, max_workers=4, poll_ms=50, on_busy=None):
+        self.master = master
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crud-worker")
+        self._results = queue.Queue()
+        self._pending = set()
+        self._busy = False
+        self._closed = False
+        self._after_id = self.master.after(self.poll_ms, self._poll)
+
+    @property
+    def busy(self):
+        return bool(self._pending)
+
+    def submit(self, func, *args, on_done=None, on_error=None, **kwargs):
+        """Envía func(*args, **kwargs) a un hilo de trabajo.
+        on_done(resultado) u on_error(excepción) se llaman en el hilo de Tk."""
+        task = Task(on_done, on_error)
+
+        def run():
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                self._results.put((task, False, e))
+            else:
+                self._results.put((task, True, result))
+
+        self._pending.add(task)
+        task.future = self._pool.submit(run)
+        self._update_busy()
+        return task
+
+    def cancel_all(self):
+        for task in list(self._pending):
+            task.cancel()
+        self._pending.clear()
+        self._update_busy()
+
+    def shutdown(self):
+        """Cancela lo pendiente y detiene el sondeo (llamar al cerrar la ventana)"""
+        self._closed = True
+        self.cancel_all()
+        try:
+            self.master.after_cancel(self._after_id)
+        except Exception:
+            pass
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _update_busy(self):
+        busy = bool(self._pending)
+        if busy != self._busy:
+            self._busy = busy
+            if self.on_busy:
+                self.on_busy(busy)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    func, args, kwargs = _ui_calls.get_nowait()
+                except queue.Empty:
+                    break
+                func(*args, **kwargs)
+
+            while True:
+                try:
+                    task, ok, value = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._pending.discard(task)
+                if task.cancelled:
+                    continue
+                if ok:
+                    if task.on_done:
+                        task.on_done(value)
+                elif task.on_error:
+                    task.on_error(value)
+                else:
+                    print(f"Error en tarea de segundo plano: {value!r}")
+            self._update_busy()
+        finally:
+            if not self._closed:
+                try:
+                    self._after_id = self.master.after(self.poll_ms, self._poll)
+                except Exception:
+                    # La ventana ya fue destruida
+                    self._closed = True
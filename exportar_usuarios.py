@@ -0,0 +1,158 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date
+
+import configuracion
+from repositorio import EXPORT_FIELDS
+
+# La contraseña cifrada nunca se exporta
+EXPORT_COLUMNS = EXPORT_FIELDS
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+def _text(value):
+    return value if value is None or isinstance(value, (int, str)) else str(value)
+
+
+class CsvExportWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlExportWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        self.file.writelines(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_text, row))), ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    """Escribe un grupo de filas (row group) de Parquet por cada bloque leído"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Para exportar a Parquet instale pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('tipo_identificacion', pa.string()),
+            ('numero_identificacion', pa.string()),
+            ('nombre', pa.string()),
+            ('apellido', pa.string()),
+            ('direccion', pa.string()),
+            ('fecha_nacimiento', pa.date32()),
+            ('correo', pa.string()),
+            ('telefono', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        # SQLite devuelve las fechas como texto AAAA-MM-DD
+        columns[6] = [date.fromisoformat(v) if isinstance(v, str) else v for v in columns[6]]
+        table = self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema
+        )
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': CsvExportWriter,
+    'jsonl': JsonlExportWriter,
+    'parquet': ParquetExportWriter,
+}
+
+
+class ExportResult:
+    def __init__(self):
+        self.rows = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return f"Filas exportadas: {self.rows} ({self.elapsed:.1f} s, {self.rate:.0f} filas/s)"
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'ndjson':
+        return 'jsonl'
+    if extension in FORMATS:
+        return extension
+    raise ValueError(f"No se reconoce el formato de '{path}'; use --format {'/'.join(FORMATS)}")
+
+
+def export_users(path, fmt=None, chunk_size=5000, progress=None, repository=None):
+    """Exporta la tabla users en bloques de chunk_size filas.
+
+    En MariaDB usa un cursor sin búfer, de modo que el servidor envía las filas
+    a medida que se leen y la memoria usada no depende del tamaño de la tabla.
+    progress(resultado) se llama después de cada bloque."""
+    repository = repository or configuracion.get_repository()
+    fmt = fmt or detect_format(path)
+    writer = WRITERS[fmt](path)
+    result = ExportResult()
+    start = time.perf_counter()
+
+    try:
+        for rows in repository.stream_users(chunk_size):
+            writer.write(rows)
+            result.rows += len(rows)
+            result.elapsed = time.perf_counter() - start
+            if progress:
+                progress(result)
+    finally:
+        writer.close()
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta la tabla de usuarios a CSV, JSONL o Parquet")
+    parser.add_argument('archivo', help="Archivo de salida (.csv, .jsonl o .parquet)")
+    parser.add_argument('--format', choices=FORMATS, help="Formato (por defecto, según la extensión)")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="Filas leídas por bloque")
+    args = parser.parse_args(argv)
+
+    def progress(result):
+        print(f"\r{result.rows} filas ({result.rate:.0f} filas/s)", end='', file=sys.stderr, flush=True)
+
+    result = export_users(args.archivo, args.format, args.chunk_size, progress)
+    print(file=sys.stderr)
+    print(result.summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
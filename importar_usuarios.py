@@ -0,0 +1,275 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+import configuracion
+from repositorio import INSERT_USER_SQL
+from servicio_hash import PasswordHasher
+from validaciones import validate_many
+
+COLUMNS = (
+    'tipo_identificacion',
+    'numero_identificacion',
+    'nombre',
+    'apellido',
+    'direccion',
+    'fecha_nacimiento',
+    'correo',
+    'password',
+    'telefono',
+)
+
+INSERT_SQL = INSERT_USER_SQL
+
+
+class ImportResult:
+    """Resumen de una importación: filas leídas, insertadas y errores por fila"""
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.errors = []  # (línea, correo, mensaje)
+        self.elapsed = 0.0
+
+    def add_error(self, line, correo, mensaje):
+        self.errors.append((line, correo, mensaje))
+
+    def summary(self):
+        rate = self.inserted / self.elapsed if self.elapsed else 0
+        return (f"Filas leídas: {self.read}, insertadas: {self.inserted}, "
+                f"con error: {len(self.errors)} ({self.elapsed:.1f} s, {rate:.0f} filas/s)")
+
+
+def read_rows(path):
+    """Lee el archivo por streaming y produce (número de línea, fila) para CSV o JSONL"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if extension in ('.jsonl', '.ndjson'):
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, e
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def validate_rows(rows):
+    """Normaliza y valida un bloque de (línea, fila) con las mismas reglas del
+    formulario (validaciones.USER_SCHEMA), columna por columna. Devuelve
+    (válidas, errores): [(línea, valores)] y [(línea, correo, mensaje)]."""
+    normalized = []
+    errors = []
+    for line, row in rows:
+        if not isinstance(row, dict):
+            errors.append((line, None, f"Fila inválida: {row}"))
+            continue
+        values = {}
+        for column in COLUMNS:
+            value = row.get(column)
+            values[column] = str(value).strip() if value is not None else ''
+        normalized.append((line, values))
+
+    invalid = validate_many(values for _, values in normalized)
+    valid = []
+    for index, (line, values) in enumerate(normalized):
+        if index in invalid:
+            errors.append((line, values['correo'] or None, '; '.join(m for _, m in invalid[index])))
+            continue
+        for column in ('direccion', 'fecha_nacimiento', 'telefono'):
+            values[column] = values[column] or None
+        valid.append((line, values))
+    return valid, errors
+
+
+def _params(values, hashed_password):
+    return (
+        values['tipo_identificacion'],
+        values['numero_identificacion'],
+        values['nombre'],
+        values['apellido'],
+        values['direccion'],
+        values['fecha_nacimiento'],
+        values['correo'],
+        hashed_password,
+        values['telefono'],
+    )
+
+
+def _write_batch(conn, batch, hashes, result):
+    """Inserta un lote con executemany; si falla, reintenta fila por fila para
+    registrar exactamente qué filas tienen error. Devuelve los registros insertados."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SAVEPOINT lote_importacion")
+        try:
+            cursor.executemany(INSERT_SQL, [_params(v, h) for (_, v), h in zip(batch, hashes)])
+            result.inserted += len(batch)
+            return [values for _, values in batch]
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT lote_importacion")
+
+        inserted = []
+        for (line, values), hashed in zip(batch, hashes):
+            try:
+                cursor.execute(INSERT_SQL, _params(values, hashed))
+                result.inserted += 1
+                inserted.append(values)
+            except Exception as e:
+                result.add_error(line, values['correo'], str(e))
+        return inserted
+    finally:
+        cursor.close()
+
+
+def _audit_inserted(conn, audit, inserted, chunk_size=500):
+    """Registra en la auditoría los usuarios ya confirmados; executemany no devuelve
+    los id, así que se buscan por correo"""
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(inserted), chunk_size):
+            chunk = inserted[start:start + chunk_size]
+            cursor.execute(
+                f"SELECT id, correo FROM users WHERE correo IN ({', '.join('?' * len(chunk))}) "
+                "AND deleted_at IS NULL",
+                [values['correo'] for values in chunk]
+            )
+            ids = {correo.lower(): user_id for user_id, correo in cursor.fetchall()}
+            for values in chunk:
+                despues = {column: values[column] for column in COLUMNS if column != 'password'}
+                audit.record('insert', ids.get(values['correo'].lower()), despues={**despues, 'version': 1})
+    finally:
+        cursor.close()
+    inserted.clear()
+
+
+def write_report(path, errors):
+    """CSV con una fila por error, en el orden del archivo importado (los errores de
+    inserción se detectan después que los de validación del mismo bloque)"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['linea', 'correo', 'error'])
+        writer.writerows(sorted(errors, key=lambda error: error[0]))
+
+
+def import_users(path, batch_size=500, batches_per_commit=10, hasher=None,
+                 report_path=None, progress=None, repository=None):
+    """Importa usuarios desde CSV o JSONL en lotes con executemany.
+
+    Las contraseñas de cada lote se cifran en paralelo con hasher.hash_many_async
+    mientras se escribe el lote anterior; se confirma cada batches_per_commit lotes.
+    progress(resultado) se llama después de cada lote."""
+    repository = repository or configuracion.get_repository()
+    hasher = hasher or repository.hasher
+    result = ImportResult()
+    start = time.perf_counter()
+    seen = set()
+
+    with repository.connection() as conn:
+        pending = None  # (lote, iterador de hashes en curso)
+        batches_in_tx = 0
+        uncommitted = []  # insertados en la transacción en curso, para la auditoría
+
+        def commit():
+            conn.commit()
+            if repository.audit is not None and uncommitted:
+                _audit_inserted(conn, repository.audit, uncommitted)
+
+        def flush(pending):
+            nonlocal batches_in_tx
+            batch, hashes = pending
+            inserted = _write_batch(conn, batch, list(hashes), result)
+            if repository.audit is not None:
+                uncommitted.extend(inserted)
+            batches_in_tx += 1
+            if batches_in_tx >= batches_per_commit:
+                commit()
+                batches_in_tx = 0
+            if progress:
+                progress(result)
+
+        def submit(batch):
+            return batch, hasher.hash_many_async(v['password'] for _, v in batch)
+
+        batch = []
+        rows = read_rows(path)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            result.read += len(chunk)
+            valid, errors = validate_rows(chunk)
+            for error in errors:
+                result.add_error(*error)
+
+            for line, values in valid:
+                correo = values['correo'].lower()
+                if correo in seen:
+                    result.add_error(line, values['correo'], "Correo repetido dentro del archivo")
+                    continue
+                seen.add(correo)
+                batch.append((line, values))
+                if len(batch) >= batch_size:
+                    current = submit(batch)
+                    if pending:
+                        flush(pending)
+                    pending = current
+                    batch = []
+
+        if batch:
+            current = submit(batch)
+            if pending:
+                flush(pending)
+            pending = current
+        if pending:
+            flush(pending)
+        commit()
+
+    result.elapsed = time.perf_counter() - start
+    if report_path and result.errors:
+        write_report(report_path, result.errors)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa usuarios desde un archivo CSV o JSONL")
+    parser.add_argument('archivo', help="Archivo .csv o .jsonl con las columnas de la tabla users y 'password'")
+    parser.add_argument('--batch-size', type=int, default=500, help="Filas por executemany")
+    parser.add_argument('--commit-every', type=int, default=10, help="Lotes por transacción")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos para cifrar contraseñas")
+    parser.add_argument('--rounds', type=int, default=None, help="Costo de bcrypt (por defecto, HASH_CONFIG)")
+    parser.add_argument('--report', help="Archivo CSV donde guardar los errores por fila")
+    args = parser.parse_args(argv)
+
+    def progress(result):
+        print(f"\r{result.read} leídas, {result.inserted} insertadas, {len(result.errors)} errores",
+              end='', flush=True)
+
+    repository = configuracion.get_repository()
+    hasher = PasswordHasher(args.rounds or configuracion.HASH_CONFIG['rounds'], args.workers)
+    try:
+        repository.create_schema()
+        result = import_users(args.archivo, args.batch_size, args.commit_every, hasher,
+                              args.report, progress, repository)
+    finally:
+        # Sin esto los procesos de bcrypt quedan vivos hasta el cierre del intérprete
+        hasher.shutdown()
+        configuracion.close_repository()
+    print()
+    print(result.summary())
+    if result.errors and not args.report:
+        for line, correo, error in result.errors[:20]:
+            print(f"  línea {line} ({correo}): {error}")
+    return 1 if result.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
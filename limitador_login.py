@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('crud_usuarios.login')
+
+
+class LoginLockedError(Exception):
+    """Demasiados intentos fallidos: el inicio de sesión está bloqueado temporalmente"""
+
+    def __init__(self, clave, retry_after):
+        self.clave = clave
+        self.retry_after = retry_after
+        super().__init__(f"Demasiados intentos fallidos. Intente de nuevo en {int(retry_after) + 1} segundos.")
+
+
+class _KeyState:
+    def __init__(self):
+        self.failures = deque()  # instantes de los intentos fallidos dentro de la ventana
+        self.locked_until = 0.0
+        self.lockouts = 0  # bloqueos seguidos; cada uno dura el doble que el anterior
+
+
+class LoginRateLimiter:
+    """Limita los intentos fallidos por correo y por cliente con una ventana deslizante.
+
+    Al superar max_attempts fallos dentro de window segundos la clave se bloquea
+    base_lockout segundos; cada bloqueo siguiente dura el doble (hasta max_lockout).
+    check() se llama antes de consultar la base de datos o de verificar el hash, así
+    los intentos abusivos se rechazan sin gastar trabajo. Con un store los bloqueos
+    se guardan en la tabla login_lockouts y sobreviven a un reinicio."""
+
+    def __init__(self, max_attempts=5, window=300, base_lockout=30, max_lockout=3600,
+                 store=None, max_keys=10000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.base_lockout = base_lockout
+        self.max_lockout = max_lockout
+        self.store = store
+        self.max_keys = max_keys
+        self._states = {}
+        self._lock = threading.Lock()
+        self._loaded = store is None
+
+    def use_store(self, store):
+        """Guarda los bloqueos en store; los vigentes se leen en el próximo check()"""
+        with self._lock:
+            self.store = store
+            self._loaded = False
+
+    @staticmethod
+    def keys(correo, client=None):
+        keys = [f"correo:{correo.strip().lower()}"]
+        if client:
+            keys.append(f"cliente:{client}")
+        return keys
+
+    def _load(self):
+        # Bloqueos vigentes guardados por una ejecución anterior; se leen en el primer uso
+        self._loaded = True
+        try:
+            lockouts = self.store.load_lockouts(time.time())
+        except Exception as e:
+            logger.warning(f"No se pudieron leer los bloqueos de inicio de sesión: {e}")
+            return
+        for clave, locked_until, count in lockouts:
+            state = self._states.setdefault(clave, _KeyState())
+            state.locked_until = max(state.locked_until, locked_until)
+            state.lockouts = max(state.lockouts, count)
+
+    def _prune(self, now):
+        expired = [clave for clave, state in self._states.items()
+                   if state.locked_until <= now and not state.failures
+                   and (not state.lockouts or now - state.locked_until > self.max_lockout)]
+        for clave in expired:
+            del self._states[clave]
+
+    def check(self, correo, client=None):
+        """Lanza LoginLockedError si el correo o el cliente están bloqueados"""
+        now = time.time()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            for clave in self.keys(correo, client):
+                state = self._states.get(clave)
+                if state is not None and state.locked_until > now:
+                    raise LoginLockedError(clave, state.locked_until - now)
+
+    def record_failure(self, correo, client=None):
+        now = time.time()
+        nuevos = []
+        with self._lock:
+            if len(self._states) >= self.max_keys:
+                self._prune(now)
+            for clave in self.keys(correo, client):
+                state = self._states.setdefault(clave, _KeyState())
+                if state.lockouts and now - state.locked_until > self.max_lockout:
+                    # Sin bloqueos durante un buen tiempo: se vuelve a la duración base
+                    state.lockouts = 0
+                state.failures.append(now)
+                while state.failures and state.failures[0] <= now - self.window:
+                    state.failures.popleft()
+                if len(state.failures) >= self.max_attempts:
+                    duration = min(self.base_lockout * 2 ** state.lockouts, self.max_lockout)
+                    state.locked_until = now + duration
+                    state.lockouts += 1
+                    state.failures.clear()
+                    nuevos.append((clave, state.locked_until, state.lockouts))
+
+        for clave, locked_until, count in nuevos:
+            logger.warning(f"Inicio de sesión bloqueado para {clave} hasta {time.ctime(locked_until)}")
+            if self.store is not None:
+                try:
+                    self.store.save_lockout(clave, locked_until, count)
+                except Exception as e:
+                    logger.warning(f"No se pudo guardar el bloqueo de {clave}: {e}")
+
+    def record_success(self, correo, client=None):
+        """Un inicio de sesión correcto borra los fallos y bloqueos del correo
+        (no los del cliente, que puede estar probando muchas cuentas)"""
+        clave = self.keys(correo)[0]
+        with self._lock:
+            state = self._states.pop(clave, None)
+        if state is not None and state.lockouts and self.store is not None:
+            try:
+                self.store.clear_lockout(clave)
+            except Exception as e:
+                logger.warning(f"No se pudo borrar el bloqueo de {clave}: {e}")
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {
+                'keys': len(self._states),
+                'locked': sum(1 for state in self._states.values() if state.locked_until > now),
+            }
+
+
+class DatabaseLockoutStore:
+    """Guarda los bloqueos en la tabla login_lockouts (migración 4) del repositorio"""
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def load_lockouts(self, now):
+        with self.repository.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "SELECT clave, bloqueado_hasta, bloqueos FROM login_lockouts WHERE bloqueado_hasta > ?",
+                    (now,)
+                )
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def save_lockout(self, clave, locked_until, count):
+        with self.repository.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("DELETE FROM login_lockouts WHERE clave = ?", (clave,))
+                cursor.execute(
+                    "INSERT INTO login_lockouts (clave, bloqueado_hasta, bloqueos) VALUES (?, ?, ?)",
+                    (clave, locked_until, count)
+                )
+                conn.commit()
+            finally:
+                cursor.close()
+
+    def clear_lockout(self, clave):
+        with self.repository.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("DELETE FROM login_lockouts WHERE clave = ?", (clave,))
+                conn.commit()
+            finally:
+                cursor.close()
@@ -0,0 +1,242 @@
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+
+# Límites (en segundos) de los grupos del histograma de latencia
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Tipos de operación a los que aplica el registro de operaciones lentas
+SLOW_KINDS = ('db', 'pool')
+
+logger = logging.getLogger('crud_usuarios.metricas')
+slow_logger = logging.getLogger('crud_usuarios.lentas')
+
+
+class Histogram:
+    """Histograma acumulativo de duraciones, como los de Prometheus"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, limit in enumerate(self.buckets):
+            if seconds <= limit:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def cumulative(self):
+        """Pares (límite, conteo acumulado) incluyendo +Inf"""
+        total = 0
+        for limit, count in zip(self.buckets, self.counts):
+            total += count
+            yield limit, total
+        yield float('inf'), self.count
+
+    def quantile(self, q):
+        """Estimación del percentil q: límite del primer grupo que lo alcanza"""
+        if not self.count:
+            return 0.0
+        for limit, total in self.cumulative():
+            if total >= q * self.count:
+                return min(limit, self.max)
+        return self.max
+
+
+class OperationMetrics:
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.rows = 0
+        self.errors = {}  # tipo de excepción -> conteo
+        self.slow = 0
+
+
+def _format_labels(**labels):
+    return ','.join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in labels.items())
+
+
+def _format_limit(limit):
+    return '+Inf' if limit == float('inf') else repr(limit)
+
+
+class MetricsRegistry:
+    """Tiempos, filas y errores por operación en memoria. Se exportan en formato de
+    texto de Prometheus (to_prometheus) o como registro estructurado JSON (log_snapshot)."""
+
+    def __init__(self, slow_threshold_ms=200, buckets=DEFAULT_BUCKETS):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.buckets = buckets
+        self._operations = {}  # (tipo, operación) -> OperationMetrics
+        self._lock = threading.Lock()
+
+    def configure(self, slow_threshold_ms=None):
+        if slow_threshold_ms is not None:
+            self.slow_threshold = slow_threshold_ms / 1000
+
+    def observe(self, kind, operation, seconds, rows=None, error=None):
+        slow = kind in SLOW_KINDS and seconds >= self.slow_threshold
+        with self._lock:
+            metrics = self._operations.get((kind, operation))
+            if metrics is None:
+                metrics = self._operations[(kind, operation)] = OperationMetrics(self.buckets)
+            metrics.latency.observe(seconds)
+            if rows:
+                metrics.rows += rows
+            if error is not None:
+                metrics.errors[error] = metrics.errors.get(error, 0) + 1
+            if slow:
+                metrics.slow += 1
+
+        if slow:
+            slow_logger.warning(json.dumps({
+                'evento': 'operacion_lenta', 'tipo': kind, 'operacion': operation,
+                'ms': round(seconds * 1000, 3), 'filas': rows, 'error': error,
+            }, ensure_ascii=False))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({
+                'evento': 'operacion', 'tipo': kind, 'operacion': operation,
+                'ms': round(seconds * 1000, 3), 'filas': rows, 'error': error,
+            }, ensure_ascii=False))
+
+    def snapshot(self):
+        """Resumen por operación: {'db.get_users': {'count', 'avg_ms', ...}, ...}"""
+        with self._lock:
+            result = {}
+            for (kind, operation), metrics in sorted(self._operations.items()):
+                latency = metrics.latency
+                result[f"{kind}.{operation}"] = {
+                    'count': latency.count,
+                    'avg_ms': latency.sum / latency.count * 1000 if latency.count else 0.0,
+                    'p95_ms': latency.quantile(0.95) * 1000,
+                    'max_ms': latency.max * 1000,
+                    'rows': metrics.rows,
+                    'errors': dict(metrics.errors),
+                    'slow': metrics.slow,
+                }
+            return result
+
+    def log_snapshot(self, level=logging.INFO):
+        logger.log(level, json.dumps({'evento': 'metricas', 'operaciones': self.snapshot()},
+                                     ensure_ascii=False))
+
+    def to_prometheus(self):
+        """Métricas en el formato de texto de exposición de Prometheus"""
+        lines = [
+            "# HELP crud_operation_seconds Duración de las operaciones de base de datos y bcrypt",
+            "# TYPE crud_operation_seconds histogram",
+        ]
+        with self._lock:
+            operations = sorted(self._operations.items())
+            for (kind, operation), metrics in operations:
+                labels = _format_labels(kind=kind, operation=operation)
+                for limit, total in metrics.latency.cumulative():
+                    lines.append(f'crud_operation_seconds_bucket{{{labels},le="{_format_limit(limit)}"}} {total}')
+                lines.append(f"crud_operation_seconds_sum{{{labels}}} {metrics.latency.sum!r}")
+                lines.append(f"crud_operation_seconds_count{{{labels}}} {metrics.latency.count}")
+
+            lines += ["# HELP crud_operation_rows_total Filas devueltas por las consultas",
+                      "# TYPE crud_operation_rows_total counter"]
+            for (kind, operation), metrics in operations:
+                lines.append(f"crud_operation_rows_total{{{_format_labels(kind=kind, operation=operation)}}} "
+                             f"{metrics.rows}")
+
+            lines += ["# HELP crud_operation_errors_total Operaciones que terminaron con una excepción",
+                      "# TYPE crud_operation_errors_total counter"]
+            for (kind, operation), metrics in operations:
+                for error, count in sorted(metrics.errors.items()):
+                    labels = _format_labels(kind=kind, operation=operation, error=error)
+                    lines.append(f"crud_operation_errors_total{{{labels}}} {count}")
+
+            lines += ["# HELP crud_slow_operations_total Operaciones que superaron el umbral de lentitud",
+                      "# TYPE crud_slow_operations_total counter"]
+            for (kind, operation), metrics in operations:
+                lines.append(f"crud_slow_operations_total{{{_format_labels(kind=kind, operation=operation)}}} "
+                             f"{metrics.slow}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+
+# Registro global del proceso
+metrics = MetricsRegistry()
+
+
+def count_rows(result):
+    """Filas de un resultado: len() de una lista, 1 de un registro, 0 de None"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, (tuple, dict)):
+        return 1
+    return None
+
+
+def instrument(operation, kind='db', rows=count_rows, registry=None):
+    """Decorador que registra duración, filas y errores de cada llamada"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                (registry or metrics).observe(kind, operation, time.perf_counter() - start,
+                                              error=type(e).__name__)
+                raise
+            (registry or metrics).observe(kind, operation, time.perf_counter() - start,
+                                          rows=rows(result) if rows else None)
+            return result
+        return wrapper
+    return decorator
+
+
+class StartupProfile:
+    """Duración de cada fase del arranque (CRUD_STARTUP_PROFILE=1). Con el valor
+    'cprofile' además se perfila el arranque y se listan las funciones más costosas;
+    el detalle de las importaciones se obtiene con python -X importtime."""
+
+    def __init__(self, mode=None, start=None):
+        self.enabled = bool(mode) and mode != '0'
+        self.start = self.last = start or time.perf_counter()
+        self.phases = []
+        self._profiler = None
+        if self.enabled and mode == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, phase=None, stream=None):
+        """Cierra la última fase y escribe el informe (una sola vez)"""
+        if not self.enabled:
+            return
+        if phase:
+            self.mark(phase)
+        self.enabled = False
+        stream = stream or sys.stderr
+        print("Perfil de arranque:", file=stream)
+        for name, seconds in self.phases:
+            print(f"  {name:<28} {seconds * 1000:9.1f} ms", file=stream)
+        print(f"  {'total':<28} {(self.last - self.start) * 1000:9.1f} ms", file=stream)
+        if self._profiler is not None:
+            import pstats
+            self._profiler.disable()
+            pstats.Stats(self._profiler, stream=stream).sort_stats('cumulative').print_stats(25)
@@ -0,0 +1,232 @@
+# Migraciones del esquema de la tabla users. Cada una tiene versión, descripción
+# y sentencias; las aplicadas quedan registradas en schema_migrations y al
+# iniciar la aplicación solo se ejecutan las pendientes. Una sentencia que difiere
+# entre motores se escribe como {'mariadb': ..., 'sqlite': ...}.
+#
+# En MariaDB el DDL confirma solo y no se revierte: si una migración falla a medias
+# se vuelve a ejecutar entera, así que cada sentencia debe poder repetirse (IF NOT
+# EXISTS / IF EXISTS). En SQLite cada migración corre en una transacción.
+
+
+def add_column(table, definition):
+    """ALTER TABLE ... ADD COLUMN que en MariaDB no falla si la columna ya existe
+    (SQLite no admite IF NOT EXISTS aquí, pero revierte la migración completa)"""
+    return {'mariadb': f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {definition}",
+            'sqlite': f"ALTER TABLE {table} ADD COLUMN {definition}"}
+
+
+MIGRATIONS = [
+    (1, "Índice único sobre correo", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_correo ON users (correo)",
+    ]),
+    (2, "Índice único sobre tipo y número de identificación", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_identificacion "
+        "ON users (tipo_identificacion, numero_identificacion)",
+    ]),
+    (3, "Índices para la búsqueda de usuarios", [
+        "CREATE INDEX IF NOT EXISTS ix_users_nombre ON users (nombre)",
+        "CREATE INDEX IF NOT EXISTS ix_users_apellido ON users (apellido)",
+        "CREATE INDEX IF NOT EXISTS ix_users_telefono ON users (telefono)",
+        "CREATE INDEX IF NOT EXISTS ix_users_fecha_nacimiento ON users (fecha_nacimiento)",
+    ]),
+    (4, "Tabla de bloqueos de inicio de sesión", [
+        """CREATE TABLE IF NOT EXISTS login_lockouts (
+            clave VARCHAR(255) PRIMARY KEY,
+            bloqueado_hasta DOUBLE NOT NULL,
+            bloqueos INT NOT NULL
+        )""",
+    ]),
+    (5, "Versión y fecha de modificación de cada usuario", [
+        add_column('users', "version INT NOT NULL DEFAULT 1"),
+        add_column('users', "updated_at BIGINT NOT NULL DEFAULT 0"),
+        "CREATE INDEX IF NOT EXISTS ix_users_updated_at ON users (updated_at)",
+    ]),
+    (6, "Tabla de sesiones", [
+        """CREATE TABLE IF NOT EXISTS sessions (
+            id VARCHAR(64) PRIMARY KEY,
+            user_id INT NOT NULL,
+            cliente VARCHAR(255),
+            created_at BIGINT NOT NULL,
+            expires_at BIGINT NOT NULL,
+            revoked_at BIGINT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_sessions_user_id ON sessions (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)",
+    ]),
+    (7, "Registro de cambios de usuarios (auditoría)", [
+        {
+            'mariadb': """CREATE TABLE IF NOT EXISTS users_audit (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT,
+                operacion VARCHAR(16) NOT NULL,
+                actor VARCHAR(255),
+                columnas VARCHAR(255),
+                antes LONGTEXT,
+                despues LONGTEXT,
+                registrado_en DOUBLE NOT NULL,
+                insertado_en BIGINT NOT NULL
+            )""",
+            # AUTOINCREMENT: los id (offsets de los consumidores) nunca se reutilizan
+            'sqlite': """CREATE TABLE IF NOT EXISTS users_audit (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INT,
+                operacion VARCHAR(16) NOT NULL,
+                actor VARCHAR(255),
+                columnas VARCHAR(255),
+                antes TEXT,
+                despues TEXT,
+                registrado_en DOUBLE NOT NULL,
+                insertado_en BIGINT NOT NULL
+            )""",
+        },
+        "CREATE INDEX IF NOT EXISTS ix_users_audit_user_id ON users_audit (user_id)",
+    ]),
+    (8, "Borrado lógico de usuarios", [
+        add_column('users', "deleted_at BIGINT NULL"),
+        "CREATE INDEX IF NOT EXISTS ix_users_deleted_at ON users (deleted_at)",
+    ]),
+    # activo es 1 en los usuarios vigentes y NULL en los eliminados; los índices únicos
+    # admiten varios NULL, así el correo o la identificación de un usuario eliminado
+    # se pueden volver a registrar antes de que la purga borre la fila
+    (9, "Usuarios eliminados fuera de los índices únicos", [
+        add_column('users', "activo TINYINT NULL DEFAULT 1"),
+        "UPDATE users SET activo = NULL WHERE deleted_at IS NOT NULL",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_correo_activo ON users (correo, activo)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_identificacion_activo "
+        "ON users (tipo_identificacion, numero_identificacion, activo)",
+        {'mariadb': "DROP INDEX IF EXISTS ux_users_correo ON users",
+         'sqlite': "DROP INDEX IF EXISTS ux_users_correo"},
+        {'mariadb': "DROP INDEX IF EXISTS ux_users_identificacion ON users",
+         'sqlite': "DROP INDEX IF EXISTS ux_users_identificacion"},
+    ]),
+    # Los índices únicos empiezan por tipo_identificacion y no sirven para filtrar
+    # solo por número, que es como se busca desde la grilla y la API
+    (10, "Índice para buscar por número de identificación", [
+        "CREATE INDEX IF NOT EXISTS ix_users_numero_identificacion ON users (numero_identificacion)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Consultas para explicar por qué no se pudo crear un índice único
+DUPLICATE_CHECKS = {
+    1: "SELECT correo, COUNT(*) FROM users GROUP BY correo HAVING COUNT(*) > 1 LIMIT 10",
+    2: {
+        'mariadb': """SELECT CONCAT(tipo_identificacion, ' ', numero_identificacion), COUNT(*)
+                      FROM users GROUP BY tipo_identificacion, numero_identificacion
+                      HAVING COUNT(*) > 1 LIMIT 10""",
+        # CONCAT llegó a SQLite en la 3.44
+        'sqlite': """SELECT tipo_identificacion || ' ' || numero_identificacion, COUNT(*)
+                     FROM users GROUP BY tipo_identificacion, numero_identificacion
+                     HAVING COUNT(*) > 1 LIMIT 10""",
+    },
+}
+
+
+class MigrationError(Exception):
+    """Una migración falló; las anteriores quedan aplicadas"""
+
+    def __init__(self, version, descripcion, error, duplicados=None):
+        self.version = version
+        self.descripcion = descripcion
+        self.error = error
+        self.duplicados = duplicados or []
+        mensaje = f"Migración {version} ({descripcion}) falló: {error}"
+        if self.duplicados:
+            detalle = ", ".join(f"{valor} ({veces})" for valor, veces in self.duplicados)
+            mensaje += f". Registros duplicados: {detalle}"
+        super().__init__(mensaje)
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            descripcion VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def schema_version(conn):
+    """Última migración aplicada, con una sola consulta; None si la base aún no
+    tiene la tabla schema_migrations"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_migrations")
+        return cursor.fetchone()[0]
+    except Exception:
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+
+
+def pending_migrations(conn):
+    """Devuelve las migraciones que aún no se han aplicado"""
+    cursor = conn.cursor()
+    try:
+        ensure_migrations_table(cursor)
+        conn.commit()
+        aplicadas = applied_versions(cursor)
+    finally:
+        cursor.close()
+    return [m for m in MIGRATIONS if m[0] not in aplicadas]
+
+
+def ensure_fulltext_index(conn):
+    """Índice FULLTEXT opcional para buscar por nombre y apellido (SEARCH_CONFIG)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("CREATE FULLTEXT INDEX IF NOT EXISTS ft_users_nombre ON users (nombre, apellido)")
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def _find_duplicates(conn, version, dialect=None):
+    query = DUPLICATE_CHECKS.get(version)
+    if isinstance(query, dict):
+        query = query.get(dialect)
+    if not query:
+        return []
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        return cursor.fetchall()
+    except Exception:
+        return []
+    finally:
+        cursor.close()
+
+
+def apply_pending_migrations(conn, dialect=None):
+    """Aplica en orden las migraciones pendientes y devuelve las versiones aplicadas.
+    Si una falla se lanza MigrationError y no se intentan las siguientes."""
+    aplicadas = []
+    for version, descripcion, sentencias in pending_migrations(conn):
+        cursor = conn.cursor()
+        try:
+            if dialect == 'sqlite':
+                cursor.execute("BEGIN")
+            for sentencia in sentencias:
+                if isinstance(sentencia, dict):
+                    sentencia = sentencia[dialect]
+                cursor.execute(sentencia)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, descripcion) VALUES (?, ?)",
+                (version, descripcion)
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise MigrationError(version, descripcion, e, _find_duplicates(conn, version, dialect)) from e
+        finally:
+            cursor.close()
+        aplicadas.append(version)
+    return aplicadas
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeoutError(Exception):
+    """No hubo una conexión libre dentro del tiempo de espera"""
+
+
+class PooledConnection:
+    """Conexión prestada por el pool; close() la devuelve en lugar de cerrarla"""
+
+    def __init__(self, pool, raw, state=None):
+        self._pool = pool
+        self._raw = raw
+        # Datos asociados a la conexión física que se conservan entre préstamos
+        # (por ejemplo, los cursores preparados de StatementRegistry)
+        self.state = {} if state is None else state
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._pool.release(self)
+
+
+class ConnectionPool:
+    """Pool de conexiones con tamaño mínimo/máximo, chequeo de salud y expulsión de inactivas"""
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300,
+                 timeout=10, health_check=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tamaños de pool inválidos")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._health_check = health_check or (lambda raw: raw.ping())
+
+        self._idle = deque()  # (raw, created_at, last_used, state)
+        self._in_use = 0
+        self._lock = threading.Condition()
+        self._closed = False
+
+        self._checkouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+        for _ in range(min_size):
+            self._idle.append((self._new_raw(), time.monotonic(), time.monotonic(), {}))
+
+    def _new_raw(self):
+        raw = self._connect()
+        with self._lock:
+            self._created += 1
+        return raw
+
+    def _discard(self, raw):
+        self._discarded += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self):
+        # Se llama con el lock tomado; conserva al menos min_size conexiones
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        keep = deque()
+        total = len(self._idle) + self._in_use
+        while self._idle:
+            entry = self._idle.popleft()
+            if now - entry[2] > self.idle_timeout and total > self.min_size:
+                self._discard(entry[0])
+                total -= 1
+            else:
+                keep.append(entry)
+        self._idle = keep
+
+    def acquire(self, timeout=None):
+        """Presta una conexión sana; crea una nueva si hace falta y hay cupo"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeoutError("El pool de conexiones está cerrado")
+                self._evict_idle()
+                entry = None
+                create = False
+                while entry is None and not create:
+                    if self._idle:
+                        entry = self._idle.pop()
+                    elif self._in_use + len(self._idle) < self.max_size:
+                        create = True
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeoutError(
+                                f"No hay conexiones libres tras {timeout} s "
+                                f"(máximo {self.max_size})")
+                        self._lock.wait(remaining)
+                self._in_use += 1
+
+            try:
+                if create:
+                    raw = self._new_raw()
+                    created_at = time.monotonic()
+                    state = {}
+                else:
+                    raw, created_at, _, state = entry
+                    try:
+                        self._health_check(raw)
+                    except Exception:
+                        # El servidor se reinició o cortó la conexión: reconectar
+                        with self._lock:
+                            self._discard(raw)
+                        raw = self._new_raw()
+                        created_at = time.monotonic()
+                        state = {}
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                    self._lock.notify()
+                raise
+
+            waited = time.monotonic() - start
+            with self._lock:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+            conn = PooledConnection(self, raw, state)
+            conn.created_at = created_at
+            return conn
+
+    def release(self, conn):
+        """Devuelve la conexión al pool descartando lo que haya quedado sin confirmar"""
+        raw = conn.raw
+        healthy = True
+        try:
+            raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            self._in_use -= 1
+            if self._closed or not healthy:
+                self._discard(raw)
+            else:
+                self._idle.append((raw, conn.created_at, time.monotonic(), conn.state))
+            self._lock.notify()
+
+    def stats(self):
+        """Estadísticas del pool: préstamos, conexiones creadas y tiempos de espera"""
+        with self._lock:
+            return {
+                'checkouts': self._checkouts,
+                'connections_created': self._created,
+                'connections_discarded': self._discarded,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'timeouts': self._timeouts,
+                'wait_total_s': self._wait_total,
+                'wait_avg_s': self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'wait_max_s': self._wait_max,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+            self._lock.notify_all()
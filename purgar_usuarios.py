@@ -0,0 +1,133 @@
+import argparse
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import configuracion
+from sesiones import DatabaseSessionStore
+
+logger = logging.getLogger('crud_usuarios.purga')
+
+
+def parse_window(texto):
+    """'01:00-05:00' -> ((1, 0), (5, 0)); la ventana puede cruzar la medianoche"""
+    try:
+        inicio, fin = texto.split('-')
+        inicio = tuple(int(parte) for parte in inicio.split(':'))
+        fin = tuple(int(parte) for parte in fin.split(':'))
+        if len(inicio) != 2 or len(fin) != 2:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"Ventana inválida (se espera HH:MM-HH:MM): {texto}")
+    return inicio, fin
+
+
+def window_end(window, now=None):
+    """Fin (timestamp) de la ventana en curso o None si ahora está fuera de ella"""
+    now = now or datetime.now()
+    (h_inicio, m_inicio), (h_fin, m_fin) = window
+    inicio = now.replace(hour=h_inicio, minute=m_inicio, second=0, microsecond=0)
+    fin = now.replace(hour=h_fin, minute=m_fin, second=0, microsecond=0)
+    if fin <= inicio:
+        # Cruza la medianoche: 22:00-04:00
+        if now >= inicio:
+            fin += timedelta(days=1)
+        else:
+            inicio -= timedelta(days=1)
+    if inicio <= now < fin:
+        return fin.timestamp()
+    return None
+
+
+class PurgeJob:
+    """Borra definitivamente los usuarios con borrado lógico, solo dentro de la
+    ventana de poca actividad y en lotes pequeños con pausas, para no competir con
+    el uso normal, y también las sesiones vencidas. Se ejecuta en un hilo (start) o
+    una vez (run_once)."""
+
+    def __init__(self, repository, window=((1, 0), (5, 0)), retention=7 * 86400, chunk_size=500,
+                 pause=0.5, check_interval=60, session_store=None):
+        self.repository = repository
+        self.session_store = session_store or DatabaseSessionStore(repository)
+        self.window = window
+        self.retention = retention
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.check_interval = check_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self, ignore_window=False):
+        """Purga hasta terminar o hasta que cierre la ventana. Devuelve las filas borradas."""
+        deadline = None if ignore_window else window_end(self.window)
+        if deadline is None and not ignore_window:
+            return 0
+        start = time.perf_counter()
+        total = self.repository.purge_deleted(self.retention, self.chunk_size, self.pause, deadline)
+        if total:
+            logger.info(f"Purga: {total} usuarios borrados en {time.perf_counter() - start:.1f} s")
+        # Sin esto la tabla sessions crece con cada inicio de sesión
+        sesiones = self.session_store.delete_expired(int(time.time()))
+        if sesiones:
+            logger.info(f"Purga: {sesiones} sesiones vencidas borradas")
+        return total
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"La purga de usuarios falló: {e}")
+            self._stop.wait(self.check_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run_forever, name='purga', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def job_from_config(repository=None, config=None):
+    config = config or configuracion.PURGE_CONFIG
+    return PurgeJob(repository or configuracion.get_repository(), parse_window(config['ventana']),
+                    retention=config['retencion_dias'] * 86400, chunk_size=config['lote'],
+                    pause=config['pausa_s'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Borra definitivamente los usuarios eliminados (borrado lógico)")
+    parser.add_argument('--ventana', default=configuracion.PURGE_CONFIG['ventana'],
+                        help="Horario en que se permite purgar, HH:MM-HH:MM")
+    parser.add_argument('--ahora', action='store_true', help="Purgar ya, sin esperar la ventana")
+    parser.add_argument('--continuo', action='store_true', help="Quedarse ejecutando y purgar en cada ventana")
+    parser.add_argument('--retencion-dias', type=float,
+                        default=configuracion.PURGE_CONFIG['retencion_dias'],
+                        help="Días que se conserva un usuario eliminado antes de purgarlo")
+    parser.add_argument('--lote', type=int, default=configuracion.PURGE_CONFIG['lote'],
+                        help="Filas por transacción")
+    parser.add_argument('--pausa', type=float, default=configuracion.PURGE_CONFIG['pausa_s'],
+                        help="Segundos de pausa entre lotes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level='INFO', format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    job = job_from_config(config={'ventana': args.ventana, 'retencion_dias': args.retencion_dias,
+                                  'lote': args.lote, 'pausa_s': args.pausa})
+    if not args.continuo:
+        if not args.ahora and window_end(job.window) is None:
+            print(f"Fuera de la ventana de purga ({args.ventana}); use --ahora para purgar de todos modos")
+            return 0
+        print(f"Usuarios purgados: {job.run_once(ignore_window=args.ahora)}")
+        return 0
+    try:
+        job.run_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
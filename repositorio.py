@@ -0,0 +1,780 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from cache_usuarios import UserCache
+from metricas import instrument, metrics
+from migraciones import LATEST_VERSION, apply_pending_migrations, ensure_fulltext_index, schema_version
+from pool_conexiones import ConnectionPool, PoolTimeoutError
+from sentencias import StatementRegistry
+from servicio_hash import LatencyStats, PasswordHasher
+
+logger = logging.getLogger('crud_usuarios.repositorio')
+
+# Columnas de get_user_by_id / get_user_by_correo, en orden
+USER_FIELDS = ('id', 'tipo_identificacion', 'numero_identificacion', 'nombre', 'apellido',
+               'direccion', 'telefono', 'fecha_nacimiento', 'correo', 'password_hash', 'version')
+
+# Columnas de las filas de la tabla (get_users / get_users_page); la versión va al final
+LIST_FIELDS = ('id', 'tipo_identificacion', 'numero_identificacion', 'nombre', 'apellido',
+               'direccion', 'fecha_nacimiento', 'telefono', 'version')
+
+# Columnas que necesita el inicio de sesión
+LOGIN_FIELDS = ('id', 'nombre', 'apellido', 'correo', 'password_hash')
+
+EXPORT_FIELDS = ('id', 'tipo_identificacion', 'numero_identificacion', 'nombre', 'apellido',
+                 'direccion', 'fecha_nacimiento', 'correo', 'telefono')
+
+# updated_at se asigna con la hora del servidor (UNIX_TIMESTAMP, en SQLite registrada
+# por el repositorio) para que el sondeo de cambios no dependa del reloj de cada cliente
+INSERT_USER_SQL = """
+    INSERT INTO users (
+        tipo_identificacion,
+        numero_identificacion,
+        nombre,
+        apellido,
+        direccion,
+        fecha_nacimiento,
+        correo,
+        password_hash,
+        telefono,
+        updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, UNIX_TIMESTAMP())
+"""
+
+SELECT_USER_SQL = """
+    SELECT id, tipo_identificacion, numero_identificacion, nombre, apellido,
+           direccion, telefono, fecha_nacimiento, correo, password_hash, version
+    FROM users
+"""
+
+# Columnas editables de update_user, en el orden de los UPDATE
+UPDATE_COLUMNS = ('tipo_identificacion', 'numero_identificacion', 'nombre', 'apellido',
+                  'direccion', 'telefono', 'fecha_nacimiento', 'correo')
+
+
+def update_user_sql(columns):
+    """UPDATE de las columnas indicadas con comparación de versión (compare-and-swap):
+    solo afecta la fila si su versión sigue siendo la leída, y la incrementa"""
+    assignments = ''.join(f"{column} = ?, " for column in columns)
+    return (f"UPDATE users SET {assignments}version = version + 1, updated_at = UNIX_TIMESTAMP() "
+            f"WHERE id = ? AND version = ?")
+
+
+# Nombre de la sentencia registrada cuando cambian todas las columnas
+UPDATE_STATEMENTS = {
+    UPDATE_COLUMNS: 'update_user',
+    UPDATE_COLUMNS + ('password_hash',): 'update_user_password',
+}
+
+# Borrado lógico: la fila queda marcada con deleted_at hasta que purge_deleted la
+# borra; las consultas de lectura y el inicio de sesión ignoran las marcadas. activo
+# pasa a NULL para que el correo y la identificación queden libres (migración 9).
+SOFT_DELETE_SQL = ("UPDATE users SET deleted_at = UNIX_TIMESTAMP(), activo = NULL, version = version + 1, "
+                   "updated_at = UNIX_TIMESTAMP() WHERE id = ? AND deleted_at IS NULL")
+
+# Sentencias que se preparan una vez por conexión (StatementRegistry)
+STATEMENTS = {
+    'insert_user': INSERT_USER_SQL,
+    'get_users': f"SELECT {', '.join(LIST_FIELDS)} FROM users WHERE deleted_at IS NULL",
+    'update_user': update_user_sql(UPDATE_COLUMNS),
+    'update_user_password': update_user_sql(UPDATE_COLUMNS + ('password_hash',)),
+    'change_password': "UPDATE users SET password_hash = ?, version = version + 1, "
+                       "updated_at = UNIX_TIMESTAMP() WHERE id = ? AND deleted_at IS NULL",
+    'authenticate_user': f"SELECT {', '.join(LOGIN_FIELDS)} FROM users WHERE correo = ? AND deleted_at IS NULL",
+    'get_user_by_id': f"{SELECT_USER_SQL} WHERE id = ? AND deleted_at IS NULL",
+    'get_user_by_correo': f"{SELECT_USER_SQL} WHERE correo = ? AND deleted_at IS NULL",
+    'delete_user': SOFT_DELETE_SQL,
+    'delete_user_version': f"{SOFT_DELETE_SQL} AND version = ?",
+}
+
+
+class RepositoryError(Exception):
+    """Error del acceso a datos (consulta fallida, restricción violada, etc.)"""
+
+
+class DatabaseConnectionError(RepositoryError):
+    """No fue posible obtener una conexión a la base de datos"""
+
+
+class DuplicateUserError(RepositoryError):
+    """Ya existe un usuario con el mismo correo o identificación"""
+
+
+class ConflictError(RepositoryError):
+    """Otro cliente modificó o eliminó el usuario después de que se leyó"""
+
+
+def _comparable(valor):
+    """Valor normalizado para comparar lo enviado con lo guardado (fechas como
+    AAAA-MM-DD, números como texto, vacío como None)"""
+    if valor is None or valor == '':
+        return None
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _like_prefix(valor):
+    """Patrón LIKE 'valor%' escapando (con !) los comodines que escriba el usuario"""
+    valor = valor.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+    return valor + '%'
+
+
+class UserRepository:
+    """Acceso a la tabla users. Las subclases indican cómo conectarse y el DDL
+    propio de cada motor; las consultas comunes usan parámetros '?' en ambos.
+    Los errores se informan con excepciones RepositoryError, nunca con diálogos."""
+
+    dialect = None
+    supports_fulltext = False
+
+    def __init__(self, hasher=None, cache=None, fulltext=False, login_limiter=None):
+        self.hasher = hasher or PasswordHasher()
+        self.cache = cache or UserCache()
+        self.login_limiter = login_limiter
+        # AuditLog opcional (auditoria.py): registra cada cambio con los valores previos
+        self.audit = None
+        self.fulltext = fulltext and self.supports_fulltext
+        self.login_stats = LatencyStats()
+        self.statements = StatementRegistry(STATEMENTS, prepare=self._prepare_cursor)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._schema_ready = False
+        # Hilo para re-cifrar contraseñas con el costo actual sin demorar el inicio de sesión
+        self._rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rehash")
+
+    # --- Puntos de extensión de cada motor ---
+    driver_errors = ()
+    integrity_errors = ()
+    create_table_sql = None
+
+    def _create_pool(self):
+        raise NotImplementedError
+
+    def _stream_cursor(self, conn):
+        return conn.cursor()
+
+    def _prepare_cursor(self, conn):
+        return conn.cursor()
+
+    def _is_duplicate(self, error):
+        """True si el error de integridad es por una clave única repetida (y no, por
+        ejemplo, un CHECK o un NOT NULL)"""
+        return False
+
+    # --- Conexiones ---
+    @property
+    def pool(self):
+        # Con lock: dos hilos (p. ej. de la API) no deben crear cada uno su pool
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    try:
+                        self._pool = self._create_pool()
+                    except self.driver_errors as e:
+                        raise DatabaseConnectionError(str(e)) from e
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión del pool y traduce los errores del motor"""
+        start = time.perf_counter()
+        try:
+            conn = self.pool.acquire()
+        except (PoolTimeoutError, *self.driver_errors) as e:
+            metrics.observe('pool', 'acquire', time.perf_counter() - start, error=type(e).__name__)
+            raise DatabaseConnectionError(str(e)) from e
+        metrics.observe('pool', 'acquire', time.perf_counter() - start)
+        try:
+            yield conn
+        except self.integrity_errors as e:
+            if self._is_duplicate(e):
+                raise DuplicateUserError(
+                    "Ya existe un usuario con ese correo o con ese tipo y número de identificación.") from e
+            raise RepositoryError(str(e)) from e
+        except self.driver_errors as e:
+            raise RepositoryError(str(e)) from e
+        finally:
+            conn.close()
+
+    def close(self):
+        self._rehash_executor.shutdown(wait=False)
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+    # --- Esquema ---
+    def create_schema(self):
+        """Crea la tabla si no existe y aplica las migraciones pendientes.
+        Devuelve las versiones de migración aplicadas."""
+        with self.connection() as conn:
+            return self._ensure_schema(conn)
+
+    def bootstrap(self):
+        """Comprobaciones del arranque con una sola conexión: esquema al día y si
+        existe algún usuario. Devuelve (migraciones aplicadas, hay usuarios)."""
+        with self.connection() as conn:
+            aplicadas = self._ensure_schema(conn)
+            return aplicadas, self._has_users(conn)
+
+    @instrument('ensure_schema', rows=None)
+    def _ensure_schema(self, conn):
+        # Se verifica una vez por proceso; si la última migración ya está registrada
+        # basta una consulta y no se repite el DDL
+        if self._schema_ready:
+            return []
+        if schema_version(conn) == LATEST_VERSION:
+            aplicadas = []
+        else:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.create_table_sql)
+                conn.commit()
+            finally:
+                cursor.close()
+            # MigrationError se propaga tal cual para mostrar los duplicados que la causan
+            aplicadas = apply_pending_migrations(conn, self.dialect)
+        if self.fulltext:
+            ensure_fulltext_index(conn)
+        self._schema_ready = True
+        return aplicadas
+
+    # --- Consultas ---
+    @instrument('insert_user')
+    def insert_user(self, tipo_identificacion, numero_identificacion, nombre, apellido, correo, password,
+                    direccion=None, fecha_nacimiento=None, telefono=None):
+        """Inserta un usuario y devuelve el id asignado"""
+        hashed_password = self.hasher.hash(password)
+        with self.connection() as conn:
+            cursor = self.statements.execute(conn, 'insert_user', (
+                tipo_identificacion,
+                numero_identificacion,
+                nombre,
+                apellido,
+                direccion,
+                fecha_nacimiento,
+                correo,
+                hashed_password,
+                telefono
+            ))
+            user_id = cursor.lastrowid
+            conn.commit()
+        self.cache.invalidate(correo=correo)
+        if self.audit is not None:
+            self.audit.record('insert', user_id, despues={
+                'tipo_identificacion': tipo_identificacion, 'numero_identificacion': numero_identificacion,
+                'nombre': nombre, 'apellido': apellido, 'direccion': direccion,
+                'fecha_nacimiento': fecha_nacimiento, 'correo': correo, 'telefono': telefono, 'version': 1,
+            })
+        return user_id
+
+    @instrument('get_users')
+    def get_users(self):
+        with self.connection() as conn:
+            return self.statements.execute(conn, 'get_users').fetchall()
+
+    def build_user_filters(self, filtros):
+        """Convierte los filtros de búsqueda en condiciones SQL parametrizadas.
+        Los prefijos (LIKE 'x%') y rangos aprovechan los índices de la tabla.
+        Siempre excluye los usuarios con borrado lógico."""
+        condiciones = ["deleted_at IS NULL"]
+        parametros = []
+        if not filtros:
+            return condiciones, parametros
+
+        nombre = filtros.get('nombre')
+        if nombre:
+            if self.fulltext:
+                # Cada palabra es obligatoria y se busca por prefijo
+                condiciones.append("MATCH(nombre, apellido) AGAINST (? IN BOOLEAN MODE)")
+                parametros.append(' '.join(f"+{palabra}*" for palabra in re.findall(r'\w+', nombre)))
+            else:
+                condiciones.append("(nombre LIKE ? ESCAPE '!' OR apellido LIKE ? ESCAPE '!')")
+                parametros += [_like_prefix(nombre), _like_prefix(nombre)]
+
+        for campo in ('correo', 'numero_identificacion', 'telefono'):
+            if filtros.get(campo):
+                condiciones.append(f"{campo} LIKE ? ESCAPE '!'")
+                parametros.append(_like_prefix(filtros[campo]))
+
+        if filtros.get('tipo_identificacion'):
+            condiciones.append("tipo_identificacion = ?")
+            parametros.append(filtros['tipo_identificacion'])
+
+        if filtros.get('fecha_desde'):
+            condiciones.append("fecha_nacimiento >= ?")
+            parametros.append(filtros['fecha_desde'])
+
+        if filtros.get('fecha_hasta'):
+            condiciones.append("fecha_nacimiento <= ?")
+            parametros.append(filtros['fecha_hasta'])
+
+        return condiciones, parametros
+
+    @instrument('get_users_page')
+    def get_users_page(self, after_id=None, before_id=None, limit=100, filtros=None):
+        """Página de usuarios ordenada por id usando paginación por llave"""
+        condiciones, parametros = self.build_user_filters(filtros)
+        if before_id is not None:
+            condiciones.insert(0, "id < ?")
+            parametros.insert(0, before_id)
+            orden = "DESC"
+        else:
+            condiciones.insert(0, "id > ?")
+            parametros.insert(0, after_id if after_id is not None else 0)
+            orden = "ASC"
+
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"""
+                    SELECT {', '.join(LIST_FIELDS)}
+                    FROM users WHERE {' AND '.join(condiciones)}
+                    ORDER BY id {orden} LIMIT ?
+                """, (*parametros, limit))
+                users = cursor.fetchall()
+            finally:
+                cursor.close()
+        if before_id is not None:
+            # Página anterior: se leyó hacia atrás y se invierte para mantener el orden
+            users.reverse()
+        return users
+
+    @instrument('get_users_changes')
+    def get_users_changes(self, since=None, first_id=0, last_id=0, filtros=None, limit=500, margin=5):
+        """Sondeo barato de cambios ajenos. Devuelve (marca, max_id, conteo, filas):
+        la marca de tiempo para el próximo sondeo, el id máximo, cuántas filas (con los
+        filtros) hay entre first_id y last_id, y las filas de la ventana o posteriores a
+        ella (con los filtros) creadas o modificadas desde since. Se relee un margen de
+        segundos para no perder transacciones que confirmaron tarde; el cliente descarta
+        las que ya tiene comparando la versión. Si hay más de limit filas la marca es la
+        de la última devuelta, así el próximo sondeo sigue desde ahí."""
+        condiciones, parametros = self.build_user_filters(filtros)
+        ventana = ["id BETWEEN ? AND ?"] + condiciones
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT COALESCE(MAX(updated_at), 0), COALESCE(MAX(id), 0) FROM users")
+                marca, max_id = cursor.fetchone()
+                cursor.execute(f"SELECT COUNT(*) FROM users WHERE {' AND '.join(ventana)}",
+                               [first_id, last_id] + parametros)
+                conteo = cursor.fetchone()[0]
+                rows = []
+                if since is not None:
+                    cambios = ["updated_at >= ?", "(id BETWEEN ? AND ? OR id > ?)"] + condiciones
+                    cursor.execute(f"""
+                        SELECT {', '.join(LIST_FIELDS)}, updated_at FROM users
+                        WHERE {' AND '.join(cambios)} ORDER BY updated_at, id LIMIT ?
+                    """, [since - margin, first_id, last_id, last_id] + parametros + [limit])
+                    rows = cursor.fetchall()
+                    if len(rows) == limit:
+                        marca = rows[-1][-1]
+                    rows = [row[:-1] for row in rows]
+                return marca, max_id, conteo, rows
+            finally:
+                cursor.close()
+
+    @instrument('has_users')
+    def has_users(self):
+        with self.connection() as conn:
+            return self._has_users(conn)
+
+    @staticmethod
+    def _has_users(conn):
+        # Basta con encontrar una fila; COUNT(*) recorrería toda la tabla
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1 FROM users WHERE deleted_at IS NULL LIMIT 1")
+            return cursor.fetchone() is not None
+        finally:
+            cursor.close()
+
+    def stream_users(self, chunk_size=5000):
+        """Recorre toda la tabla (sin password_hash) en bloques de chunk_size filas
+        sin cargarla completa en memoria"""
+        with self.connection() as conn:
+            cursor = self._stream_cursor(conn)
+            try:
+                cursor.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM users WHERE deleted_at IS NULL ORDER BY id")
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+
+    @instrument('update_user')
+    def update_user(self, user_id, tipo_identificacion, numero_identificacion, nombre, apellido, correo,
+                    direccion=None, telefono=None, fecha_nacimiento=None, password=None,
+                    expected_version=None):
+        """Escribe solo las columnas que difieren del registro actual (en caché si está)
+        y devuelve sus nombres; si nada cambió no se ejecuta ningún UPDATE. La contraseña
+        se vuelve a cifrar únicamente si no coincide con la guardada.
+
+        El UPDATE solo se aplica si la fila conserva la versión leída. Con expected_version
+        (la versión que vio el operador) un cambio ajeno lanza ConflictError; sin ella se
+        reintenta una vez con el registro recién leído por si la caché estaba vieja, pero
+        solo si el cambio ajeno no tocó columnas cuyo valor enviado difiere del vigente
+        (si no, se pisaría ese cambio con datos viejos y también es ConflictError)."""
+        user_id = int(user_id)
+        submitted = dict(zip(UPDATE_COLUMNS, (tipo_identificacion, numero_identificacion, nombre, apellido,
+                                              direccion, telefono, fecha_nacimiento, correo)))
+        basis = None  # registro sobre el que falló el primer intento
+        for attempt in range(2):
+            current = self.get_user_by_id(user_id)
+            if current is None:
+                raise ConflictError(f"El usuario con id {user_id} ya no existe")
+            current = dict(zip(USER_FIELDS, current))
+            if basis is not None and any(
+                    _comparable(current[column]) != _comparable(basis[column])
+                    and _comparable(value) != _comparable(current[column])
+                    for column, value in submitted.items()):
+                break
+            version = current['version'] if expected_version is None else int(expected_version)
+            if current['version'] != version:
+                # La caché puede estar atrasada: se vuelve a leer antes de declarar el conflicto
+                self.cache.invalidate(user_id)
+                continue
+
+            changes = {column: value for column, value in submitted.items()
+                       if _comparable(value) != _comparable(current[column])}
+            if password and not self.hasher.verify(password, current['password_hash']):
+                changes['password_hash'] = self.hasher.hash(password)
+            if not changes:
+                return []
+
+            columns = list(changes)
+            name = UPDATE_STATEMENTS.get(tuple(columns)) or f"update_user:{','.join(columns)}"
+            if name not in self.statements:
+                self.statements.register(name, update_user_sql(columns))
+            with self.connection() as conn:
+                cursor = self.statements.execute(conn, name, (*changes.values(), user_id, version))
+                updated = cursor.rowcount == 1
+                conn.commit()
+            self.cache.invalidate(user_id)
+            if updated:
+                if 'correo' in changes:
+                    self.cache.invalidate(correo=current['correo'])
+                if self.audit is not None:
+                    antes = {column: current[column] for column in columns}
+                    antes['version'] = version
+                    self.audit.record('update', user_id, antes, {**changes, 'version': version + 1}, columns)
+                return columns
+            if expected_version is not None:
+                break
+            basis = current
+        raise ConflictError("Otro usuario modificó este registro mientras lo editaba. "
+                            "Vuelva a cargarlo y repita los cambios.")
+
+    @instrument('change_password')
+    def change_password(self, user_id, new_password):
+        hashed_password = self.hasher.hash(new_password)
+        with self.connection() as conn:
+            self.statements.execute(conn, 'change_password', (hashed_password, user_id))
+            conn.commit()
+        self.cache.invalidate(int(user_id))
+        if self.audit is not None:
+            self.audit.record('password', int(user_id), columnas=['password'])
+        return True
+
+    @instrument('rehash_user_password')
+    def rehash_user_password(self, user_id, password, old_hash):
+        """Vuelve a cifrar la contraseña con el costo configurado. Solo actualiza si el
+        hash no cambió mientras tanto (por ejemplo, por un cambio de contraseña)."""
+        new_hash = self.hasher.hash(password)
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(
+                        "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                        (new_hash, user_id, old_hash)
+                    )
+                    conn.commit()
+                finally:
+                    cursor.close()
+        except RepositoryError as e:
+            logger.warning(f"Error al actualizar el costo del hash del usuario {user_id}: {e}")
+            return
+        self.cache.invalidate(int(user_id))
+
+    @instrument('authenticate_user', kind='login')
+    def authenticate_user(self, correo, password, client=None):
+        """Devuelve el usuario (dict) si el correo y la contraseña coinciden, si no None.
+        Con login_limiter, lanza LoginLockedError sin consultar ni verificar nada si el
+        correo o el cliente superaron los intentos permitidos."""
+        if self.login_limiter is not None:
+            self.login_limiter.check(correo, client)
+        # El hash ficticio se calcula en el primer intento (y no al crear el repositorio,
+        # que el exportador o la purga nunca usan) antes de medir ni consultar: así el
+        # primer correo inexistente no tarda el doble que uno existente
+        self.hasher.dummy_hash()
+        start = time.perf_counter()
+        try:
+            user = self._check_credentials(correo, password)
+        finally:
+            self.login_stats.record(time.perf_counter() - start)
+        if self.login_limiter is not None:
+            if user is None:
+                self.login_limiter.record_failure(correo, client)
+            else:
+                self.login_limiter.record_success(correo, client)
+        return user
+
+    @instrument('select_login')
+    def _get_login_user(self, correo):
+        """Solo las columnas de LOGIN_FIELDS; usa el registro completo si está en caché"""
+        cached = self.cache.get_by_correo(correo)
+        if cached is not None:
+            record = dict(zip(USER_FIELDS, cached))
+            return {campo: record[campo] for campo in LOGIN_FIELDS}
+        with self.connection() as conn:
+            row = self.statements.execute(conn, 'authenticate_user', (correo,)).fetchone()
+        return dict(zip(LOGIN_FIELDS, row)) if row else None
+
+    def _check_credentials(self, correo, password):
+        user = self._get_login_user(correo)
+        if user is None:
+            # Correo inexistente: se verifica contra un hash ficticio del mismo costo
+            self.hasher.verify_dummy(password)
+            return None
+        if self.hasher.verify(password, user['password_hash']):
+            # Hash con un costo anterior: se actualiza en segundo plano
+            if self.hasher.needs_rehash(user['password_hash']):
+                self._rehash_executor.submit(self.rehash_user_password, user['id'], password,
+                                             user['password_hash'])
+            return user
+        return None
+
+    @instrument('select_user')
+    def _get_user(self, statement, value):
+        with self.connection() as conn:
+            user = self.statements.execute(conn, statement, (value,)).fetchone()
+        if user:
+            user = tuple(user)
+            self.cache.put(user[0], user, user[8])
+        return user
+
+    @instrument('get_user_by_id')
+    def get_user_by_id(self, user_id):
+        """Todos los datos de un usuario por su id (con caché)"""
+        user_id = int(user_id)
+        user = self.cache.get(user_id)
+        if user is not None:
+            return user
+        return self._get_user('get_user_by_id', user_id)
+
+    @instrument('get_user_by_correo')
+    def get_user_by_correo(self, correo):
+        """Todos los datos de un usuario por su correo (con caché)"""
+        user = self.cache.get_by_correo(correo)
+        if user is not None:
+            return user
+        return self._get_user('get_user_by_correo', correo)
+
+    @instrument('delete_user')
+    def delete_user(self, user_id, expected_version=None):
+        """Elimina el usuario (borrado lógico, ver purge_deleted); con expected_version
+        solo si nadie lo modificó desde que se leyó (ConflictError si cambió, sin error
+        si ya estaba eliminado)"""
+        user_id = int(user_id)
+        versions = None if expected_version is None else {user_id: int(expected_version)}
+        deleted = self._soft_delete([user_id], versions)
+        if not deleted and expected_version is not None and self._get_user('get_user_by_id', user_id):
+            raise ConflictError("Otro usuario modificó este registro; revise los datos antes de eliminarlo.")
+        return True
+
+    @instrument('delete_users', rows=len)
+    def delete_users(self, user_ids, versions=None, chunk_size=500):
+        """Borrado lógico de varios usuarios, en una transacción por cada chunk_size.
+        Con versions ({id: versión leída}) cada fila solo se elimina si no cambió.
+        Devuelve los id eliminados; los que faltan ya no existían o fueron modificados."""
+        versions = {int(user_id): int(version) for user_id, version in (versions or {}).items()}
+        return self._soft_delete([int(user_id) for user_id in user_ids], versions, chunk_size)
+
+    def _soft_delete(self, user_ids, versions=None, chunk_size=500):
+        deleted = []
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            # Para la auditoría se guardan los registros tal como estaban
+            before = self._get_users_by_ids(chunk) if self.audit is not None else {}
+            eliminados = []
+            with self.connection() as conn:
+                for user_id in chunk:
+                    version = versions.get(user_id) if versions else None
+                    if version is None:
+                        cursor = self.statements.execute(conn, 'delete_user', (user_id,))
+                    else:
+                        cursor = self.statements.execute(conn, 'delete_user_version', (user_id, version))
+                    if cursor.rowcount == 1:
+                        eliminados.append(user_id)
+                if eliminados:
+                    # Las sesiones abiertas de los usuarios eliminados dejan de valer
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(
+                            f"UPDATE sessions SET revoked_at = UNIX_TIMESTAMP() "
+                            f"WHERE user_id IN ({', '.join('?' * len(eliminados))}) AND revoked_at IS NULL",
+                            eliminados
+                        )
+                    finally:
+                        cursor.close()
+                conn.commit()
+            for user_id in chunk:
+                self.cache.invalidate(user_id)
+            for user_id in eliminados:
+                if user_id in before:
+                    self.audit.record('delete', user_id, antes=dict(zip(USER_FIELDS, before[user_id])))
+            deleted.extend(eliminados)
+        return deleted
+
+    def _get_users_by_ids(self, user_ids):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"{SELECT_USER_SQL} WHERE id IN ({', '.join('?' * len(user_ids))}) AND deleted_at IS NULL",
+                    user_ids
+                )
+                return {row[0]: tuple(row) for row in cursor.fetchall()}
+            finally:
+                cursor.close()
+
+    @instrument('purge_deleted', rows=None)
+    def purge_deleted(self, older_than=0, chunk_size=500, pause=0.0, deadline=None):
+        """Borra definitivamente los usuarios con borrado lógico de hace más de
+        older_than segundos: transacciones de chunk_size filas con pause segundos entre
+        una y otra para no acaparar la base, hasta terminar o pasar deadline
+        (time.time()). Devuelve cuántas filas borró."""
+        total = 0
+        while deadline is None or time.time() < deadline:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(
+                        "SELECT id FROM users WHERE deleted_at IS NOT NULL AND deleted_at <= ? "
+                        "ORDER BY deleted_at LIMIT ?",
+                        (int(time.time()) - older_than, chunk_size)
+                    )
+                    ids = [row[0] for row in cursor.fetchall()]
+                    if ids:
+                        cursor.execute(
+                            f"DELETE FROM users WHERE id IN ({', '.join('?' * len(ids))}) "
+                            f"AND deleted_at IS NOT NULL",
+                            ids
+                        )
+                        total += cursor.rowcount
+                        conn.commit()
+                finally:
+                    cursor.close()
+            if len(ids) < chunk_size:
+                break
+            if pause:
+                time.sleep(pause)
+        return total
+
+
+# Código de error de MariaDB para una clave única repetida
+ER_DUP_ENTRY = 1062
+
+
+class MariaDBUserRepository(UserRepository):
+    """Repositorio sobre MariaDB con el pool de conexiones"""
+
+    dialect = 'mariadb'
+    supports_fulltext = True
+
+    create_table_sql = """
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            tipo_identificacion ENUM('CC', 'NIT', 'PAS', 'CE') NOT NULL,
+            numero_identificacion VARCHAR(255) NOT NULL,
+            nombre VARCHAR(255) NOT NULL,
+            apellido VARCHAR(255) NOT NULL,
+            direccion VARCHAR(255),
+            fecha_nacimiento DATE,
+            correo VARCHAR(255) NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            telefono VARCHAR(40)
+        );
+    """
+
+    def __init__(self, db_config, pool_config=None, **kwargs):
+        import mariadb  # solo se requiere el conector si se usa este motor
+        self.mariadb = mariadb
+        self.driver_errors = (mariadb.Error,)
+        self.integrity_errors = (mariadb.IntegrityError,)
+        self.db_config = db_config
+        self.pool_config = pool_config or {}
+        super().__init__(**kwargs)
+
+    def _create_pool(self):
+        return ConnectionPool(lambda: self.mariadb.connect(**self.db_config), **self.pool_config)
+
+    def _is_duplicate(self, error):
+        return getattr(error, 'errno', None) == ER_DUP_ENTRY
+
+    def _prepare_cursor(self, conn):
+        # Cursor preparado: la sentencia se analiza en el servidor una sola vez
+        return conn.cursor(prepared=True)
+
+    def _stream_cursor(self, conn):
+        # Cursor sin búfer: el servidor envía las filas a medida que se leen
+        return conn.cursor(buffered=False)
+
+
+def _sqlite_unix_timestamp():
+    return int(time.time())
+
+
+class SQLiteUserRepository(UserRepository):
+    """Repositorio embebido sobre SQLite (modo WAL) con los mismos índices, para
+    pruebas de carga sin servidor ni interfaz gráfica"""
+
+    dialect = 'sqlite'
+
+    create_table_sql = """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo_identificacion TEXT NOT NULL CHECK (tipo_identificacion IN ('CC', 'NIT', 'PAS', 'CE')),
+            numero_identificacion VARCHAR(255) NOT NULL,
+            nombre VARCHAR(255) NOT NULL,
+            apellido VARCHAR(255) NOT NULL,
+            direccion VARCHAR(255),
+            fecha_nacimiento DATE,
+            correo VARCHAR(255) NOT NULL COLLATE NOCASE,
+            password_hash VARCHAR(255) NOT NULL,
+            telefono VARCHAR(40)
+        );
+    """
+
+    driver_errors = (sqlite3.Error,)
+    integrity_errors = (sqlite3.IntegrityError,)
+
+    def __init__(self, path='crud_usuarios.db', pool_config=None, **kwargs):
+        self.path = path
+        self.pool_config = pool_config or {}
+        super().__init__(**kwargs)
+
+    def _is_duplicate(self, error):
+        return str(error).startswith('UNIQUE constraint failed')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Función que MariaDB trae y SQLite no, para compartir las consultas
+        conn.create_function("UNIX_TIMESTAMP", 0, _sqlite_unix_timestamp)
+        return conn
+
+    def _create_pool(self):
+        config = {'min_size': 1, 'max_size': 5, 'idle_timeout': 300, 'timeout': 10}
+        config.update(self.pool_config)
+        return ConnectionPool(self._connect, health_check=lambda raw: raw.execute("SELECT 1"), **config)
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from servicio_hash import LatencyStats
+
+
+class StatementRegistry:
+    """Sentencias SQL con nombre que se preparan una vez por conexión del pool.
+
+    El cursor preparado de cada sentencia se guarda en conn.state y se reutiliza en
+    los siguientes préstamos de la misma conexión física, así el servidor no vuelve
+    a analizar el texto. Los cursores son del registro: quien llama a execute()
+    lee los resultados pero no los cierra. stats() informa ejecuciones y tiempos."""
+
+    def __init__(self, statements=None, prepare=None):
+        self._statements = dict(statements or {})
+        self._prepare = prepare or (lambda conn: conn.cursor())
+        self._stats = {}
+        self._prepared = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, sql):
+        with self._lock:
+            self._statements[name] = sql
+
+    def __contains__(self, name):
+        return name in self._statements
+
+    def _cursor(self, conn, name):
+        cursors = conn.state.setdefault('statements', {})
+        cursor = cursors.get(name)
+        if cursor is None:
+            cursor = cursors[name] = self._prepare(conn)
+            with self._lock:
+                self._prepared[name] = self._prepared.get(name, 0) + 1
+        return cursor
+
+    def execute(self, conn, name, params=()):
+        """Ejecuta la sentencia name en conn y devuelve su cursor (sin cerrarlo)"""
+        sql = self._statements[name]
+        cursor = self._cursor(conn, name)
+        start = time.perf_counter()
+        try:
+            cursor.execute(sql, params)
+        except Exception:
+            # Tras un error el cursor preparado puede quedar inservible: se descarta
+            conn.state['statements'].pop(name, None)
+            try:
+                cursor.close()
+            except Exception:
+                pass
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._stats.get(name)
+                if stats is None:
+                    stats = self._stats[name] = LatencyStats()
+            stats.record(elapsed)
+        return cursor
+
+    def stats(self):
+        """Por sentencia: ejecuciones, conexiones donde se preparó y percentiles en ms"""
+        with self._lock:
+            items = list(self._stats.items())
+            prepared = dict(self._prepared)
+        result = {}
+        for name, stats in sorted(items):
+            result[name] = stats.snapshot()
+            result[name]['prepared'] = prepared.get(name, 0)
+        return result
@@ -0,0 +1,173 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from metricas import instrument
+
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
+def _hashpw(password, rounds):
+    # Función de módulo para que el pool de procesos pueda serializarla. bcrypt se
+    # importa en el primer uso: un inicio con sesión guardada no lo necesita.
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _hashpw_args(args):
+    return _hashpw(*args)
+
+
+def hash_rounds(hashed_password):
+    """Costo con el que se generó un hash bcrypt ($2b$12$... -> 12); None si no se reconoce"""
+    try:
+        return int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class LatencyStats:
+    """Conteo y percentiles de latencia sobre las últimas muestras"""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, maximum = self.count, self.total, self.max
+
+        def percentile(p):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            'count': count,
+            'avg_ms': total / count * 1000 if count else 0.0,
+            'p50_ms': percentile(0.50) * 1000,
+            'p95_ms': percentile(0.95) * 1000,
+            'p99_ms': percentile(0.99) * 1000,
+            'max_ms': maximum * 1000,
+        }
+
+
+class PasswordHasher:
+    """Servicio de cifrado de contraseñas con factor de costo configurable.
+    hash_many reparte el trabajo entre procesos para usar todos los núcleos."""
+
+    def __init__(self, rounds=DEFAULT_ROUNDS, max_workers=None):
+        if not MIN_ROUNDS <= rounds <= MAX_ROUNDS:
+            raise ValueError(f"El costo de bcrypt debe estar entre {MIN_ROUNDS} y {MAX_ROUNDS}")
+        self.rounds = rounds
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+        self._lock = threading.Lock()
+        self._dummy_hash = None
+        self.verify_stats = LatencyStats()
+
+    @instrument('hash', kind='bcrypt', rows=None)
+    def hash(self, password):
+        return _hashpw(password, self.rounds)
+
+    @instrument('verify', kind='bcrypt', rows=None)
+    def verify(self, password, hashed_password):
+        import bcrypt
+        start = time.perf_counter()
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        finally:
+            self.verify_stats.record(time.perf_counter() - start)
+
+    def dummy_hash(self):
+        """Hash de una contraseña aleatoria con el costo configurado; se calcula una sola vez"""
+        with self._lock:
+            if self._dummy_hash is None:
+                self._dummy_hash = _hashpw(os.urandom(16).hex(), self.rounds)
+            return self._dummy_hash
+
+    def verify_dummy(self, password):
+        """Gasta lo mismo que verify() cuando no hay usuario, para que el tiempo de
+        respuesta no revele si el correo existe. Siempre devuelve False."""
+        self.verify(password, self.dummy_hash())
+        return False
+
+    def needs_rehash(self, hashed_password):
+        """True si el hash se generó con un costo distinto al configurado"""
+        return hash_rounds(hashed_password) != self.rounds
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                from concurrent.futures import ProcessPoolExecutor  # multiprocessing solo si se importa en lote
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def hash_many_async(self, passwords):
+        """Envía el lote al pool de procesos de inmediato y devuelve un iterador
+        que entrega los hashes en el mismo orden a medida que terminan"""
+        passwords = list(passwords)
+        chunksize = max(1, len(passwords) // (self.max_workers * 4))
+        return self._get_pool().map(_hashpw_args, [(p, self.rounds) for p in passwords],
+                                    chunksize=chunksize)
+
+    def hash_many(self, passwords):
+        """Cifra una lista de contraseñas en paralelo y devuelve los hashes en orden"""
+        return list(self.hash_many_async(passwords))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+def calibrate(target_ms=250, min_rounds=10, max_rounds=MAX_ROUNDS, password="calibracion"):
+    """Devuelve el mayor costo cuyo hash tarda como máximo target_ms en esta máquina
+    (nunca menos de min_rounds). Cada punto de costo duplica el tiempo."""
+    rounds = min_rounds
+    _hashpw(password, MIN_ROUNDS)  # calentamiento
+    while rounds < max_rounds:
+        start = time.perf_counter()
+        _hashpw(password, rounds + 1)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > target_ms:
+            break
+        rounds += 1
+    return rounds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibra el costo de bcrypt para esta máquina")
+    parser.add_argument('--objetivo-ms', type=float, default=250,
+                        help="Latencia máxima deseada por hash en milisegundos")
+    parser.add_argument('--minimo', type=int, default=10, help="Costo mínimo aceptable")
+    args = parser.parse_args(argv)
+
+    rounds = calibrate(args.objetivo_ms, args.minimo)
+    start = time.perf_counter()
+    _hashpw("calibracion", rounds)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"Costo recomendado: {rounds} ({elapsed_ms:.0f} ms por hash)")
+    print(f"Configure HASH_CONFIG = {{'rounds': {rounds}}} en configuracion.py")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
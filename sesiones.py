@@ -0,0 +1,199 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+
+from metricas import instrument
+
+logger = logging.getLogger('crud_usuarios.sesiones')
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def load_secret(path, secret=None):
+    """Clave para firmar los tokens: la indicada (p. ej. CRUD_SESSION_SECRET) o la del
+    archivo path, que se crea con una clave aleatoria y permisos 0600 si no existe"""
+    if secret:
+        return secret.encode('utf-8') if isinstance(secret, str) else secret
+    try:
+        with open(path, 'rb') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    key = _b64(secrets.token_bytes(32)).encode('ascii')
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+class TokenFile:
+    """Token de la última sesión guardado en un archivo local (permisos 0600)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding='ascii') as f:
+                return f.read().strip() or None
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def save(self, token):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='ascii') as f:
+            f.write(token)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Session:
+    def __init__(self, session_id, user_id, expires_at):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.expires_at = expires_at
+
+
+class SessionManager:
+    """Tokens de sesión firmados con HMAC-SHA256 y con vencimiento.
+
+    Un token es "<id de sesión>.<id de usuario>.<vence>.<firma>". validate() comprueba
+    la firma y el vencimiento sin tocar la base de datos ni bcrypt; la revocación se
+    consulta en la tabla sessions (migración 6) como mucho una vez cada recheck
+    segundos por sesión. Así un token revocado deja de valer a más tardar en recheck
+    segundos en los demás procesos, y al instante en el que lo revocó."""
+
+    def __init__(self, store, secret, ttl=8 * 3600, recheck=60, max_entries=10000):
+        self.store = store
+        self.secret = secret
+        self.ttl = ttl
+        self.recheck = recheck
+        self.max_entries = max_entries
+        self._checked = {}  # id de sesión -> (instante de la consulta, vigente)
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64(hmac.new(self.secret, payload.encode('ascii'), hashlib.sha256).digest())
+
+    def issue(self, user_id, client=None):
+        """Registra una sesión nueva del usuario y devuelve su token"""
+        session_id = secrets.token_urlsafe(18)
+        now = int(time.time())
+        expires_at = now + self.ttl
+        self.store.insert_session(session_id, int(user_id), client, now, expires_at)
+        payload = f"{session_id}.{int(user_id)}.{expires_at}"
+        with self._lock:
+            self._checked[session_id] = (time.monotonic(), True)
+        return f"{payload}.{self._sign(payload)}"
+
+    def parse(self, token):
+        """Session si la firma es correcta y no venció (sin consultar la revocación)"""
+        try:
+            session_id, user_id, expires_at, signature = token.split('.')
+            user_id, expires_at = int(user_id), int(expires_at)
+        except (AttributeError, ValueError):
+            return None
+        if not hmac.compare_digest(signature, self._sign(f"{session_id}.{user_id}.{expires_at}")):
+            return None
+        if expires_at <= time.time():
+            return None
+        return Session(session_id, user_id, expires_at)
+
+    def validate(self, token):
+        """Session si el token es válido, no venció y no fue revocado; si no None"""
+        session = self.parse(token)
+        if session is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(session.session_id)
+        if checked is not None and now - checked[0] < self.recheck:
+            return session if checked[1] else None
+
+        active = self.store.is_active(session.session_id, int(time.time()))
+        with self._lock:
+            if len(self._checked) >= self.max_entries:
+                self._checked.clear()
+            self._checked[session.session_id] = (now, active)
+        return session if active else None
+
+    def revoke(self, token):
+        """Revoca la sesión del token (si la firma es válida)"""
+        session = self.parse(token)
+        if session is None:
+            return False
+        self.store.revoke_session(session.session_id, int(time.time()))
+        with self._lock:
+            self._checked[session.session_id] = (time.monotonic(), False)
+        return True
+
+    def revoke_user(self, user_id):
+        """Revoca todas las sesiones del usuario (p. ej. al cambiar su contraseña)"""
+        revoked = self.store.revoke_user_sessions(int(user_id), int(time.time()))
+        with self._lock:
+            self._checked.clear()
+        return revoked
+
+    def purge_expired(self):
+        return self.store.delete_expired(int(time.time()))
+
+
+class DatabaseSessionStore:
+    """Sesiones en la tabla sessions (migración 6) del repositorio"""
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def _execute(self, sql, params, fetch=False):
+        with self.repository.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                if fetch:
+                    return cursor.fetchone()
+                conn.commit()
+                return cursor.rowcount
+            finally:
+                cursor.close()
+
+    @instrument('insert_session', rows=None)
+    def insert_session(self, session_id, user_id, client, created_at, expires_at):
+        self._execute(
+            "INSERT INTO sessions (id, user_id, cliente, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (session_id, user_id, client, created_at, expires_at)
+        )
+
+    @instrument('select_session', rows=None)
+    def is_active(self, session_id, now):
+        row = self._execute(
+            "SELECT 1 FROM sessions WHERE id = ? AND revoked_at IS NULL AND expires_at > ?",
+            (session_id, now), fetch=True
+        )
+        return row is not None
+
+    @instrument('revoke_session', rows=None)
+    def revoke_session(self, session_id, now):
+        return self._execute("UPDATE sessions SET revoked_at = ? WHERE id = ? AND revoked_at IS NULL",
+                             (now, session_id))
+
+    @instrument('revoke_user_sessions', rows=None)
+    def revoke_user_sessions(self, user_id, now):
+        return self._execute("UPDATE sessions SET revoked_at = ? WHERE user_id = ? AND revoked_at IS NULL",
+                             (now, user_id))
+
+    @instrument('delete_expired_sessions', rows=None)
+    def delete_expired(self, now):
+        return self._execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
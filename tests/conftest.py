@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos están en la raíz del repositorio, sin paquete
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_usuarios import UserCache  # noqa: E402
+from repositorio import SQLiteUserRepository  # noqa: E402
+from servicio_hash import PasswordHasher  # noqa: E402
+from sesiones import DatabaseSessionStore, SessionManager  # noqa: E402
+
+
+@pytest.fixture
+def repository(tmp_path):
+    # Costo mínimo de bcrypt: las pruebas miden comportamiento, no seguridad
+    repository = SQLiteUserRepository(str(tmp_path / 'usuarios.db'), hasher=PasswordHasher(4), cache=UserCache())
+    repository.create_schema()
+    yield repository
+    repository.close()
+
+
+@pytest.fixture
+def other_process(repository):
+    """Otro repositorio (con su propia caché) sobre la misma base, como otro proceso"""
+    other = SQLiteUserRepository(repository.path, hasher=PasswordHasher(4), cache=UserCache())
+    yield other
+    other.close()
+
+
+@pytest.fixture
+def sessions(repository):
+    return SessionManager(DatabaseSessionStore(repository), b'clave-de-prueba', recheck=0)
+
+
+@pytest.fixture
+def new_user(repository):
+    """Inserta un usuario con datos válidos; los argumentos reemplazan los de ejemplo"""
+    counter = iter(range(1, 1000))
+
+    def insert(**datos):
+        n = next(counter)
+        valores = {
+            'tipo_identificacion': 'CC', 'numero_identificacion': f"100{n}", 'nombre': 'Ana',
+            'apellido': 'Pérez', 'correo': f"usuario{n}@ejemplo.com", 'password': 'Clave123',
+            'direccion': None, 'fecha_nacimiento': '1990-01-02', 'telefono': None,
+        }
+        valores.update(datos)
+        return repository.insert_user(*valores.values())
+
+    return insert
@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+
+from api_usuarios import UserAPI
+
+DATOS = {
+    'tipo_identificacion': 'CC', 'nombre': 'Ana', 'apellido': 'Pérez', 'password': 'Clave123',
+    'fecha_nacimiento': '1990-01-02',
+}
+
+
+@pytest.fixture
+def api(repository, sessions):
+    api = UserAPI(repository, sessions=sessions, db_workers=2, hash_workers=2)
+    yield api
+    api.db.close()
+
+
+def call(api, method, target, body=None, token=None):
+    """(estado, contenido) de una solicitud, sin abrir un socket"""
+    headers = {'authorization': f"Bearer {token}"} if token else {}
+
+    async def dispatch():
+        api._slots = asyncio.Semaphore(api.max_concurrency)
+        raw = json.dumps(body).encode('utf-8') if body is not None else b''
+        status, payload, _ = await api.dispatch(method, target, headers, raw, '127.0.0.1')
+        return status, payload
+
+    return asyncio.run(dispatch())
+
+
+def login(api, correo, password='Clave123'):
+    status, payload = call(api, 'POST', '/login', {'correo': correo, 'password': password})
+    assert status == 200
+    return payload['token']
+
+
+@pytest.fixture
+def two_users(api):
+    """(id, token) de dos usuarios; el primero se crea sin sesión porque la tabla está vacía"""
+    status, primero = call(api, 'POST', '/usuarios',
+                           dict(DATOS, numero_identificacion='1', correo='a@ejemplo.com'))
+    assert status == 201
+    token_a = login(api, 'a@ejemplo.com')
+    status, segundo = call(api, 'POST', '/usuarios',
+                           dict(DATOS, numero_identificacion='2', correo='b@ejemplo.com'), token=token_a)
+    assert status == 201
+    return (primero['id'], token_a), (segundo['id'], login(api, 'b@ejemplo.com'))
+
+
+def test_session_required_by_default(api, two_users):
+    assert call(api, 'GET', '/usuarios')[0] == 401
+    assert call(api, 'GET', '/usuarios', token='a.1.9999999999.firma')[0] == 401
+    assert call(api, 'POST', '/usuarios', dict(DATOS, numero_identificacion='3', correo='c@ejemplo.com'))[0] == 401
+    assert call(api, 'GET', '/salud')[0] == 200
+
+
+def test_session_required_needs_a_session_manager(repository):
+    with pytest.raises(ValueError):
+        UserAPI(repository)
+
+
+def test_cannot_modify_other_users(api, two_users):
+    (id_a, token_a), (id_b, _) = two_users
+    assert call(api, 'PATCH', f"/usuarios/{id_b}", {'nombre': 'X'}, token=token_a)[0] == 403
+    assert call(api, 'DELETE', f"/usuarios/{id_b}", token=token_a)[0] == 403
+    assert call(api, 'POST', f"/usuarios/{id_b}/password",
+                {'password': 'Nueva123', 'password_actual': 'Clave123'}, token=token_a)[0] == 403
+    assert call(api, 'PATCH', f"/usuarios/{id_a}", {'nombre': 'Anita'}, token=token_a) == \
+        (200, {'cambios': ['nombre']})
+
+
+def test_patch_does_not_change_the_password(api, two_users):
+    (id_a, token_a), _ = two_users
+    assert call(api, 'PATCH', f"/usuarios/{id_a}", {'password': 'Nueva123'}, token=token_a)[0] == 400
+
+
+def test_password_change_requires_current_password_or_identity(api, two_users):
+    (id_a, token_a), _ = two_users
+    ruta = f"/usuarios/{id_a}/password"
+    assert call(api, 'POST', ruta, {'password': 'Nueva123'}, token=token_a)[0] == 400
+    assert call(api, 'POST', ruta, {'password': 'Nueva123', 'password_actual': 'mala'}, token=token_a)[0] == 403
+    identidad = {'tipo_identificacion': 'CC', 'numero_identificacion': '1', 'fecha_nacimiento': '1990-01-02',
+                 'correo': 'A@ejemplo.com'}
+    assert call(api, 'POST', ruta, dict(identidad, password='Nueva123', fecha_nacimiento='1990-01-03'),
+                token=token_a)[0] == 403
+    assert call(api, 'POST', ruta, dict(identidad, password='Nueva123'), token=token_a)[0] == 204
+
+    # Cambiar la contraseña cierra las sesiones abiertas
+    assert call(api, 'GET', '/sesion', token=token_a)[0] == 401
+    token_a = login(api, 'a@ejemplo.com', 'Nueva123')
+    assert call(api, 'POST', ruta, {'password': 'Otra123', 'password_actual': 'Nueva123'}, token=token_a)[0] == 204
+
+
+def test_patch_does_not_undo_changes_from_other_processes(api, two_users, other_process):
+    (id_a, token_a), _ = two_users
+    call(api, 'GET', f"/usuarios/{id_a}", token=token_a)  # deja el registro en la caché
+    other_process.update_user(id_a, 'CC', '1', 'Ana', 'Pérez', 'a@ejemplo.com', 'Calle NUEVA',
+                              fecha_nacimiento='1990-01-02')
+    assert call(api, 'PATCH', f"/usuarios/{id_a}", {'nombre': 'Anita'}, token=token_a) == \
+        (200, {'cambios': ['nombre']})
+    assert call(api, 'GET', f"/usuarios/{id_a}", token=token_a)[1]['direccion'] == 'Calle NUEVA'
+
+
+def test_patch_without_version_conflicts_with_concurrent_change(api, two_users, other_process, monkeypatch):
+    (id_a, token_a), _ = two_users
+    read = api.repository.get_user_by_id
+
+    def read_then_other_change(user_id):
+        row = read(user_id)
+        other_process.update_user(id_a, 'CC', '1', 'Ana', 'Pérez', 'a@ejemplo.com', 'Calle NUEVA',
+                                  fecha_nacimiento='1990-01-02')
+        return row
+
+    monkeypatch.setattr(api.repository, 'get_user_by_id', read_then_other_change)
+    assert call(api, 'PATCH', f"/usuarios/{id_a}", {'nombre': 'Anita'}, token=token_a)[0] == 409
+    monkeypatch.undo()
+    usuario = call(api, 'GET', f"/usuarios/{id_a}", token=token_a)[1]
+    assert (usuario['nombre'], usuario['direccion']) == ('Ana', 'Calle NUEVA')
+
+
+def test_invalid_input_is_a_client_error(api, two_users):
+    (id_a, token_a), _ = two_users
+    status, payload = call(api, 'PATCH', f"/usuarios/{id_a}", {'numero_identificacion': 123}, token=token_a)
+    assert status == 400
+    assert payload['detalle'][0]['campo'] == 'numero_identificacion'
+    for limit in (0, -1):
+        assert call(api, 'GET', f"/usuarios?limit={limit}", token=token_a)[0] == 400
+    assert call(api, 'GET', '/usuarios?limit=1', token=token_a)[1]['next_cursor'] == id_a
@@ -0,0 +1,85 @@
+import json
+import threading
+
+import pytest
+
+from auditoria import AuditLog, _clean, read_changes
+
+
+@pytest.fixture
+def audit(repository):
+    audit = AuditLog(repository, batch_size=3, flush_interval=0.2)
+    repository.audit = audit
+    yield audit
+    repository.audit = None
+    audit.close()
+
+
+def test_clean_strips_passwords():
+    valores = json.loads(_clean({'correo': 'ana@ejemplo.com', 'password': 'Clave123', 'password_hash': '$2b$'}))
+    assert valores == {'correo': 'ana@ejemplo.com'}
+    assert _clean(None) is None
+
+
+def test_events_are_written_in_batches(audit, monkeypatch):
+    lotes = []
+    write = audit._write_batch
+
+    def spy(batch):
+        lotes.append(len(batch))
+        return write(batch)
+
+    monkeypatch.setattr(audit, '_write_batch', spy)
+    for user_id in range(7):
+        audit.record('delete', user_id, antes={'id': user_id})
+    assert audit.flush()
+    assert lotes == [3, 3, 1]
+    assert audit.stats() == {'pendientes': 0, 'escritos': 7, 'descartados': 0}
+    assert [event['user_id'] for event in read_changes(audit.repository, lag=0)] == list(range(7))
+
+
+def test_changes_are_recorded_without_passwords(audit, repository, new_user):
+    user_id = new_user(nombre='Ana')
+    repository.update_user(user_id, 'CC', '1001', 'Anita', 'Pérez', 'usuario1@ejemplo.com',
+                           fecha_nacimiento='1990-01-02')
+    repository.change_password(user_id, 'Nueva123')
+    repository.delete_user(user_id)
+    assert audit.flush()
+
+    events = read_changes(repository, lag=0)
+    assert [event['operacion'] for event in events] == ['insert', 'update', 'password', 'delete']
+    alta, cambio, clave, baja = events
+    assert alta['despues']['nombre'] == 'Ana'
+    assert (cambio['columnas'], cambio['antes']['nombre'], cambio['despues']['nombre']) == \
+        (['nombre'], 'Ana', 'Anita')
+    assert (clave['columnas'], clave['antes'], clave['despues']) == (['password'], None, None)
+    for event in events:
+        for valores in (event['antes'], event['despues']):
+            assert not {'password', 'password_hash'} & set(valores or {})
+
+
+def test_full_queue_drops_new_events(repository):
+    escribiendo, seguir = threading.Event(), threading.Event()
+    audit = AuditLog(repository, batch_size=1, flush_interval=0, max_queue=1)
+    write = audit._write_batch
+
+    def blocked(batch):
+        escribiendo.set()
+        seguir.wait(5)
+        return write(batch)
+
+    audit._write_batch = blocked
+    audit.record('delete', 1)
+    assert escribiendo.wait(5)
+    audit.record('delete', 2)  # queda en la cola
+    audit.record('delete', 3)  # la cola está llena
+    seguir.set()
+    audit.close()
+    assert audit.stats() == {'pendientes': 0, 'escritos': 2, 'descartados': 1}
+
+
+def test_close_writes_pending_events(repository):
+    audit = AuditLog(repository, batch_size=100, flush_interval=60)
+    audit.record('delete', 1)
+    audit.close()
+    assert [event['user_id'] for event in read_changes(repository, lag=0)] == [1]
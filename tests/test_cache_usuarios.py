@@ -0,0 +1,74 @@
+import pytest
+
+import cache_usuarios
+from cache_usuarios import UserCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_usuarios, 'time', clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = UserCache(ttl=60)
+    cache.put(1, 'ana', 'Ana@ejemplo.com')
+    clock.now += 60
+    assert cache.get(1) == 'ana'
+    assert cache.get_by_correo('ana@EJEMPLO.com') == 'ana'
+    clock.now += 1
+    assert cache.get_by_correo('ana@ejemplo.com') is None
+    assert cache.get(1) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = UserCache(max_size=2)
+    cache.put(1, 'ana', 'ana@ejemplo.com')
+    cache.put(2, 'luis', 'luis@ejemplo.com')
+    cache.get(1)  # ahora el menos usado es 2
+    cache.put(3, 'eva', 'eva@ejemplo.com')
+    assert (cache.get(1), cache.get(2), cache.get(3)) == ('ana', None, 'eva')
+    assert cache.get_by_correo('luis@ejemplo.com') is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_put_again_refreshes_the_entry(clock):
+    cache = UserCache(ttl=60)
+    cache.put(1, 'ana', 'ana@ejemplo.com')
+    clock.now += 50
+    cache.put(1, 'ana maría', 'nueva@ejemplo.com')
+    clock.now += 50
+    assert cache.get(1) == 'ana maría'
+    assert cache.get_by_correo('ana@ejemplo.com') is None
+    assert cache.get_by_correo('nueva@ejemplo.com') == 'ana maría'
+
+
+def test_email_moved_to_another_user(clock):
+    # Un usuario eliminado libera su correo y otro lo registra
+    cache = UserCache(max_size=2)
+    cache.put(1, 'eliminado', 'ana@ejemplo.com')
+    cache.put(2, 'nuevo', 'ana@ejemplo.com')
+    cache.invalidate(1)
+    assert cache.get_by_correo('ana@ejemplo.com') == 'nuevo'
+    cache.put(3, 'otro', 'otro@ejemplo.com')
+    cache.put(4, 'otro más', 'mas@ejemplo.com')  # expulsa a 2 y su correo
+    assert cache.get_by_correo('ana@ejemplo.com') is None
+
+
+def test_invalidate_by_email(clock):
+    cache = UserCache()
+    cache.put(1, 'ana', 'ana@ejemplo.com')
+    cache.invalidate(correo='ANA@ejemplo.com')
+    assert cache.get(1) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (0, 1)
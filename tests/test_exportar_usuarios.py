@@ -0,0 +1,46 @@
+import csv
+import json
+
+import pytest
+
+from exportar_usuarios import EXPORT_COLUMNS, detect_format, export_users
+
+
+@pytest.fixture
+def users(repository, new_user):
+    ids = [new_user(direccion='Calle 1, # 2' if n == 0 else None) for n in range(5)]
+    repository.delete_user(ids[2])
+    return [user_id for user_id in ids if user_id != ids[2]]
+
+
+def test_csv_export_in_chunks(tmp_path, repository, users):
+    archivo = tmp_path / 'usuarios.csv'
+    bloques = []
+    result = export_users(str(archivo), chunk_size=2, progress=lambda r: bloques.append(r.rows),
+                          repository=repository)
+
+    assert result.rows == 4
+    assert bloques == [2, 4]
+    with open(archivo, newline='', encoding='utf-8') as f:
+        filas = list(csv.DictReader(f))
+    assert tuple(filas[0]) == EXPORT_COLUMNS
+    assert [int(fila['id']) for fila in filas] == users
+    assert filas[0]['direccion'] == 'Calle 1, # 2'
+    assert filas[0]['fecha_nacimiento'] == '1990-01-02'
+
+
+def test_jsonl_export_has_no_passwords(tmp_path, repository, users):
+    archivo = tmp_path / 'usuarios.jsonl'
+    export_users(str(archivo), repository=repository)
+
+    registros = [json.loads(line) for line in archivo.read_text(encoding='utf-8').splitlines()]
+    assert [registro['id'] for registro in registros] == users
+    assert all(tuple(registro) == EXPORT_COLUMNS for registro in registros)
+    assert registros[1]['direccion'] is None
+
+
+def test_format_from_extension():
+    assert detect_format('usuarios.NDJSON') == 'jsonl'
+    assert detect_format('salida/usuarios.parquet') == 'parquet'
+    with pytest.raises(ValueError):
+        detect_format('usuarios.xlsx')
@@ -0,0 +1,61 @@
+import csv
+
+from importar_usuarios import COLUMNS, import_users
+
+
+def write_csv(path, filas):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for fila in filas:
+            writer.writerow(dict({'tipo_identificacion': 'CC', 'nombre': 'Ana', 'apellido': 'Pérez',
+                                  'password': 'Clave123'}, **fila))
+
+
+def test_errors_are_reported_per_row(tmp_path, repository, new_user):
+    new_user(correo='existe@ejemplo.com')
+    archivo, reporte = tmp_path / 'usuarios.csv', tmp_path / 'errores.csv'
+    write_csv(archivo, [
+        {'numero_identificacion': '1', 'correo': 'uno@ejemplo.com'},                          # línea 2
+        {'numero_identificacion': '2', 'correo': 'dos@ejemplo.com', 'tipo_identificacion': 'XX'},
+        {'numero_identificacion': '3', 'correo': 'tres@ejemplo.com', 'fecha_nacimiento': '1990-13-01'},
+        {'numero_identificacion': '4', 'correo': 'UNO@ejemplo.com'},                          # línea 5
+        {'numero_identificacion': '5', 'correo': 'existe@ejemplo.com'},
+        {'numero_identificacion': '6', 'correo': 'seis@ejemplo.com', 'telefono': '3001234567'},
+        {'numero_identificacion': '7', 'correo': '', 'nombre': ''},
+    ])
+
+    result = import_users(str(archivo), batch_size=2, hasher=repository.hasher, report_path=str(reporte),
+                          repository=repository)
+
+    assert (result.read, result.inserted) == (7, 2)
+    errores = {linea: (correo, mensaje) for linea, correo, mensaje in result.errors}
+    assert sorted(errores) == [3, 4, 5, 6, 8]
+    assert errores[3] == ('dos@ejemplo.com', "Valor inválido para 'tipo de identificación': XX")
+    assert errores[4][1] == "La fecha de nacimiento debe tener el formato AAAA-MM-DD"
+    assert errores[5] == ('UNO@ejemplo.com', "Correo repetido dentro del archivo")
+    assert errores[6][0] == 'existe@ejemplo.com' and 'UNIQUE' in errores[6][1]
+    assert errores[8] == (None, "El campo 'nombre' es obligatorio.; El campo 'correo' es obligatorio.")
+    assert repository.get_user_by_correo('seis@ejemplo.com') is not None
+    assert repository.get_user_by_correo('dos@ejemplo.com') is None
+
+    with open(reporte, newline='', encoding='utf-8') as f:
+        filas = list(csv.reader(f))
+    assert filas[0] == ['linea', 'correo', 'error']
+    assert [fila[0] for fila in filas[1:]] == ['3', '4', '5', '6', '8']
+
+
+def test_jsonl_reports_unreadable_lines(tmp_path, repository):
+    archivo = tmp_path / 'usuarios.jsonl'
+    archivo.write_text(
+        '{"tipo_identificacion": "CC", "numero_identificacion": "1", "nombre": "Ana", "apellido": "Pérez", '
+        '"correo": "uno@ejemplo.com", "password": "Clave123"}\n'
+        '\n'
+        '{"tipo_identificacion": "CC", "numero_identificacion": \n'
+        '["no es un objeto"]\n', encoding='utf-8')
+
+    result = import_users(str(archivo), hasher=repository.hasher, repository=repository)
+
+    assert (result.read, result.inserted) == (3, 1)
+    assert [linea for linea, _, _ in result.errors] == [3, 4]
+    assert all(mensaje.startswith("Fila inválida") for _, _, mensaje in result.errors)
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import limitador_login
+from limitador_login import DatabaseLockoutStore, LoginLockedError, LoginRateLimiter
+
+
+class Clock:
+    """Reemplaza el módulo time del limitador para avanzar el reloj a mano"""
+
+    ctime = staticmethod(time.ctime)
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(limitador_login, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def limiter(clock):
+    return LoginRateLimiter(max_attempts=3, window=60, base_lockout=10, max_lockout=40)
+
+
+def fail(limiter, veces, correo='ana@ejemplo.com', client=None):
+    for _ in range(veces):
+        limiter.record_failure(correo, client)
+
+
+def test_lockout_after_max_attempts(limiter, clock):
+    fail(limiter, 2)
+    limiter.check('ana@ejemplo.com')
+    fail(limiter, 1)
+    with pytest.raises(LoginLockedError) as error:
+        limiter.check('ANA@ejemplo.com ')
+    assert error.value.clave == 'correo:ana@ejemplo.com'
+    assert error.value.retry_after == 10
+
+    clock.now += 10
+    limiter.check('ana@ejemplo.com')
+
+
+def test_failures_outside_the_window_do_not_count(limiter, clock):
+    fail(limiter, 2)
+    clock.now += 61
+    fail(limiter, 1)
+    limiter.check('ana@ejemplo.com')
+
+
+def test_lockout_doubles_up_to_max(limiter, clock):
+    duraciones = []
+    for _ in range(4):
+        fail(limiter, 3)
+        with pytest.raises(LoginLockedError) as error:
+            limiter.check('ana@ejemplo.com')
+        duraciones.append(error.value.retry_after)
+        clock.now += error.value.retry_after
+    assert duraciones == [10, 20, 40, 40]
+
+    # Sin bloqueos durante más de max_lockout se vuelve a la duración base
+    clock.now += 41
+    fail(limiter, 3)
+    with pytest.raises(LoginLockedError) as error:
+        limiter.check('ana@ejemplo.com')
+    assert error.value.retry_after == 10
+
+
+def test_accounts_are_limited_separately(limiter):
+    fail(limiter, 3, 'ana@ejemplo.com')
+    with pytest.raises(LoginLockedError):
+        limiter.check('ana@ejemplo.com')
+    limiter.check('luis@ejemplo.com')
+
+
+def test_source_is_locked_across_accounts(limiter):
+    for n in range(3):
+        fail(limiter, 1, f"usuario{n}@ejemplo.com", client='10.0.0.1')
+    with pytest.raises(LoginLockedError) as error:
+        limiter.check('otro@ejemplo.com', '10.0.0.1')
+    assert error.value.clave == 'cliente:10.0.0.1'
+    limiter.check('otro@ejemplo.com', '10.0.0.2')
+
+
+def test_success_resets_the_account_but_not_the_source(limiter):
+    fail(limiter, 2, client='10.0.0.1')
+    limiter.record_success('ana@ejemplo.com', '10.0.0.1')
+    fail(limiter, 2)
+    limiter.check('ana@ejemplo.com')
+
+    fail(limiter, 1, 'luis@ejemplo.com', client='10.0.0.1')
+    with pytest.raises(LoginLockedError) as error:
+        limiter.check('luis@ejemplo.com', '10.0.0.1')
+    assert error.value.clave == 'cliente:10.0.0.1'
+
+
+def test_lockouts_survive_a_restart(repository, clock):
+    store = DatabaseLockoutStore(repository)
+    limiter = LoginRateLimiter(max_attempts=3, window=60, base_lockout=10, store=store)
+    fail(limiter, 3)
+
+    reiniciado = LoginRateLimiter(max_attempts=3, window=60, base_lockout=10, store=store)
+    with pytest.raises(LoginLockedError):
+        reiniciado.check('ana@ejemplo.com')
+
+    # Un inicio de sesión correcto borra el bloqueo guardado
+    clock.now += 10
+    reiniciado.record_success('ana@ejemplo.com')
+    assert store.load_lockouts(0) == []
@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+
+import migraciones
+from migraciones import LATEST_VERSION, MigrationError, apply_pending_migrations, schema_version
+from repositorio import SQLiteUserRepository
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """Conexión a una base SQLite con la tabla users y sin migraciones aplicadas"""
+    conn = sqlite3.connect(str(tmp_path / 'migraciones.db'))
+    conn.execute(SQLiteUserRepository.create_table_sql)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def columns(conn, table='users'):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_failed_migration_is_rolled_back_and_can_be_rerun(conn, monkeypatch):
+    version, descripcion, sentencias = next(m for m in migraciones.MIGRATIONS if m[0] == 5)
+    rota = migraciones.MIGRATIONS[:4] + [(5, descripcion, sentencias + ["SELECT * FROM no_existe"])]
+    monkeypatch.setattr(migraciones, 'MIGRATIONS', rota)
+    with pytest.raises(MigrationError) as error:
+        apply_pending_migrations(conn, 'sqlite')
+    assert error.value.version == 5
+    # Nada de la migración 5 quedó a medias
+    assert schema_version(conn) == 4
+    assert 'version' not in columns(conn)
+
+    monkeypatch.undo()
+    assert apply_pending_migrations(conn, 'sqlite') == list(range(5, LATEST_VERSION + 1))
+    assert {'version', 'updated_at'} <= columns(conn)
+
+
+def test_search_by_number_has_its_own_index(conn):
+    apply_pending_migrations(conn, 'sqlite')
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM users WHERE numero_identificacion = ?",
+                        ('100',)).fetchall()
+    assert 'ix_users_numero_identificacion' in str(plan)
+
+
+# --- Índices únicos ---
+def insert_raw(conn, *filas):
+    conn.executemany(
+        "INSERT INTO users (tipo_identificacion, numero_identificacion, nombre, apellido, correo, password_hash)"
+        " VALUES (?, ?, 'Ana', 'Pérez', ?, 'x')", filas)
+    conn.commit()
+
+
+def test_duplicate_emails_are_reported(conn):
+    insert_raw(conn, ('CC', '1', 'a@ejemplo.com'), ('CC', '2', 'a@ejemplo.com'), ('CC', '3', 'b@ejemplo.com'))
+    with pytest.raises(MigrationError) as error:
+        apply_pending_migrations(conn, 'sqlite')
+    assert error.value.version == 1
+    assert error.value.duplicados == [('a@ejemplo.com', 2)]
+    assert 'a@ejemplo.com (2)' in str(error.value)
+    assert schema_version(conn) is None
+
+
+def test_duplicate_identifications_are_reported(conn):
+    insert_raw(conn, ('CC', '1', 'a@ejemplo.com'), ('CC', '1', 'b@ejemplo.com'), ('CE', '1', 'c@ejemplo.com'))
+    with pytest.raises(MigrationError) as error:
+        apply_pending_migrations(conn, 'sqlite')
+    assert error.value.version == 2
+    assert error.value.duplicados == [('CC 1', 2)]
+    # La migración 1 sí quedó aplicada
+    assert schema_version(conn) == 1
+
+
+def test_version_9_moves_deleted_users_out_of_unique_indexes(conn, monkeypatch):
+    monkeypatch.setattr(migraciones, 'MIGRATIONS', [m for m in migraciones.MIGRATIONS if m[0] < 9])
+    apply_pending_migrations(conn, 'sqlite')
+    insert_raw(conn, ('CC', '1', 'a@ejemplo.com'), ('CC', '2', 'b@ejemplo.com'))
+    conn.execute("UPDATE users SET deleted_at = 1 WHERE numero_identificacion = '1'")
+    conn.commit()
+
+    monkeypatch.undo()
+    assert 9 in apply_pending_migrations(conn, 'sqlite')
+    assert conn.execute("SELECT numero_identificacion, activo FROM users ORDER BY id").fetchall() == \
+        [('1', None), ('2', 1)]
+    indices = {row[1] for row in conn.execute("PRAGMA index_list(users)")}
+    assert {'ux_users_correo_activo', 'ux_users_identificacion_activo'} <= indices
+    assert not {'ux_users_correo', 'ux_users_identificacion'} & indices
+
+    # El correo y la identificación del eliminado se pueden registrar de nuevo
+    insert_raw(conn, ('CC', '1', 'a@ejemplo.com'))
+    with pytest.raises(sqlite3.IntegrityError):
+        insert_raw(conn, ('CC', '2', 'b@ejemplo.com'))
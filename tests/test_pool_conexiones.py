@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+from pool_conexiones import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    """Conexión mínima: ping falla cuando el "servidor" la cortó"""
+
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self):
+        if not self.alive:
+            raise ConnectionError("conexión cortada")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections():
+    return []
+
+
+@pytest.fixture
+def make_pool(connections):
+    pools = []
+
+    def connect():
+        connections.append(FakeConnection(len(connections) + 1))
+        return connections[-1]
+
+    def make(**config):
+        pools.append(ConnectionPool(connect, **config))
+        return pools[-1]
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_released_connection_is_reused(make_pool, connections):
+    pool = make_pool(min_size=1, max_size=2)
+    with pool.acquire() as conn:
+        primera = conn.raw
+        assert pool.stats()['in_use'] == 1
+    # Al devolverla se descarta lo que haya quedado sin confirmar
+    assert primera.rollbacks == 1
+    with pool.acquire() as conn:
+        assert conn.raw is primera
+    stats = pool.stats()
+    assert (stats['checkouts'], stats['connections_created'], stats['in_use'], stats['idle']) == (2, 1, 0, 1)
+
+
+def test_closing_twice_releases_once(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.close()
+    conn.close()
+    assert pool.stats()['idle'] == 1
+
+
+def test_dead_connection_is_replaced_on_checkout(make_pool, connections):
+    pool = make_pool(min_size=1, max_size=1)
+    connections[0].alive = False  # el servidor se reinició
+    with pool.acquire() as conn:
+        assert conn.raw is connections[1]
+    assert connections[0].closed
+    assert pool.stats()['connections_discarded'] == 1
+
+
+def test_pool_reconnects_after_connect_failure(make_pool, connections, monkeypatch):
+    pool = make_pool(min_size=0, max_size=1)
+    connect = pool._connect
+
+    def refuse():
+        raise ConnectionError("servidor caído")
+
+    monkeypatch.setattr(pool, '_connect', refuse)
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    # El cupo no quedó ocupado por el intento fallido
+    assert pool.stats()['in_use'] == 0
+
+    monkeypatch.setattr(pool, '_connect', connect)
+    with pool.acquire(timeout=0.1) as conn:
+        assert conn.raw is connections[0]
+
+
+def test_unhealthy_release_is_discarded(make_pool, connections):
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+
+    def broken():
+        raise ConnectionError("conexión cortada")
+
+    conn.raw.rollback = broken
+    conn.close()
+    assert connections[0].closed
+    assert pool.stats()['idle'] == 0
+
+
+def test_idle_connections_are_evicted_above_min_size(make_pool, connections):
+    pool = make_pool(min_size=1, max_size=3, idle_timeout=0.01)
+    a, b, c = pool.acquire(), pool.acquire(), pool.acquire()
+    for conn in (a, b, c):
+        conn.close()
+    time.sleep(0.05)
+    with pool.acquire():
+        pass
+    assert sum(conn.closed for conn in connections) == 2
+    assert pool.stats()['idle'] == 1
+
+
+def test_exhausted_pool_times_out(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()['timeouts'] == 1
+    conn.close()
+    with pool.acquire(timeout=0.05):
+        pass
+
+
+def test_waiter_gets_released_connection(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    obtenidas = []
+    waiter = threading.Thread(target=lambda: obtenidas.append(pool.acquire(timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    conn.close()
+    waiter.join(5)
+    assert obtenidas and obtenidas[0].raw is conn.raw
+    obtenidas[0].close()
+
+
+def test_closed_pool_refuses_checkouts(make_pool):
+    pool = make_pool(min_size=1, max_size=1)
+    pool.close()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+
+def test_invalid_sizes(make_pool):
+    with pytest.raises(ValueError):
+        make_pool(min_size=2, max_size=1)
@@ -0,0 +1,18 @@
+from purgar_usuarios import PurgeJob
+from sesiones import DatabaseSessionStore, SessionManager
+
+
+def test_run_once_purges_deleted_users_and_expired_sessions(repository, new_user):
+    vencidas = SessionManager(DatabaseSessionStore(repository), b'clave', ttl=-1)
+    vigentes = SessionManager(DatabaseSessionStore(repository), b'clave')
+    user_id, borrado_id = new_user(), new_user()
+    vencidas.issue(user_id)
+    token = vigentes.issue(user_id)
+    repository.delete_user(borrado_id)
+
+    assert PurgeJob(repository, retention=0).run_once(ignore_window=True) == 1
+    with repository.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sessions")
+        assert cursor.fetchone()[0] == 1
+    assert vigentes.validate(token) is not None
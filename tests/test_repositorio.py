@@ -0,0 +1,159 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from repositorio import USER_FIELDS, ConflictError, DuplicateUserError, RepositoryError, SQLiteUserRepository
+from servicio_hash import PasswordHasher
+
+
+def user(repository, user_id):
+    row = repository.get_user_by_id(user_id)
+    return dict(zip(USER_FIELDS, row)) if row else None
+
+
+def update(repository, user_id, expected_version=None, **datos):
+    actual = user(repository, user_id)
+    actual.update(datos)
+    return repository.update_user(
+        user_id, actual['tipo_identificacion'], actual['numero_identificacion'], actual['nombre'],
+        actual['apellido'], actual['correo'], actual['direccion'], actual['telefono'],
+        actual['fecha_nacimiento'], expected_version=expected_version)
+
+
+# --- Comparación de versión (compare-and-swap) ---
+def test_update_increments_version(repository, new_user):
+    user_id = new_user()
+    assert update(repository, user_id, expected_version=1, nombre='Ana María') == ['nombre']
+    assert user(repository, user_id)['version'] == 2
+
+
+def test_update_with_stale_version_conflicts(repository, new_user):
+    user_id = new_user()
+    update(repository, user_id, nombre='Otro cliente')
+    with pytest.raises(ConflictError):
+        update(repository, user_id, expected_version=1, apellido='Gómez')
+    assert user(repository, user_id)['apellido'] == 'Pérez'
+
+
+def test_update_without_changes_writes_nothing(repository, new_user):
+    user_id = new_user()
+    assert update(repository, user_id) == []
+    assert user(repository, user_id)['version'] == 1
+
+
+def test_stale_cache_does_not_undo_other_changes(repository, other_process, new_user):
+    user_id = new_user(direccion='Calle 1')
+    stale = user(repository, user_id)  # queda en la caché de este proceso
+    update(other_process, user_id, direccion='Calle NUEVA')
+    with pytest.raises(ConflictError):
+        repository.update_user(user_id, stale['tipo_identificacion'], stale['numero_identificacion'], 'Anita',
+                               stale['apellido'], stale['correo'], stale['direccion'], stale['telefono'],
+                               stale['fecha_nacimiento'])
+    repository.cache.clear()
+    assert user(repository, user_id)['direccion'] == 'Calle NUEVA'
+    assert user(repository, user_id)['nombre'] == 'Ana'
+
+
+def test_stale_cache_retries_when_other_change_matches(repository, other_process, new_user):
+    user_id = new_user()
+    stale = user(repository, user_id)
+    update(other_process, user_id, nombre='Anita')
+    # Mismo valor que escribió el otro proceso: no hay nada que perder y se reintenta
+    assert repository.update_user(user_id, stale['tipo_identificacion'], stale['numero_identificacion'], 'Anita',
+                                  stale['apellido'], stale['correo'], stale['direccion'], stale['telefono'],
+                                  stale['fecha_nacimiento']) == []
+
+
+def test_delete_with_stale_version_conflicts(repository, new_user):
+    user_id = new_user()
+    update(repository, user_id, nombre='Otro cliente')
+    with pytest.raises(ConflictError):
+        repository.delete_user(user_id, expected_version=1)
+    assert user(repository, user_id) is not None
+
+
+# --- Borrado lógico ---
+def test_soft_deleted_user_is_hidden(repository, new_user):
+    user_id = new_user(correo='borrar@ejemplo.com')
+    otro_id = new_user()
+    repository.delete_user(user_id)
+
+    assert repository.get_user_by_id(user_id) is None
+    assert repository.get_user_by_correo('borrar@ejemplo.com') is None
+    assert repository.authenticate_user('borrar@ejemplo.com', 'Clave123') is None
+    assert [row[0] for row in repository.get_users()] == [otro_id]
+    # Eliminar de nuevo no es un error
+    assert repository.delete_user(user_id)
+
+
+def test_soft_delete_revokes_sessions(repository, sessions, new_user):
+    user_id = new_user()
+    token = sessions.issue(user_id, 'pruebas')
+    repository.delete_user(user_id)
+    assert sessions.validate(token) is None
+
+
+def test_delete_users_skips_modified_rows(repository, new_user):
+    ids = [new_user() for _ in range(3)]
+    update(repository, ids[1], nombre='Otro cliente')
+    assert repository.delete_users(ids, {user_id: 1 for user_id in ids}) == [ids[0], ids[2]]
+    assert repository.get_user_by_id(ids[1]) is not None
+
+
+def test_deleted_user_frees_unique_keys(repository, new_user):
+    user_id = new_user(numero_identificacion='555', correo='repetido@ejemplo.com')
+    with pytest.raises(DuplicateUserError):
+        new_user(correo='REPETIDO@ejemplo.com')
+    with pytest.raises(DuplicateUserError):
+        new_user(numero_identificacion='555')
+
+    repository.delete_user(user_id)
+    nuevo_id = new_user(numero_identificacion='555', correo='repetido@ejemplo.com')
+    # Varios eliminados con los mismos datos tampoco chocan entre sí
+    repository.delete_user(nuevo_id)
+    ultimo_id = new_user(numero_identificacion='555', correo='repetido@ejemplo.com')
+    assert repository.get_user_by_correo('repetido@ejemplo.com')[0] == ultimo_id
+
+
+def test_purge_removes_only_deleted_rows(repository, new_user):
+    ids = [new_user() for _ in range(5)]
+    repository.delete_users(ids[:3])
+    assert repository.purge_deleted(older_than=3600) == 0
+    assert repository.purge_deleted(chunk_size=2) == 3
+    assert [row[0] for row in repository.get_users()] == ids[3:]
+    assert repository.purge_deleted() == 0
+
+
+# --- Errores ---
+def test_only_unique_violations_are_duplicates(repository, new_user):
+    with pytest.raises(RepositoryError) as error:
+        new_user(tipo_identificacion='XX')  # viola el CHECK de la tabla en SQLite
+    assert not isinstance(error.value, DuplicateUserError)
+
+
+def test_pool_is_created_once_across_threads(tmp_path, monkeypatch):
+    repository = SQLiteUserRepository(str(tmp_path / 'hilos.db'), hasher=PasswordHasher(4))
+    creados = []
+    crear = repository._create_pool
+
+    def create_slowly():
+        time.sleep(0.05)
+        creados.append(crear())
+        return creados[-1]
+
+    monkeypatch.setattr(repository, '_create_pool', create_slowly)
+    with ThreadPoolExecutor(8) as executor:
+        pools = set(executor.map(lambda _: id(repository.pool), range(8)))
+    assert len(creados) == 1 and len(pools) == 1
+    repository.close()
+
+
+# --- Inicio de sesión ---
+def test_dummy_hash_is_computed_on_first_login(tmp_path):
+    repository = SQLiteUserRepository(str(tmp_path / 'login.db'), hasher=PasswordHasher(4))
+    repository.create_schema()
+    assert repository.hasher._dummy_hash is None
+    assert repository.authenticate_user('nadie@ejemplo.com', 'Clave123') is None
+    assert repository.hasher._dummy_hash is not None
+    repository.close()
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from pool_conexiones import ConnectionPool
+from sentencias import StatementRegistry
+
+
+@pytest.fixture
+def pool():
+    def connect():
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        conn.execute("CREATE TABLE t (x INTEGER UNIQUE)")
+        return conn
+
+    pool = ConnectionPool(connect, min_size=1, max_size=1, health_check=lambda raw: raw.execute("SELECT 1"))
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def registry():
+    return StatementRegistry({'insert': "INSERT INTO t (x) VALUES (?)", 'count': "SELECT COUNT(*) FROM t"})
+
+
+def test_statement_is_prepared_once_per_connection(pool, registry):
+    with pool.acquire() as conn:
+        registry.execute(conn, 'insert', (1,))
+        cursor = registry.execute(conn, 'count')
+        assert cursor.fetchone() == (1,)
+    # Otro préstamo de la misma conexión física reutiliza el cursor
+    with pool.acquire() as conn:
+        assert registry.execute(conn, 'count') is cursor
+
+    stats = registry.stats()
+    assert (stats['count']['prepared'], stats['insert']['prepared']) == (1, 1)
+    assert stats['count']['count'] == 2
+
+
+def test_failed_statement_is_prepared_again(pool, registry):
+    with pool.acquire() as conn:
+        primero = registry.execute(conn, 'insert', (1,))
+        with pytest.raises(sqlite3.IntegrityError):
+            registry.execute(conn, 'insert', (1,))
+        assert registry.execute(conn, 'insert', (2,)) is not primero
+    assert registry.stats()['insert']['prepared'] == 2
+
+
+def test_registered_statements(pool, registry):
+    assert 'borrar' not in registry
+    registry.register('borrar', "DELETE FROM t")
+    assert 'borrar' in registry
+    with pool.acquire() as conn:
+        with pytest.raises(KeyError):
+            registry.execute(conn, 'otra')
@@ -0,0 +1,54 @@
+import time
+
+from sesiones import DatabaseSessionStore, SessionManager
+
+
+def test_valid_token(sessions, new_user):
+    user_id = new_user()
+    session = sessions.validate(sessions.issue(user_id, 'pruebas'))
+    assert session is not None
+    assert session.user_id == user_id
+
+
+def test_tampered_token_is_rejected(sessions, new_user):
+    token = sessions.issue(new_user(), 'pruebas')
+    session_id, user_id, expires_at, signature = token.split('.')
+
+    otro_usuario = f"{session_id}.{int(user_id) + 1}.{expires_at}.{signature}"
+    mas_tiempo = f"{session_id}.{user_id}.{int(expires_at) + 3600}.{signature}"
+    otra_firma = f"{session_id}.{user_id}.{expires_at}.{signature[:-2]}xx"
+    for tampered in (otro_usuario, mas_tiempo, otra_firma, 'basura', '', None):
+        assert sessions.validate(tampered) is None
+
+
+def test_token_signed_with_another_secret_is_rejected(repository, sessions, new_user):
+    token = sessions.issue(new_user(), 'pruebas')
+    otro = SessionManager(DatabaseSessionStore(repository), b'otra-clave')
+    assert otro.validate(token) is None
+
+
+def test_expired_token_is_rejected(repository, new_user):
+    sessions = SessionManager(DatabaseSessionStore(repository), b'clave-de-prueba', ttl=1)
+    token = sessions.issue(new_user(), 'pruebas')
+    assert sessions.validate(token) is not None
+    time.sleep(1.1)
+    assert sessions.validate(token) is None
+
+
+def test_revoke_user_invalidates_all_sessions(sessions, new_user):
+    user_id, otro_id = new_user(), new_user()
+    tokens = [sessions.issue(user_id, 'a'), sessions.issue(user_id, 'b')]
+    otro = sessions.issue(otro_id, 'c')
+
+    assert sessions.revoke_user(user_id) == 2
+    assert all(sessions.validate(token) is None for token in tokens)
+    assert sessions.validate(otro) is not None
+
+
+def test_revocation_reaches_other_processes(repository, sessions, new_user):
+    token = sessions.issue(new_user(), 'pruebas')
+    # Otro proceso con la misma clave: ve la revocación en la siguiente consulta
+    otro = SessionManager(DatabaseSessionStore(repository), b'clave-de-prueba', recheck=0)
+    assert otro.validate(token) is not None
+    sessions.revoke(token)
+    assert otro.validate(token) is None
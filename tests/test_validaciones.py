@@ -0,0 +1,90 @@
+import re
+
+import pytest
+
+from validaciones import es_fecha, validate_columns, validate_many, validate_record
+
+# Validaciones que hacía el formulario antes de validaciones.py (add_user de Crud_Usuarios.py)
+GUI_TELEFONO = r'^(\+\d{1,3}\s?)?\d{7,15}(\s?(ext\.?|extensión)\s?\d+)?$'
+GUI_CORREO = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+
+def gui_accepts(record, omitir=()):
+    obligatorios = [campo for campo in ('numero_identificacion', 'nombre', 'apellido', 'correo', 'password')
+                    if campo not in omitir]
+    if any(not record.get(campo) for campo in obligatorios):
+        return False
+    if re.match(GUI_CORREO, record['correo']) is None:
+        return False
+    if record.get('telefono') and re.match(GUI_TELEFONO, record['telefono']) is None:
+        return False
+    return True
+
+
+def registro(**datos):
+    valores = {
+        'tipo_identificacion': 'CC', 'numero_identificacion': '1001', 'nombre': 'Ana', 'apellido': 'Pérez',
+        'direccion': None, 'fecha_nacimiento': '1990-01-02', 'correo': 'ana@ejemplo.com',
+        'password': 'Clave123', 'telefono': None,
+    }
+    valores.update(datos)
+    return valores
+
+
+# La fecha sale del selector y el tipo de una lista, así que el formulario
+# nunca los validaba; aquí se varía solo lo que validaba
+REGISTROS = [
+    registro(),
+    registro(numero_identificacion=''),
+    registro(nombre='', apellido=''),
+    registro(correo=''),
+    registro(correo='ana@ejemplo'),
+    registro(correo='ana ejemplo@correo.com'),
+    registro(correo='ana.maria+crm@sub.ejemplo.co'),
+    registro(password=''),
+    registro(telefono='3001234567'),
+    registro(telefono='+57 3001234567'),
+    registro(telefono='3001234567 ext 12'),
+    registro(telefono='3001234567 extensión 12'),
+    registro(telefono='300-123-4567'),
+    registro(telefono='12345'),
+    registro(direccion='Calle 1 # 2-3', telefono='+1 5551234567ext.9'),
+]
+
+
+def test_validate_many_matches_validate_record():
+    esperado = {indice: errores for indice, errores in enumerate(map(validate_record, REGISTROS)) if errores}
+    assert validate_many(REGISTROS) == esperado
+
+
+@pytest.mark.parametrize('indice', range(len(REGISTROS)))
+def test_same_verdict_as_the_gui_validators(indice):
+    record = REGISTROS[indice]
+    assert (indice not in validate_many(REGISTROS)) == gui_accepts(record)
+
+
+def test_omitted_fields_are_not_required():
+    # Al editar un usuario el formulario no pide la contraseña
+    records = [registro(password=''), registro(password='', correo='')]
+    assert validate_many(records, omitir=('password',)) == {1: [('correo', "El campo 'correo' es obligatorio.")]}
+    assert [gui_accepts(record, omitir=('password',)) for record in records] == [True, False]
+
+
+def test_all_errors_of_a_record_are_reported():
+    errores = validate_record(registro(tipo_identificacion='XX', nombre='', telefono='12',
+                                       fecha_nacimiento='1990-02-30'))
+    assert [campo for campo, _ in errores] == ['tipo_identificacion', 'nombre', 'fecha_nacimiento', 'telefono']
+
+
+def test_columns_of_different_rows():
+    columnas = {'correo': ['a@ejemplo.com', 'malo'], 'nombre': ['Ana', '']}
+    errores = validate_columns(columnas, omitir=('tipo_identificacion', 'numero_identificacion', 'apellido',
+                                                 'password'))
+    assert list(errores) == [1]
+    assert [campo for campo, _ in errores[1]] == ['nombre', 'correo']
+
+
+def test_fecha_must_exist():
+    assert es_fecha('2024-02-29')
+    assert not es_fecha('2023-02-29')
+    assert not es_fecha('02/01/1990')
@@ -0,0 +1,115 @@
+import re
+from datetime import date
+
+# Patrones compilados una sola vez al importar el módulo
+CORREO_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+TELEFONO_RE = re.compile(r'^(\+\d{1,3}\s?)?\d{7,15}(\s?(ext\.?|extensión)\s?\d+)?$')
+FECHA_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+TIPOS_IDENTIFICACION = ('CC', 'NIT', 'PAS', 'CE')
+
+
+def es_correo(valor):
+    return CORREO_RE.match(valor) is not None
+
+
+def es_telefono(valor):
+    return TELEFONO_RE.match(valor) is not None
+
+
+def es_fecha(valor):
+    """AAAA-MM-DD y además una fecha que existe (no 2024-02-30)"""
+    if FECHA_RE.match(valor) is None:
+        return False
+    try:
+        date.fromisoformat(valor)
+    except ValueError:
+        return False
+    return True
+
+
+class Field:
+    """Regla de un campo: obligatorio, largo máximo, valores permitidos y una
+    comprobación de formato (función que recibe el texto y devuelve bool)"""
+
+    def __init__(self, nombre, etiqueta, requerido=False, max_length=255, opciones=None,
+                 formato=None, mensaje=None):
+        self.nombre = nombre
+        self.etiqueta = etiqueta
+        self.requerido = requerido
+        self.max_length = max_length
+        self.opciones = opciones
+        self.formato = formato
+        self.mensaje = mensaje
+
+    def check(self, valor):
+        """Mensaje de error del valor o None si es válido"""
+        if valor is None or valor == '':
+            return f"El campo '{self.etiqueta}' es obligatorio." if self.requerido else None
+        if self.opciones is not None and valor not in self.opciones:
+            return f"Valor inválido para '{self.etiqueta}': {valor}"
+        if self.max_length and len(valor) > self.max_length:
+            return f"El campo '{self.etiqueta}' admite como máximo {self.max_length} caracteres."
+        if self.formato is not None and not self.formato(valor):
+            return self.mensaje
+        return None
+
+
+# Reglas de un registro de usuario, en el orden del formulario
+USER_SCHEMA = (
+    Field('tipo_identificacion', 'tipo de identificación', requerido=True, opciones=TIPOS_IDENTIFICACION),
+    Field('numero_identificacion', 'número de identificación', requerido=True),
+    Field('nombre', 'nombre', requerido=True),
+    Field('apellido', 'apellido', requerido=True),
+    Field('direccion', 'dirección'),
+    Field('fecha_nacimiento', 'fecha de nacimiento', formato=es_fecha,
+          mensaje="La fecha de nacimiento debe tener el formato AAAA-MM-DD"),
+    Field('correo', 'correo', requerido=True, formato=es_correo,
+          mensaje="El formato del correo electrónico es inválido"),
+    Field('password', 'password', requerido=True, max_length=None),
+    Field('telefono', 'teléfono', max_length=40, formato=es_telefono,
+          mensaje="El formato del teléfono no es válido (ejemplos: +57 3001234567, 3001234567 ext 123)"),
+)
+
+
+def _fields(schema, omitir):
+    return [field for field in schema if field.nombre not in omitir]
+
+
+def validate_record(record, schema=USER_SCHEMA, omitir=()):
+    """Valida todos los campos de un registro (dict) y devuelve la lista de errores
+    como pares (campo, mensaje); vacía si el registro es válido"""
+    errores = []
+    for field in _fields(schema, omitir):
+        mensaje = field.check(record.get(field.nombre))
+        if mensaje:
+            errores.append((field.nombre, mensaje))
+    return errores
+
+
+def validate_columns(columns, schema=USER_SCHEMA, omitir=()):
+    """Valida columnas completas ({campo: [valores]}, todas del mismo largo) aplicando
+    cada regla sobre la columna entera. Devuelve {índice de fila: [(campo, mensaje)]}
+    solo para las filas con errores."""
+    largo = max((len(valores) for valores in columns.values()), default=0)
+    errores = {}
+    for field in _fields(schema, omitir):
+        valores = columns.get(field.nombre) or [None] * largo
+        for indice, mensaje in enumerate(map(field.check, valores)):
+            if mensaje:
+                errores.setdefault(indice, []).append((field.nombre, mensaje))
+    return dict(sorted(errores.items()))
+
+
+def validate_many(records, schema=USER_SCHEMA, omitir=()):
+    """Valida una lista de registros (dicts) por columnas; mismo resultado que
+    llamar validate_record a cada uno, con {índice: errores} de los inválidos"""
+    records = list(records)
+    columns = {field.nombre: [record.get(field.nombre) for record in records]
+               for field in _fields(schema, omitir)}
+    return validate_columns(columns, schema, omitir)
+
+
+def format_errors(errores):
+    """Texto para mostrar en un diálogo con todos los errores de un registro"""
+    return "\n".join(f"• {mensaje}" for _, mensaje in errores)